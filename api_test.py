@@ -1,20 +1,35 @@
-import gc
+import importlib.util
+import inspect
+import os
 import random
+import sys
 import unittest
 from typing import Sequence
 
 import numpy as np
-import torch
+from oracle import get_oracle
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    np_round_to_dtype,
 )
+from tensor_arena import TensorArena
 
 import paddle
 from paddle.utils import map_structure
 
+try:
+    import torch
+except ImportError:
+    # cases with a numpy oracle (see oracle.py) run without torch
+    torch = None
+
+# "oracle" uses the numpy oracle of an api when one is registered,
+# "torch" always compares with torch
+REFERENCE = os.getenv("API_TEST_REFERENCE", "oracle")
+
 
 def _as_list(x):
     if x is None:
@@ -33,14 +48,113 @@ def flatten(nest_list: Sequence):
     return out
 
 
+def pack_like(nest_list: Sequence, flat: Sequence):
+    """Arrange flat, as returned by flatten, in the nesting of nest_list."""
+    flat = iter(flat)
+
+    def pack(item):
+        if isinstance(item, Sequence):
+            return [pack(x) for x in item]
+        return next(flat)
+
+    return [pack(item) for item in nest_list]
+
+
+def case_numpy_arrays(case):
+    """Flat list of a case's numpy inputs followed by its out_grads."""
+    arrays = list(flatten(case.inputs))
+    if hasattr(case, "out_grads"):
+        arrays += flatten(case.out_grads)
+    return arrays
+
+
+class CaseResult:
+    def __init__(self, case, passed, message=""):
+        self.case = case
+        self.passed = passed
+        self.message = message
+
+    @property
+    def name(self):
+        return type(self.case).__name__
+
+
+def print_case_results(results, store=None):
+    """Print a per-case summary and return the number of failed cases.
+
+    With a records.RecordStore the results are also appended to its
+    "accuracy" records.
+    """
+    failed = [r for r in results if not r.passed]
+    if store is not None:
+        for r in results:
+            store.append(
+                "accuracy",
+                {
+                    "case": r.name,
+                    "dtype": getattr(r.case, "dtype", None),
+                    "passed": r.passed,
+                    "message": r.message,
+                },
+            )
+    for r in results:
+        print("{} {}".format(r.name, "success" if r.passed else "failed"))
+    for r in failed:
+        print("===== {} =====\n{}".format(r.name, r.message))
+    print(
+        "{} cases, {} passed, {} failed".format(
+            len(results), len(results) - len(failed), len(failed)
+        )
+    )
+    return len(failed)
+
+
+def load_test_cases(path, base=unittest.TestCase):
+    """Import a test file and return its subclasses of base in file order."""
+    path = os.path.abspath(path)
+    test_dir = os.path.dirname(path)
+    if test_dir not in sys.path:
+        sys.path.insert(0, test_dir)
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    cases = []
+    for _, obj in inspect.getmembers(module, inspect.isclass):
+        if (
+            issubclass(obj, base)
+            and obj is not base
+            and obj.__module__ == module.__name__
+        ):
+            cases.append(obj)
+    cases.sort(key=lambda cls: inspect.getsourcelines(cls)[1])
+    return cases
+
+
+def load_api_test_cases(path):
+    """Import a test file and return its ApiTest subclasses in file order."""
+    return load_test_cases(path, ApiTest)
+
+
 class ApiTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
+        cls.seed_host_rngs()
+        cls.seed_device_rngs()
+
+    @classmethod
+    def seed_host_rngs(cls):
+        """Seed the numpy and python rngs setUp draws the inputs from."""
         np.random.seed(2023)
         random.seed(2023)
+
+    @classmethod
+    def seed_device_rngs(cls):
+        """Seed the paddle and torch rngs the api calls draw from."""
         paddle.seed(2023)
-        torch.manual_seed(2023)
-        torch.cuda.manual_seed_all(2023)
+        if torch is not None:
+            torch.manual_seed(2023)
+            torch.cuda.manual_seed_all(2023)
 
     @classmethod
     def tearDownClass(cls):
@@ -203,129 +317,188 @@ class ApiTest(unittest.TestCase):
             "You must implement cal_paddle_res function in your test case."
         )
 
-    def check_eager_res(self, atol=None, rtol=None):
-        self.check_custom_config()
-        default_threshold_mp = self.get_default_threshold()
-        atol = atol if atol else default_threshold_mp["atol"]
-        rtol = rtol if rtol else default_threshold_mp["rtol"]
+    def cal_torch_res_np(self):
+        """Run cal_torch_res on fresh device inputs, return numpy results."""
+        with TensorArena("torch") as arena:
+            torch_inputs = arena.track(
+                self.gen_torch_data(self.inputs, dtype=self.dtype)
+            )
+            torch_douts = arena.track(
+                self.gen_torch_data(self.out_grads, dtype=self.dtype)
+                if hasattr(self, "out_grads")
+                else None
+            )
+            torch_outputs, torch_gradouts = arena.track(
+                self.cal_torch_res(torch_inputs, torch_douts)
+            )
+            if torch_gradouts is None:
+                torch_gradouts = []
+            torch_outputs, torch_gradouts = flatten(
+                _as_list(torch_outputs)
+            ), flatten(_as_list(torch_gradouts))
+            if self.dtype == "bfloat16":
+                torch_outputs = arena.track(
+                    map_structure(lambda x: x.to(torch.float32), torch_outputs)
+                    if len(torch_outputs) > 0
+                    else torch_outputs
+                )
+                torch_gradouts = arena.track(
+                    map_structure(lambda x: x.to(torch.float32), torch_gradouts)
+                    if len(torch_gradouts) > 0
+                    else torch_gradouts
+                )
+            torch_outputs_np = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                torch_outputs,
+            )
+            torch_gradouts_np = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                torch_gradouts,
+            )
+        return torch_outputs_np, torch_gradouts_np
 
-        torch_inputs = self.gen_torch_data(self.inputs, dtype=self.dtype)
-        torch_douts = (
-            self.gen_torch_data(self.out_grads, dtype=self.dtype)
-            if hasattr(self, "out_grads")
-            else None
-        )
-        torch_outputs, torch_gradouts = self.cal_torch_res(
-            torch_inputs, torch_douts
-        )
-        if torch_gradouts is None:
-            torch_gradouts = []
-        torch_outputs, torch_gradouts = flatten(
-            _as_list(torch_outputs)
-        ), flatten(_as_list(torch_gradouts))
-        if self.dtype == "bfloat16":
-            torch_outputs = (
-                map_structure(lambda x: x.to(torch.float32), torch_outputs)
-                if len(torch_outputs) > 0
-                else torch_outputs
+    def cal_paddle_eager_res_np(self):
+        """Run cal_paddle_res in eager mode, return numpy results."""
+        with TensorArena("paddle") as arena:
+            pd_inputs = arena.track(
+                self.gen_eager_data(self.inputs, dtype=self.dtype)
             )
-            torch_gradouts = (
-                map_structure(lambda x: x.to(torch.float32), torch_gradouts)
-                if len(torch_gradouts) > 0
-                else torch_gradouts
+            pd_douts = arena.track(
+                self.gen_eager_data(self.out_grads, dtype=self.dtype)
+                if hasattr(self, "out_grads")
+                else None
             )
-        torch_outputs_np = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            torch_outputs,
-        )
-        torch_gradouts_np = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            torch_gradouts,
-        )
-        del torch_inputs
-        del torch_douts
-        del torch_outputs
-        del torch_gradouts
-        gc.collect()
-        torch.cuda.empty_cache()
-        pd_inputs = self.gen_eager_data(self.inputs, dtype=self.dtype)
-        pd_douts = (
-            self.gen_eager_data(self.out_grads, dtype=self.dtype)
+            pd_outputs, pd_gradouts = arena.track(
+                self.cal_paddle_res(pd_inputs, pd_douts)
+            )
+            if pd_douts is None:
+                pd_gradouts = []
+            pd_outputs, pd_gradouts = flatten(_as_list(pd_outputs)), flatten(
+                _as_list(pd_gradouts)
+            )
+            if self.dtype == "bfloat16":
+                pd_outputs = arena.track(
+                    map_structure(lambda x: paddle.cast(x, "float32"), pd_outputs)
+                    if len(pd_outputs) > 0
+                    else pd_outputs
+                )
+                pd_gradouts = arena.track(
+                    map_structure(lambda x: paddle.cast(x, "float32"), pd_gradouts)
+                    if len(pd_gradouts) > 0
+                    else pd_gradouts
+                )
+            pd_outputs_np = map_structure(
+                lambda x: x.numpy(),
+                pd_outputs,
+            )
+            pd_gradouts_np = map_structure(
+                lambda x: x.numpy(),
+                pd_gradouts,
+            )
+        return pd_outputs_np, pd_gradouts_np
+
+    def get_reference_oracle(self):
+        if REFERENCE == "torch":
+            return None
+        return get_oracle(getattr(self, "api", None))
+
+    def cal_oracle_res_np(self, oracle):
+        """Evaluate the float64 numpy oracle on the values paddle will see."""
+        def to_float64(x):
+            if not np.issubdtype(x.dtype, np.floating):
+                return x
+            return np_round_to_dtype(x, self.dtype).astype("float64")
+
+        inputs = [to_float64(x) for x in flatten(self.inputs)]
+        out_grads = (
+            [to_float64(x) for x in flatten(self.out_grads)]
             if hasattr(self, "out_grads")
             else None
         )
-        pd_outputs, pd_gradouts = self.cal_paddle_res(pd_inputs, pd_douts)
-        if pd_douts is None:
-            pd_gradouts = []
-        pd_outputs, pd_gradouts = flatten(_as_list(pd_outputs)), flatten(
-            _as_list(pd_gradouts)
+        outputs, gradouts = oracle(
+            inputs, out_grads, **getattr(self, "api_attrs", {})
         )
-        if self.dtype == "bfloat16":
-            pd_outputs = (
-                map_structure(lambda x: paddle.cast(x, "float32"), pd_outputs)
-                if len(pd_outputs) > 0
-                else pd_outputs
-            )
-            pd_gradouts = (
-                map_structure(lambda x: paddle.cast(x, "float32"), pd_gradouts)
-                if len(pd_gradouts) > 0
-                else pd_gradouts
-            )
-        pd_outputs_np = map_structure(
-            lambda x: x.numpy(),
-            pd_outputs,
+        return (
+            [x.astype("float32") for x in outputs],
+            [x.astype("float32") for x in gradouts],
         )
-        pd_gradouts_np = map_structure(
-            lambda x: x.numpy(),
-            pd_gradouts,
+
+    def cal_reference_res_np(self):
+        """Reference results and their name: numpy oracle if any, else torch."""
+        oracle = self.get_reference_oracle()
+        if oracle is not None:
+            return self.cal_oracle_res_np(oracle) + ("numpy_oracle",)
+        return self.cal_torch_res_np() + ("torch",)
+
+    def check_eager_res(self, atol=None, rtol=None):
+        self.check_custom_config()
+        default_threshold_mp = self.get_default_threshold()
+        atol = atol if atol else default_threshold_mp["atol"]
+        rtol = rtol if rtol else default_threshold_mp["rtol"]
+
+        ref_outputs_np, ref_gradouts_np, reference = self.cal_reference_res_np()
+        pd_outputs_np, pd_gradouts_np = self.cal_paddle_eager_res_np()
+
+        self.compare_eager_res(
+            pd_outputs_np,
+            pd_gradouts_np,
+            ref_outputs_np,
+            ref_gradouts_np,
+            atol,
+            rtol,
+            reference,
         )
-        del pd_inputs
-        del pd_douts
-        del pd_outputs
-        del pd_gradouts
-        gc.collect()
-        paddle.device.cuda.empty_cache()
 
+    def compare_eager_res(
+        self,
+        pd_outputs_np,
+        pd_gradouts_np,
+        ref_outputs_np,
+        ref_gradouts_np,
+        atol,
+        rtol,
+        reference="torch",
+    ):
         np.testing.assert_equal(
             len(pd_outputs_np),
-            len(torch_outputs_np),
+            len(ref_outputs_np),
             err_msg=(
-                'Mismatch between paddle and torch forward output tensor nums.'
-                'paddle output tensor num: {}, torch output tensor num: {}.\n'.format(str(len(pd_outputs_np)), str(len(torch_outputs_np)))
+                'Mismatch between paddle and {} forward output tensor nums.'
+                'paddle output tensor num: {}, {} output tensor num: {}.\n'.format(reference, str(len(pd_outputs_np)), reference, str(len(ref_outputs_np)))
             ),
         )
 
-        for idx in range(len(torch_outputs_np)):
+        for idx in range(len(ref_outputs_np)):
             np_assert_accuracy(
                 pd_outputs_np[idx],
-                torch_outputs_np[idx],
+                ref_outputs_np[idx],
                 atol,
                 rtol,
                 self.dtype,
                 version_a="paddle",
-                version_b="torch",
+                version_b=reference,
                 eager_or_static_mode="eager",
                 fwd_or_bkd="forward",
                 api="",
             )
         np.testing.assert_equal(
             len(pd_gradouts_np),
-            len(torch_gradouts_np),
+            len(ref_gradouts_np),
             err_msg=(
-                'Mismatch between paddle and torch grad output tensor nums in eager mode.'
-                'paddle grad output tensor num: {}, torch grad output tensor num: {}.\n'.format(str(len(pd_gradouts_np)), str(len(torch_gradouts_np)))
+                'Mismatch between paddle and {} grad output tensor nums in eager mode.'
+                'paddle grad output tensor num: {}, {} grad output tensor num: {}.\n'.format(reference, str(len(pd_gradouts_np)), reference, str(len(ref_gradouts_np)))
             ),
         )
 
-        for idx in range(len(torch_gradouts_np)):
+        for idx in range(len(ref_gradouts_np)):
             np_assert_accuracy(
                 pd_gradouts_np[idx],
-                torch_gradouts_np[idx],
+                ref_gradouts_np[idx],
                 atol,
                 rtol,
                 self.dtype,
                 version_a="paddle",
-                version_b="torch",
+                version_b=reference,
                 eager_or_static_mode="eager",
                 fwd_or_bkd="grad",
                 api="",
@@ -337,45 +510,7 @@ class ApiTest(unittest.TestCase):
         atol = atol if atol else default_threshold_mp["atol"]
         rtol = rtol if rtol else default_threshold_mp["rtol"]
 
-        torch_inputs = self.gen_torch_data(self.inputs, dtype=self.dtype)
-        torch_douts = (
-            self.gen_torch_data(self.out_grads, dtype=self.dtype)
-            if hasattr(self, "out_grads")
-            else None
-        )
-        torch_outputs, torch_gradouts = self.cal_torch_res(
-            torch_inputs, torch_douts
-        )
-        if torch_gradouts is None:
-            torch_gradouts = []
-        torch_outputs, torch_gradouts = flatten(
-            _as_list(torch_outputs)
-        ), flatten(_as_list(torch_gradouts))
-        if self.dtype == "bfloat16":
-            torch_outputs = (
-                map_structure(lambda x: x.to(torch.float32), torch_outputs)
-                if len(torch_outputs) > 0
-                else torch_outputs
-            )
-            torch_gradouts = (
-                map_structure(lambda x: x.to(torch.float32), torch_gradouts)
-                if len(torch_gradouts) > 0
-                else torch_gradouts
-            )
-        torch_outputs_np = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            torch_outputs,
-        )
-        torch_gradouts_np = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            torch_gradouts,
-        )
-        del torch_inputs
-        del torch_douts
-        del torch_outputs
-        del torch_gradouts
-        gc.collect()
-        torch.cuda.empty_cache()
+        ref_outputs_np, ref_gradouts_np, reference = self.cal_reference_res_np()
         with paddle.fluid.framework._dygraph_guard(None):
             mp, sp = paddle.static.Program(), paddle.static.Program()
             with paddle.static.program_guard(mp, sp):
@@ -429,44 +564,44 @@ class ApiTest(unittest.TestCase):
             out_static, out_grads_static = out, []
         np.testing.assert_equal(
             len(out_static),
-            len(torch_outputs_np),
+            len(ref_outputs_np),
             err_msg=(
-                'Mismatch between paddle static and torch forward output tensor nums.'
-                'paddle static mode output tensor num: {}, torch output tensor num: {}.\n'.format(str(len(out_static)), str(len(torch_outputs_np)))
+                'Mismatch between paddle static and {} forward output tensor nums.'
+                'paddle static mode output tensor num: {}, {} output tensor num: {}.\n'.format(reference, str(len(out_static)), reference, str(len(ref_outputs_np)))
             ),
         )
 
-        for idx in range(len(torch_outputs_np)):
+        for idx in range(len(ref_outputs_np)):
             np_assert_accuracy(
                 out_static[idx],
-                torch_outputs_np[idx],
+                ref_outputs_np[idx],
                 atol,
                 rtol,
                 self.dtype,
                 version_a="paddle",
-                version_b="torch",
+                version_b=reference,
                 eager_or_static_mode="static",
                 fwd_or_bkd="forward",
                 api="",
             )
         np.testing.assert_equal(
             len(out_grads_static),
-            len(torch_gradouts_np),
+            len(ref_gradouts_np),
             err_msg=(
-                'Mismatch between paddle  and torch grad output tensor nums in staitc mode.'
-                'paddle grad output tensor num: {}, torch grad output tensor num: {}.\n'.format(str(len(out_grads_static)), str(len(torch_gradouts_np)))
+                'Mismatch between paddle  and {} grad output tensor nums in staitc mode.'
+                'paddle grad output tensor num: {}, {} grad output tensor num: {}.\n'.format(reference, str(len(out_grads_static)), reference, str(len(ref_gradouts_np)))
             ),
         )
 
-        for idx in range(len(torch_gradouts_np)):
+        for idx in range(len(ref_gradouts_np)):
             np_assert_accuracy(
                 out_grads_static[idx],
-                torch_gradouts_np[idx],
+                ref_gradouts_np[idx],
                 atol,
                 rtol,
                 self.dtype,
                 version_a="paddle",
-                version_b="torch",
+                version_b=reference,
                 eager_or_static_mode="static",
                 fwd_or_bkd="grad",
                 api="",
@@ -512,10 +647,9 @@ class ApiTest(unittest.TestCase):
             lambda x: x.numpy(),
             out_grads_eager_baseline,
         )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        gc.collect()
-        paddle.device.cuda.empty_cache()
+        baseline_arena = TensorArena("paddle")
+        baseline_arena.track([out_eager_baseline, out_grads_eager_baseline])
+        baseline_arena.release()
 
         for i in range(frequency):
             out_eager, out_grads_eager = self.cal_paddle_res(
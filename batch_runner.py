@@ -0,0 +1,316 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Run many small ApiTest cases of the same api in one batch.
+
+Usage:
+    python batch_runner.py test_square/test_square_develop.py [--max_numel N]
+
+Small cases of one api (same cal_paddle_res/cal_torch_res, dtype and input
+layout) share one host buffer per numpy dtype, which is uploaded once for
+torch and once for paddle. The cases then run back-to-back on views of that
+buffer, all outputs are downloaded with a single copy per framework and
+compared in one vectorized pass. Cases above max_numel run one by one through
+ApiTest.check_eager_res as before. Both paths compare against the same
+reference: the numpy oracle of the api when one is registered (see
+ApiTest.cal_reference_res_np), else torch.
+"""
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from api_test import (
+    CaseResult,
+    _as_list,
+    case_numpy_arrays,
+    flatten,
+    load_api_test_cases,
+    print_case_results,
+)
+from records import RecordStore
+from tensor_arena import TensorArena
+from utils import np_assert_accuracy
+
+import paddle
+
+DEFAULT_MAX_NUMEL = 1 << 20
+
+
+def _case_numel(case):
+    return sum(x.size for x in case_numpy_arrays(case))
+
+
+def _group_key(case):
+    cls = type(case)
+    return (
+        cls.cal_paddle_res,
+        cls.cal_torch_res,
+        case.dtype,
+        tuple(x.dtype.str for x in flatten(case.inputs)),
+        hasattr(case, "out_grads"),
+        case.get_reference_oracle(),
+    )
+
+
+def _pack(cases):
+    """Concatenate every case array into one flat host buffer per dtype."""
+    buffers = OrderedDict()
+    layout = []
+    for case in cases:
+        case_layout = []
+        for x in case_numpy_arrays(case):
+            chunks = buffers.setdefault(x.dtype.str, [])
+            start = sum(c.size for c in chunks)
+            chunks.append(x.reshape(-1))
+            case_layout.append((x.dtype.str, start, start + x.size, x.shape))
+        layout.append(case_layout)
+    host = OrderedDict(
+        (key, np.concatenate(chunks)) for key, chunks in buffers.items()
+    )
+    return host, layout
+
+
+def _unpack(case, views):
+    n_inputs = len(flatten(case.inputs))
+    inputs, out_grads = views[:n_inputs], views[n_inputs:]
+    return inputs, (out_grads if hasattr(case, "out_grads") else None)
+
+
+def _upload_torch(host, layout, dtype):
+    device_buffers = {}
+    for key, buf in host.items():
+        device_buffers[key] = torch.tensor(
+            buf,
+            device="cuda",
+            requires_grad=np.issubdtype(buf.dtype, np.floating),
+        )
+    all_views = []
+    for case_layout in layout:
+        views = []
+        for key, start, end, shape in case_layout:
+            x = device_buffers[key][start:end].reshape(shape)
+            if dtype == "bfloat16" and x.dtype == torch.float32:
+                x = x.to(dtype=torch.bfloat16)
+            views.append(x)
+        all_views.append(views)
+    return all_views
+
+
+def _upload_paddle(host, layout, dtype):
+    device_buffers = {}
+    for key, buf in host.items():
+        x = paddle.to_tensor(buf, dtype=buf.dtype, place="gpu")
+        x.stop_gradient = not np.issubdtype(buf.dtype, np.floating)
+        device_buffers[key] = x
+    all_views = []
+    for case_layout in layout:
+        views = []
+        for key, start, end, shape in case_layout:
+            x = device_buffers[key][start:end].reshape(shape)
+            if dtype == "bfloat16" and x.dtype == paddle.float32:
+                x = paddle.cast(x, dtype="uint16")
+            views.append(x)
+        all_views.append(views)
+    return all_views
+
+
+def _split_results(outputs, gradouts):
+    outputs = flatten(_as_list(outputs))
+    gradouts = flatten(_as_list(gradouts)) if gradouts is not None else []
+    return outputs, gradouts
+
+
+def _download_torch(tensors):
+    if len(tensors) == 0:
+        return np.zeros([0], dtype="float64")
+    wide = any(
+        x.dtype in (torch.int64, torch.float64) for x in tensors
+    )
+    target = torch.float64 if wide else torch.float32
+    flat = torch.cat([x.detach().to(target).reshape(-1) for x in tensors])
+    return flat.cpu().numpy()
+
+
+def _download_paddle(tensors):
+    if len(tensors) == 0:
+        return np.zeros([0], dtype="float64")
+    wide = any(
+        x.dtype in (paddle.int64, paddle.float64) for x in tensors
+    )
+    target = "float64" if wide else "float32"
+    flat = paddle.concat(
+        [paddle.cast(x, target).reshape([-1]) for x in tensors]
+    )
+    return flat.numpy()
+
+
+def _run_torch_reference(cases, host, layout):
+    dtype = cases[0].dtype
+    with TensorArena("torch") as arena:
+        torch_views = arena.track(_upload_torch(host, layout, dtype))
+        torch_tensors, torch_segments = [], []
+        for case, views in zip(cases, torch_views):
+            outputs, gradouts = case.cal_torch_res(*_unpack(case, views))
+            outputs, gradouts = _split_results(outputs, gradouts)
+            torch_segments.append((len(outputs), len(gradouts)))
+            torch_tensors += arena.track(outputs + gradouts)
+        torch_flat = _download_torch(torch_tensors)
+        torch_shapes = [tuple(x.shape) for x in torch_tensors]
+    return torch_flat, torch_shapes, torch_segments
+
+
+def _run_oracle_reference(cases):
+    # the oracle runs on host, so there is nothing to batch: evaluate it per
+    # case and lay the results out like _download_torch would
+    ref_arrays, ref_segments = [], []
+    for case in cases:
+        outputs, gradouts, _ = case.cal_reference_res_np()
+        ref_segments.append((len(outputs), len(gradouts)))
+        ref_arrays += list(outputs) + list(gradouts)
+    ref_shapes = [tuple(x.shape) for x in ref_arrays]
+    if len(ref_arrays) == 0:
+        return np.zeros([0], dtype="float64"), ref_shapes, ref_segments
+    ref_flat = np.concatenate(
+        [x.astype("float64").reshape(-1) for x in ref_arrays]
+    )
+    return ref_flat, ref_shapes, ref_segments
+
+
+def run_group(cases):
+    """Run one group of same-api cases with one upload and one download."""
+    dtype = cases[0].dtype
+    host, layout = _pack(cases)
+
+    if cases[0].get_reference_oracle() is not None:
+        reference = "numpy_oracle"
+        ref_flat, ref_shapes, ref_segments = _run_oracle_reference(cases)
+    else:
+        reference = "torch"
+        ref_flat, ref_shapes, ref_segments = _run_torch_reference(
+            cases, host, layout
+        )
+
+    with TensorArena("paddle") as arena:
+        pd_views = arena.track(_upload_paddle(host, layout, dtype))
+        pd_tensors, pd_segments = [], []
+        for case, views in zip(cases, pd_views):
+            outputs, gradouts = case.cal_paddle_res(*_unpack(case, views))
+            if not hasattr(case, "out_grads"):
+                gradouts = None
+            outputs, gradouts = _split_results(outputs, gradouts)
+            pd_segments.append((len(outputs), len(gradouts)))
+            pd_tensors += arena.track(outputs + gradouts)
+        pd_flat = _download_paddle(pd_tensors)
+        pd_shapes = [tuple(x.shape) for x in pd_tensors]
+
+    if pd_segments != ref_segments or pd_shapes != ref_shapes:
+        # let the per-case check report which case disagrees and how
+        return [_check_single(case) for case in cases]
+
+    # one entry per output tensor: (case index, fwd_or_bkd, start, end)
+    segments = []
+    offset = 0
+    for case_idx, (n_out, n_grad) in enumerate(pd_segments):
+        for i in range(n_out + n_grad):
+            size = int(np.prod(ref_shapes[len(segments)], dtype=np.int64))
+            fwd_or_bkd = "forward" if i < n_out else "backward"
+            segments.append((case_idx, fwd_or_bkd, offset, offset + size))
+            offset += size
+
+    seg_sizes = np.array(
+        [end - start for _, _, start, end in segments], dtype=np.int64
+    )
+    thresholds = [cases[s[0]].get_default_threshold() for s in segments]
+    atol = np.repeat([t["atol"] for t in thresholds], seg_sizes)
+    rtol = np.repeat([t["rtol"] for t in thresholds], seg_sizes)
+
+    ok = (pd_flat == ref_flat) | (
+        np.abs(pd_flat - ref_flat) <= atol + rtol * np.abs(ref_flat)
+    )
+    ok |= np.isnan(pd_flat) & np.isnan(ref_flat)
+    bad_idx = np.flatnonzero(~ok)
+
+    seg_ends = np.array([end for _, _, _, end in segments])
+    bad_segments = set(
+        np.searchsorted(seg_ends, bad_idx, side="right").tolist()
+    )
+    messages = [[] for _ in cases]
+    for seg_idx in sorted(bad_segments):
+        case_idx, fwd_or_bkd, start, end = segments[seg_idx]
+        case = cases[case_idx]
+        threshold = thresholds[seg_idx]
+        try:
+            np_assert_accuracy(
+                pd_flat[start:end].reshape(pd_shapes[seg_idx]),
+                ref_flat[start:end].reshape(ref_shapes[seg_idx]),
+                threshold["atol"],
+                threshold["rtol"],
+                case.dtype,
+                version_a="paddle",
+                version_b=reference,
+                eager_or_static_mode="eager",
+                fwd_or_bkd=fwd_or_bkd,
+                api="",
+            )
+        except AssertionError as e:
+            messages[case_idx].append(str(e))
+    return [
+        CaseResult(case, len(msgs) == 0, "\n".join(msgs))
+        for case, msgs in zip(cases, messages)
+    ]
+
+
+def _check_single(case):
+    try:
+        case.check_eager_res()
+    except AssertionError as e:
+        return CaseResult(case, False, str(e))
+    return CaseResult(case, True)
+
+
+def run_batched(case_classes, max_numel=DEFAULT_MAX_NUMEL):
+    """Run ApiTest classes, batching the small ones of the same api."""
+    groups = OrderedDict()
+    singles = []
+    for cls in case_classes:
+        cls.setUpClass()
+        case = cls()
+        case.setUp()
+        case.check_custom_config()
+        if _case_numel(case) <= max_numel:
+            groups.setdefault(_group_key(case), []).append(case)
+        else:
+            singles.append(case)
+
+    results = []
+    for cases in groups.values():
+        results += run_group(cases)
+    for case in singles:
+        results.append(_check_single(case))
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="batched api test")
+    parser.add_argument("test_file", type=str)
+    parser.add_argument("--max_numel", type=int, default=DEFAULT_MAX_NUMEL)
+    args = parser.parse_args()
+    return args.test_file, args.max_numel
+
+
+if __name__ == "__main__":
+    test_file, max_numel = parse_args()
+    results = run_batched(load_api_test_cases(test_file), max_numel)
+    if print_case_results(results, RecordStore.from_env()):
+        raise SystemExit(1)
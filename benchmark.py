@@ -0,0 +1,322 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Time paddle against torch on the inputs of existing test cases.
+
+Usage (from the test directory, like the run_shell scripts, so the relative
+npz paths of the cases resolve):
+    cd test_matmul
+    python ../benchmark.py test_matmul_develop.py \
+        [--cases Case3] [--warmup 5] [--iters 50] [--record_dir DIR]
+
+A case is not rewritten for benchmarking. For the hand-written cases the
+benchmark runs setUp / test_eager_accuracy with cal_torch_res /
+cal_eager_res intercepted, which captures the exact device inputs and
+arguments the test passes; ApiTest cases are driven through gen_*_data
+and cal_*_res directly. The captured call (forward + backward) is then
+timed with a device synchronize around every iteration.
+
+Throughput uses the bytes of all tensor arguments and results, or
+case.get_bytes() when the case defines it; TFLOP/s is reported for cases
+that define case.get_flops(). Results are grouped by the power of two
+bucket of their input bytes and appended to the "benchmark" records of
+records.RecordStore next to the accuracy records.
+"""
+import argparse
+import functools
+import math
+import re
+import time
+
+import numpy as np
+from api_test import ApiTest, _as_list, flatten, load_test_cases
+from records import RecordStore
+from tensor_arena import MemoryPlanner, TensorArena
+
+import paddle
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+PERCENTILES = (50, 90, 99)
+
+
+class _Captured(Exception):
+    def __init__(self, args, kwargs):
+        super().__init__("captured")
+        self.args = args
+        self.kwargs = kwargs
+
+
+def _capture(case, method_name, trigger):
+    """Run trigger() until it calls case.<method_name>, return that call."""
+    original = getattr(case, method_name)
+
+    def recorder(*args, **kwargs):
+        raise _Captured(args, kwargs)
+
+    setattr(case, method_name, recorder)
+    try:
+        trigger()
+    except _Captured as c:
+        return functools.partial(original, *c.args, **c.kwargs)
+    finally:
+        delattr(case, method_name)
+    return None
+
+
+# the first torch work of a setUp, the numpy inputs are set up before it
+TORCH_INPUT_METHODS = ["gen_torch_inputs_and_dout", "gen_torch_inputs"]
+
+
+def _setup_numpy_inputs(case):
+    """Run case.setUp up to its first torch call."""
+    for name in TORCH_INPUT_METHODS:
+        if hasattr(case, name):
+            _capture(case, name, case.setUp)
+            return
+    # no torch input method, stop at the torch call and drop its inputs
+    _capture(case, "cal_torch_res", case.setUp)
+    if torch is not None:
+        torch.cuda.empty_cache()
+
+
+def _tensors(nest):
+    if isinstance(nest, functools.partial):
+        nest = list(nest.args) + list(nest.keywords.values())
+    if isinstance(nest, dict):
+        nest = list(nest.values())
+    return [
+        x
+        for x in flatten(_as_list(nest))
+        if (torch is not None and isinstance(x, torch.Tensor))
+        or isinstance(x, paddle.Tensor)
+    ]
+
+
+def _nbytes(tensors):
+    total = 0
+    for x in tensors:
+        total += int(np.prod(x.shape, dtype=np.int64)) * x.element_size()
+    return total
+
+
+class CaseAdapter:
+    """Captures the paddle and torch calls of one test case class."""
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.name = cls.__name__
+        cls.setUpClass()
+        self.case = cls()
+        self.is_api_test = isinstance(self.case, ApiTest)
+        self.dtype = None
+
+    def torch_call(self):
+        case = self.case
+        if self.is_api_test:
+            case.setUp()
+            self.dtype = case.dtype
+            inputs = case.gen_torch_data(case.inputs, dtype=case.dtype)
+            douts = (
+                case.gen_torch_data(case.out_grads, dtype=case.dtype)
+                if hasattr(case, "out_grads")
+                else None
+            )
+            return functools.partial(case.cal_torch_res, inputs, douts)
+        call = _capture(case, "cal_torch_res", case.setUp)
+        self.dtype = getattr(case, "dtype", None)
+        return call
+
+    def paddle_call(self):
+        case = self.case
+        if self.is_api_test:
+            if not hasattr(case, "inputs"):
+                case.setUp()
+            self.dtype = case.dtype
+            inputs = case.gen_eager_data(case.inputs, dtype=case.dtype)
+            douts = (
+                case.gen_eager_data(case.out_grads, dtype=case.dtype)
+                if hasattr(case, "out_grads")
+                else None
+            )
+            return functools.partial(case.cal_paddle_res, inputs, douts)
+        if not hasattr(case, "dtype"):
+            # torch was not captured, only the numpy inputs are needed
+            _setup_numpy_inputs(case)
+        call = _capture(case, "cal_eager_res", case.test_eager_accuracy)
+        self.dtype = getattr(case, "dtype", None)
+        return call
+
+    def bytes_moved(self, call, outputs):
+        if hasattr(self.case, "get_bytes"):
+            return self.case.get_bytes()
+        return _nbytes(_tensors(call)) + _nbytes(_tensors(outputs))
+
+    def flops(self):
+        if hasattr(self.case, "get_flops"):
+            return self.case.get_flops()
+        return None
+
+
+def time_call(call, synchronize, warmup, iters):
+    """Run call warmup + iters times, return per-iteration seconds."""
+    for _ in range(warmup):
+        call()
+    synchronize()
+    times = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        call()
+        synchronize()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def shape_bucket(nbytes):
+    """Power of two bucket of a byte count, e.g. '<=64MB'."""
+    if nbytes <= 0:
+        return "0B"
+    bucket = 2 ** math.ceil(math.log2(nbytes))
+    for unit in ("B", "KB", "MB", "GB"):
+        if bucket < 1024:
+            return "<={}{}".format(bucket, unit)
+        bucket //= 1024
+    return "<={}TB".format(bucket)
+
+
+def summarize(name, framework, dtype, times, nbytes, flops):
+    record = {
+        "case": name,
+        "framework": framework,
+        "dtype": dtype,
+        "iters": len(times),
+        "mean_ms": float(times.mean() * 1e3),
+        "min_ms": float(times.min() * 1e3),
+        "bytes": int(nbytes),
+        "bucket": shape_bucket(nbytes),
+        "times_ms": [float(t * 1e3) for t in times],
+    }
+    for p in PERCENTILES:
+        record["p{}_ms".format(p)] = float(np.percentile(times, p) * 1e3)
+    median = np.percentile(times, 50)
+    record["gbps"] = float(nbytes / median / 1e9)
+    record["tflops"] = float(flops / median / 1e12) if flops else None
+    return record
+
+
+def _run_framework(adapter, framework, warmup, iters):
+    if framework == "torch":
+        call = adapter.torch_call()
+        synchronize = torch.cuda.synchronize
+    else:
+        call = adapter.paddle_call()
+        synchronize = paddle.device.cuda.synchronize
+    if call is None:
+        return None
+    peak_reset = MemoryPlanner.reset_peak(framework)
+    with TensorArena(framework) as arena:
+        arena.track(_tensors(call))
+        outputs = arena.track(_tensors(call()))
+        nbytes = adapter.bytes_moved(call, outputs)
+        times = time_call(call, synchronize, warmup, iters)
+        peak_allocated, peak_reserved = MemoryPlanner.peak_allocated_and_reserved(
+            framework
+        )
+    record = summarize(
+        adapter.name, framework, adapter.dtype, times, nbytes, adapter.flops()
+    )
+    record["peak_allocated"] = int(peak_allocated)
+    record["peak_reserved"] = int(peak_reserved)
+    # without a reset the peak also covers the cases run before this one
+    record["peak_is_cumulative"] = not peak_reset
+    return record
+
+
+def benchmark_cases(case_classes, frameworks, warmup=5, iters=50):
+    records = []
+    for cls in case_classes:
+        adapter = CaseAdapter(cls)
+        for framework in frameworks:
+            record = _run_framework(adapter, framework, warmup, iters)
+            if record is not None:
+                records.append(record)
+    return records
+
+
+def print_records(records):
+    header = "{:<44} {:<7} {:<9} {:>10} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+        "case", "fw", "bucket", "p50(ms)", "p90(ms)", "p99(ms)", "GB/s",
+        "TFLOP/s", "pd/torch",
+    )
+    print(header)
+    print("-" * len(header))
+    torch_p50 = {
+        r["case"]: r["p50_ms"] for r in records if r["framework"] == "torch"
+    }
+    for r in sorted(records, key=lambda r: (r["bytes"], r["case"])):
+        ratio = ""
+        if r["framework"] == "paddle" and r["case"] in torch_p50:
+            ratio = "{:.2f}".format(r["p50_ms"] / torch_p50[r["case"]])
+        print(
+            "{:<44} {:<7} {:<9} {:>10.4f} {:>9.4f} {:>9.4f} {:>9.1f} {:>9} {:>8}".format(
+                r["case"][:44],
+                r["framework"],
+                r["bucket"],
+                r["p50_ms"],
+                r["p90_ms"],
+                r["p99_ms"],
+                r["gbps"],
+                "{:.2f}".format(r["tflops"]) if r["tflops"] else "-",
+                ratio,
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="api benchmark")
+    parser.add_argument("test_file", type=str)
+    parser.add_argument("--cases", type=str, default=None)  # regex on name
+    parser.add_argument(
+        "--frameworks", nargs="+", default=["torch", "paddle"]
+    )
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--record_dir", type=str, default=None)
+    parser.add_argument("--tag", type=str, default=None)  # e.g. trial id
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    case_classes = load_test_cases(args.test_file)
+    if args.cases:
+        case_classes = [
+            cls for cls in case_classes if re.search(args.cases, cls.__name__)
+        ]
+    records = benchmark_cases(
+        case_classes, args.frameworks, args.warmup, args.iters
+    )
+    print_records(records)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for record in records:
+            record["test_file"] = args.test_file
+            record["tag"] = args.tag
+            store.append("benchmark", record)
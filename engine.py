@@ -0,0 +1,451 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Sweep engine for tests that run one op over feeds x attrs x modes.
+
+Generalized from the Runtime/Framework of test_cast. An op is a class in
+a runtime module of the test directory, one module per backend:
+
+    mode           module           launch function
+    paddle_eager   paddle_runtime   <Op>.launch_eager(feed, attr)
+    paddle_static  paddle_runtime   <Op>.launch_static(feed, attr)
+    torch_eager    torch_runtime    <Op>.launch_eager(feed, attr)
+    numpy          numpy_runtime    <Op>.launch(feed, attr)
+
+More backends are added with register_backend. A runtime module may define
+init_worker(), which the engine calls once in every worker thread.
+
+Usage (see test_cast/run.py):
+    engine = Engine("Cast", sink=NpyStore("paddle_dev"), num_workers=2)
+    engine.run(feeds, attrs, modes)
+
+ListSink keeps the results in memory, NpyStore streams them to disk.
+
+Every (feed, attr, mode) task runs a stability test and records its
+baseline result. Results reach the sink in task order, batch_size at a time.
+
+Launch functions may return device tensors (anything with .numpy()),
+Runtime.dispatch downloads them after the launch. With pool="thread"
+(default) only the launches are serialized by one lock, while the
+workers overlap the host side (result download, stability compare, sink
+writes) of other tasks. With pool="process" the feeds are
+copied once into multiprocessing.shared_memory blocks and every task runs
+in a worker process, which returns its result through a new shared memory
+block as well, so no array is pickled. That is meant for the cpu backends
+(numpy), every gpu worker process would create its own device context.
+"""
+import collections
+import contextlib
+import importlib
+import itertools
+import json
+import logging
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from numerics import decode_compact, encode_compact
+
+
+class Framework:
+    @staticmethod
+    def launch_eager(input_data, attr):
+        pass
+
+    @staticmethod
+    def launch_static(input_data, attr):
+        pass
+
+
+class Attribute:
+    def __init__(self):
+        pass
+
+
+class Result:
+    def __init__(self, mode, data):
+        self.mode = mode
+        self.data = data
+
+    def assert_equal(self, other):
+        if self.mode == other.mode:
+            logging.info(
+                "-- assert_equal=self:{}, other:{}".format(self.data, other.data)
+            )
+            return np.testing.assert_equal(self.data, other.data)
+        else:
+            logging.info(
+                "-- assert_allclose=self:{}, other:{}".format(
+                    self.data, other.data
+                )
+            )
+            return np.testing.assert_allclose(
+                self.data, other.data, rtol=1e-6
+            )
+
+
+def _download(data):
+    """data with its device tensors copied to numpy arrays."""
+    if isinstance(data, (tuple, list)):
+        return type(data)(_download(x) for x in data)
+    if isinstance(data, np.ndarray) or not hasattr(data, "numpy"):
+        return data
+    if hasattr(data, "detach"):
+        data = data.detach()
+    if hasattr(data, "cpu"):
+        data = data.cpu()
+    return data.numpy()
+
+
+class Runtime:
+    def __init__(self, mode, attr, func, lock=None):
+        self.mode = mode
+        self.attr = attr
+        self.func = func
+        self.lock = lock if lock is not None else contextlib.nullcontext()
+
+    def dispatch(self, input):
+        with self.lock:
+            data = self.func(input, self.attr)
+        # the download waits for the device, so it stays out of the lock
+        return Result(self.mode, _download(data))
+
+    def stability_test(self, input, rounds=10):
+        """Dispatch 1 + rounds times, return the baseline result."""
+        res = self.dispatch(input)
+        for i in range(rounds):
+            self.dispatch(input).assert_equal(res)
+        return res
+
+
+BACKENDS = {
+    "paddle_eager": ("paddle_runtime", "launch_eager"),
+    "paddle_static": ("paddle_runtime", "launch_static"),
+    "torch_eager": ("torch_runtime", "launch_eager"),
+    "numpy": ("numpy_runtime", "launch"),
+}
+
+
+def register_backend(mode, module, method):
+    if mode in BACKENDS:
+        raise KeyError(f"The backend {mode} is already registered.")
+    BACKENDS[mode] = (module, method)
+
+
+def get_launcher(mode, op):
+    """The launch function of op for mode, the module is imported lazily."""
+    module, method = BACKENDS[mode]
+    return getattr(getattr(importlib.import_module(module), op), method)
+
+
+class ResultSink:
+    """Receives the results of a sweep, batch by batch and in task order.
+
+    A record is (index, feed_id, attr, result). Sinks that keep the result
+    data after write_batch returns set keeps_data, the process pool hands
+    everyone else views of shared memory that are released afterwards.
+    """
+
+    keeps_data = False
+
+    def write_batch(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ListSink(ResultSink):
+    keeps_data = True
+
+    def __init__(self):
+        self.results = []
+
+    def write_batch(self, records):
+        self.results.extend(result for _, _, _, result in records)
+
+
+class NpyStore(ResultSink):
+    """Results on disk: one .npy file per array plus a json lines manifest.
+
+    The engine appends results as they complete and readers iterate them
+    memory mapped, so neither side holds more than the result at hand.
+    Arrays are stored in the compact encoding of numerics.encode_compact
+    (upcast fp16/bf16 results take half the space) and widened back to
+    float32 when a result is loaded for comparison.
+    """
+
+    MANIFEST = "manifest.jsonl"
+
+    def __init__(self, root):
+        self.root = root
+        self._manifest = None
+
+    def write_batch(self, records):
+        if self._manifest is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._manifest = open(os.path.join(self.root, self.MANIFEST), "w")
+        for index, feed_id, attr, result in records:
+            data = result.data
+            if not isinstance(data, (list, tuple)):
+                data = [data]
+            files, encodings = [], []
+            for i, array in enumerate(data):
+                name = "{:06d}_{}.npy".format(index, i)
+                payload, encoding = encode_compact(array)
+                np.save(os.path.join(self.root, name), payload)
+                files.append(name)
+                encodings.append(encoding)
+            entry = {
+                "index": index,
+                "feed_id": feed_id,
+                "attr": vars(attr),
+                "mode": result.mode,
+                "files": files,
+                "encodings": encodings,
+            }
+            # the entry goes last, an interrupted write leaves no dangling entry
+            self._manifest.write(json.dumps(entry) + "\n")
+        self._manifest.flush()
+
+    def close(self):
+        if self._manifest is not None:
+            self._manifest.close()
+            self._manifest = None
+
+    def entries(self):
+        path = os.path.join(self.root, self.MANIFEST)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def load(self, entry):
+        encodings = entry.get("encodings", [None] * len(entry["files"]))
+        data = [
+            decode_compact(
+                np.load(os.path.join(self.root, name), mmap_mode="r"), encoding
+            )
+            for name, encoding in zip(entry["files"], encodings)
+        ]
+        return Result(entry["mode"], data)
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __iter__(self):
+        for entry in self.entries():
+            yield self.load(entry)
+
+
+def _init_backends(modes):
+    for module in sorted({BACKENDS[mode][0] for mode in modes}):
+        init = getattr(importlib.import_module(module), "init_worker", None)
+        if init is not None:
+            init()
+
+
+def _share_arrays(arrays):
+    """Copy arrays into one new shared memory block, return it and its layout."""
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    layout, offset = [], 0
+    for a in arrays:
+        layout.append((offset, a.shape, a.dtype.str))
+        offset += a.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for a, (start, shape, dtype) in zip(arrays, layout):
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=start)[...] = a
+    return shm, layout
+
+
+def _view_arrays(shm, layout):
+    return [
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=start)
+        for start, shape, dtype in layout
+    ]
+
+
+class SharedFeed:
+    """A feed whose arrays live in shared memory, passed to workers by name."""
+
+    def __init__(self, feed):
+        arrays = {
+            k: v for k, v in vars(feed).items() if isinstance(v, np.ndarray)
+        }
+        others = {k: v for k, v in vars(feed).items() if k not in arrays}
+        self.shm, layout = _share_arrays(list(arrays.values()))
+        self.handle = (type(feed), self.shm.name, list(arrays), layout, others)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# block name -> (shared memory, feed), per worker process
+_ATTACHED_FEEDS = {}
+
+
+def _attach_feed(handle):
+    cls, name, names, layout, others = handle
+    if name not in _ATTACHED_FEEDS:
+        shm = shared_memory.SharedMemory(name=name)
+        feed = object.__new__(cls)
+        feed.__dict__.update(others)
+        feed.__dict__.update(zip(names, _view_arrays(shm, layout)))
+        _ATTACHED_FEEDS[name] = (shm, feed)
+    return _ATTACHED_FEEDS[name][1]
+
+
+def _run_shared_task(op, handle, attr, mode, rounds):
+    """Process pool task: the feed and the result both go by shared memory."""
+    runtime = Runtime(mode, attr, get_launcher(mode, op))
+    result = runtime.stability_test(_attach_feed(handle), rounds)
+    data = result.data
+    if not isinstance(data, (list, tuple)):
+        data = [data]
+    payloads, encodings = zip(*[encode_compact(x) for x in data])
+    shm, layout = _share_arrays(payloads)
+    shm.close()
+    # the parent unlinks the block once the sink has consumed the result
+    return result.mode, shm.name, layout, encodings
+
+
+def _receive_shared_result(future):
+    mode, name, layout, encodings = future.result()
+    shm = shared_memory.SharedMemory(name=name)
+    data = [
+        decode_compact(x, encoding)
+        for x, encoding in zip(_view_arrays(shm, layout), encodings)
+    ]
+    return Result(mode, data), shm
+
+
+class Engine:
+    def __init__(
+        self,
+        op,
+        sink=None,
+        num_workers=1,
+        batch_size=1,
+        max_inflight=None,
+        stability_rounds=10,
+        pool="thread",
+    ):
+        self.op = op
+        self.sink = sink if sink is not None else ListSink()
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        # every task in flight holds its feed results, bound them
+        self.max_inflight = max_inflight or 2 * num_workers
+        self.stability_rounds = stability_rounds
+        self.pool = pool
+        self.lock = threading.Lock()
+
+    def _init_worker(self, modes):
+        with self.lock:
+            _init_backends(modes)
+
+    def run_task(self, feed, attr, mode):
+        runtime = Runtime(mode, attr, get_launcher(mode, self.op), self.lock)
+        # the stability baseline is the recorded result
+        return runtime.stability_test(feed, self.stability_rounds)
+
+    def _sweep(self, num_feeds, attrs, modes, submit, receive):
+        tasks = itertools.product(range(num_feeds), attrs, modes)
+        window = collections.deque()
+        batch, blocks = [], []
+
+        def collect():
+            index, feed_id, attr, future = window.popleft()
+            result, block = receive(future)
+            batch.append((index, feed_id, attr, result))
+            if block is not None:
+                blocks.append(block)
+
+        def flush():
+            if blocks and self.sink.keeps_data:
+                # shared memory views die with the batch, the sink gets copies
+                for _, _, _, result in batch:
+                    result.data = [np.array(x) for x in result.data]
+            self.sink.write_batch(batch)
+            batch.clear()
+
+        def release():
+            for block in blocks:
+                block.close()
+                block.unlink()
+            blocks.clear()
+
+        for index, (feed_id, attr, mode) in enumerate(tasks):
+            window.append((index, feed_id, attr, submit(feed_id, attr, mode)))
+            if len(window) >= self.max_inflight:
+                collect()
+                if len(batch) >= self.batch_size:
+                    flush()
+                    release()
+        while window:
+            collect()
+            if len(batch) >= self.batch_size:
+                flush()
+                release()
+        if batch:
+            flush()
+            release()
+
+    def run(self, feeds, attrs, modes):
+        if self.pool == "process":
+            shared_feeds = [SharedFeed(feed) for feed in feeds]
+            try:
+                with ProcessPoolExecutor(
+                    self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_backends,
+                    initargs=(modes,),
+                ) as pool:
+                    self._sweep(
+                        len(feeds),
+                        attrs,
+                        modes,
+                        lambda feed_id, attr, mode: pool.submit(
+                            _run_shared_task,
+                            self.op,
+                            shared_feeds[feed_id].handle,
+                            attr,
+                            mode,
+                            self.stability_rounds,
+                        ),
+                        _receive_shared_result,
+                    )
+            finally:
+                for shared_feed in shared_feeds:
+                    shared_feed.release()
+        else:
+            with ThreadPoolExecutor(
+                self.num_workers,
+                initializer=self._init_worker,
+                initargs=(modes,),
+            ) as pool:
+                self._sweep(
+                    len(feeds),
+                    attrs,
+                    modes,
+                    lambda feed_id, attr, mode: pool.submit(
+                        self.run_task, feeds[feed_id], attr, mode
+                    ),
+                    lambda future: (future.result(), None),
+                )
+        self.sink.close()
+        return self.sink
@@ -0,0 +1,222 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Throughput and determinism of embedding / gather per token id workload.
+
+Usage:
+    python id_workload_benchmark.py [--ops embedding gather] \
+        [--workloads uniform zipf hot_key_sorted all_same] \
+        [--vocab 56200] [--num_ids 4096] [--dim 12288] [--dtype float16] \
+        [--repeats 10] [--record_dir DIR]
+
+For every op and workload of token_ids.py the forward + backward pass
+(the weight grad is a scatter add over the ids) of paddle and torch is
+timed like benchmark.py does. The backward pass is then repeated
+--repeats times on the same inputs and every weight grad is compared
+bitwise with the first one. The report shows the runs that differ and
+their largest difference next to the duplicate statistics of the ids.
+Duplicate heavy workloads are where atomic accumulation makes the grad
+nondeterministic.
+"""
+import argparse
+
+import numpy as np
+from benchmark import PERCENTILES, summarize, time_call
+from records import RecordStore
+from token_ids import all_workloads, generate_ids, id_stats
+from utils import convert_dtype_to_torch_type
+
+import paddle
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+def _paddle_call(op, np_ids, np_weight, np_dout, dtype):
+    def to_tensor(x):
+        t = paddle.to_tensor(
+            x, dtype=dtype if dtype != "bfloat16" else "float32", place="gpu"
+        )
+        return paddle.cast(t, dtype="uint16") if dtype == "bfloat16" else t
+
+    ids = paddle.to_tensor(np_ids, place="gpu")
+    weight = to_tensor(np_weight)
+    weight.stop_gradient = False
+    dout = to_tensor(np_dout)
+
+    def call():
+        if op == "embedding":
+            out = paddle.nn.functional.embedding(ids, weight)
+        else:
+            out = paddle.gather(weight, ids, axis=0)
+        (grad,) = paddle.grad([out], [weight], grad_outputs=[dout])
+        return grad
+
+    return call
+
+
+def _torch_call(op, np_ids, np_weight, np_dout, dtype):
+    torch_dtype = convert_dtype_to_torch_type(dtype)
+    ids = torch.tensor(np_ids, device="cuda")
+    weight = torch.tensor(
+        np_weight, device="cuda", dtype=torch_dtype, requires_grad=True
+    )
+    dout = torch.tensor(np_dout, device="cuda", dtype=torch_dtype)
+
+    def call():
+        if op == "embedding":
+            out = torch.nn.functional.embedding(ids, weight)
+        else:
+            out = torch.index_select(weight, 0, ids)
+        (grad,) = torch.autograd.grad([out], [weight], grad_outputs=[dout])
+        return grad
+
+    return call
+
+
+def _numpy(framework, x):
+    if framework == "torch":
+        return x.detach().to(dtype=torch.float32).cpu().numpy()
+    if x.dtype == paddle.bfloat16:
+        x = paddle.cast(x, dtype="float32")
+    return x.numpy().astype(np.float32)
+
+
+def determinism(framework, call, repeats):
+    """(runs whose grad differs from the first run, largest difference)"""
+    baseline = _numpy(framework, call())
+    mismatch, max_diff = 0, 0.0
+    for _ in range(repeats - 1):
+        grad = _numpy(framework, call())
+        if not np.array_equal(grad, baseline, equal_nan=True):
+            mismatch += 1
+            max_diff = max(max_diff, float(np.nanmax(np.abs(grad - baseline))))
+    return mismatch, max_diff
+
+
+def benchmark_workloads(args):
+    frameworks = [fw for fw in args.frameworks if fw != "torch" or torch]
+    element_size = 4 if args.dtype == "float32" else 2
+    records = []
+    for workload in args.workloads:
+        rng = np.random.RandomState(args.seed)
+        np_ids = generate_ids(
+            workload, 0, args.vocab, [args.num_ids], rng
+        ).astype("int64")
+        np_weight = (
+            rng.random_sample([args.vocab, args.dim]).astype("float32") - 0.5
+        )
+        np_dout = (
+            rng.random_sample([args.num_ids, args.dim]).astype("float32") - 0.5
+        )
+        if args.dtype == "float16":
+            np_weight = np_weight.astype("float16")
+            np_dout = np_dout.astype("float16")
+        stats = id_stats(np_ids)
+        # forward reads the rows and writes out, backward reads dout and
+        # zero fills plus scatters into the whole grad table
+        nbytes = (3 * args.num_ids + args.vocab) * args.dim * element_size
+        for op in args.ops:
+            for framework in frameworks:
+                make_call = _torch_call if framework == "torch" else _paddle_call
+                call = make_call(op, np_ids, np_weight, np_dout, args.dtype)
+                synchronize = (
+                    torch.cuda.synchronize
+                    if framework == "torch"
+                    else paddle.device.cuda.synchronize
+                )
+                times = time_call(call, synchronize, args.warmup, args.iters)
+                record = summarize(
+                    "{}_{}".format(op, workload),
+                    framework,
+                    args.dtype,
+                    times,
+                    nbytes,
+                    None,
+                )
+                mismatch, max_diff = determinism(framework, call, args.repeats)
+                record.update(stats)
+                record["workload"] = workload
+                record["repeats"] = args.repeats
+                record["nondeterministic_runs"] = mismatch
+                record["max_run_diff"] = max_diff
+                records.append(record)
+                del call
+    return records
+
+
+def print_records(records):
+    tail = "p{}".format(PERCENTILES[-1])
+    header = "{:<28} {:<7} {:>8} {:>9} {:>10} {:>10} {:>9} {:>11} {:>12}".format(
+        "case", "fw", "unique", "max dup", "p50(ms)", tail + "(ms)", "GB/s",
+        "nondet runs", "max run diff",
+    )
+    print(header)
+    print("-" * len(header))
+    for r in records:
+        print(
+            "{:<28} {:<7} {:>8} {:>9} {:>10.4f} {:>10.4f} {:>9.1f} {:>11} {:>12.3g}".format(
+                r["case"][:28],
+                r["framework"],
+                r["unique"],
+                r["max_count"],
+                r["p50_ms"],
+                r[tail + "_ms"],
+                r["gbps"],
+                "{}/{}".format(r["nondeterministic_runs"], r["repeats"] - 1),
+                r["max_run_diff"],
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="token id workload benchmark")
+    parser.add_argument(
+        "--ops", nargs="+", default=["embedding", "gather"],
+        choices=["embedding", "gather"],
+    )
+    parser.add_argument("--workloads", nargs="+", default=all_workloads())
+    parser.add_argument(
+        "--frameworks", nargs="+", default=["torch", "paddle"]
+    )
+    parser.add_argument("--vocab", type=int, default=56200)
+    parser.add_argument("--num_ids", type=int, default=4096)
+    parser.add_argument("--dim", type=int, default=12288)
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16", "bfloat16"],
+    )
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    records = benchmark_workloads(args)
+    print_records(records)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for record in records:
+            store.append("benchmark", record)
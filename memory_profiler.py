@@ -0,0 +1,298 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-case, per-phase peak memory of paddle, torch and the host.
+
+Usage (from the test directory, like benchmark.py):
+    cd test_layernorm
+    python ../memory_profiler.py test_layernorm_develop.py \
+        [--cases Case1] [--scratch_ratio 2.0] [--record_dir DIR]
+
+ApiTest cases are split into the phases inputs (numpy generation),
+reference (torch, or the numpy oracle of the api), paddle and compare;
+hand-written cases into setUp (npz load + torch) and test_eager_accuracy
+(paddle + compare). For every phase the profiler
+records the peak allocated and reserved device memory of both frameworks,
+the peak of host memory traced by tracemalloc (numpy buffers included)
+and the process RSS.
+
+The theoretical footprint of a case is the size of its inputs, out_grads,
+outputs and grads at the device dtype. Cases whose device peak is more
+than --scratch_ratio times that are marked as scratch heavy, and the
+largest peak gives the number of such workers one device can hold.
+"""
+import argparse
+import contextlib
+import os
+import re
+import resource
+import tracemalloc
+
+import numpy as np
+from api_test import ApiTest, case_numpy_arrays, flatten, load_test_cases
+from records import RecordStore
+from tensor_arena import MemoryPlanner
+
+import paddle
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+DEVICE_ELEMENT_SIZE = {"float32": 4, "float16": 2, "bfloat16": 2}
+
+
+def _rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _synchronize(framework):
+    if framework == "torch":
+        torch.cuda.synchronize()
+    else:
+        paddle.device.cuda.synchronize()
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self.frameworks = ["paddle"] if torch is None else ["torch", "paddle"]
+        self.records = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, case_name, phase):
+        record = {"case": case_name, "phase": phase}
+        for fw in self.frameworks:
+            record[fw + "_start"] = MemoryPlanner.allocated(fw)
+            record[fw + "_peak_is_cumulative"] = not MemoryPlanner.reset_peak(fw)
+        tracemalloc.reset_peak()
+        host_start = tracemalloc.get_traced_memory()[0]
+        rss_start = _rss()
+        try:
+            yield record
+        finally:
+            for fw in self.frameworks:
+                _synchronize(fw)
+                allocated, reserved = MemoryPlanner.peak_allocated_and_reserved(
+                    fw
+                )
+                record[fw + "_peak_allocated"] = int(allocated)
+                record[fw + "_peak_reserved"] = int(reserved)
+            record["host_peak_traced"] = (
+                tracemalloc.get_traced_memory()[1] - host_start
+            )
+            record["rss_start"] = rss_start
+            record["rss_end"] = _rss()
+            # linux reports ru_maxrss in KB, it is the peak of the process
+            record["rss_max"] = (
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            )
+            self.records.append(record)
+
+
+def _device_nbytes(arrays, dtype):
+    element_size = DEVICE_ELEMENT_SIZE.get(dtype)
+    total = 0
+    for x in arrays:
+        if element_size is not None and np.issubdtype(x.dtype, np.floating):
+            total += x.size * element_size
+        else:
+            total += x.nbytes
+    return total
+
+
+def profile_api_test(profiler, cls):
+    name = cls.__name__
+    cls.setUpClass()
+    case = cls()
+    with profiler.phase(name, "inputs"):
+        case.setUp()
+        case.check_custom_config()
+    with profiler.phase(name, "reference"):
+        ref_outputs_np, ref_gradouts_np, reference = case.cal_reference_res_np()
+    with profiler.phase(name, "paddle"):
+        pd_outputs_np, pd_gradouts_np = case.cal_paddle_eager_res_np()
+    threshold = case.get_default_threshold()
+    with profiler.phase(name, "compare"):
+        try:
+            case.compare_eager_res(
+                pd_outputs_np,
+                pd_gradouts_np,
+                ref_outputs_np,
+                ref_gradouts_np,
+                threshold["atol"],
+                threshold["rtol"],
+                reference,
+            )
+        except AssertionError:
+            pass
+    results = flatten(ref_outputs_np) + flatten(ref_gradouts_np)
+    return case.dtype, _device_nbytes(
+        case_numpy_arrays(case) + results, case.dtype
+    )
+
+
+def profile_legacy_test(profiler, cls):
+    name = cls.__name__
+    case = cls()
+    with profiler.phase(name, "setUp"):
+        case.setUp()
+    with profiler.phase(name, "test_eager_accuracy"):
+        try:
+            case.test_eager_accuracy()
+        except AssertionError:
+            pass
+    arrays = [
+        v
+        for k, v in vars(case).items()
+        if k.startswith("np_") and isinstance(v, np.ndarray)
+    ]
+    for k in ("out_torch", "out_grads_torch"):
+        arrays += [
+            x for x in flatten([getattr(case, k, [])])
+            if isinstance(x, np.ndarray)
+        ]
+    dtype = getattr(case, "dtype", None)
+    return dtype, _device_nbytes(arrays, dtype)
+
+
+def profile_cases(case_classes):
+    profiler = MemoryProfiler()
+    summary = []
+    for cls in case_classes:
+        first = len(profiler.records)
+        if issubclass(cls, ApiTest):
+            dtype, theoretical = profile_api_test(profiler, cls)
+        else:
+            dtype, theoretical = profile_legacy_test(profiler, cls)
+        phases = profiler.records[first:]
+        for record in phases:
+            record["dtype"] = dtype
+            record["theoretical"] = theoretical
+        summary.append(
+            {
+                "case": cls.__name__,
+                "dtype": dtype,
+                "theoretical": theoretical,
+                "device_peak": {
+                    fw: _case_peak([_phase_peak(r, fw) for r in phases])
+                    for fw in profiler.frameworks
+                },
+                "host_peak": max(r["host_peak_traced"] for r in phases),
+            }
+        )
+    return profiler.records, summary
+
+
+def _phase_peak(record, fw):
+    """Device memory a phase allocated on top of what it started with, None
+    if the peak could not be reset and includes the phases before it."""
+    if record[fw + "_peak_is_cumulative"]:
+        return None
+    return record[fw + "_peak_allocated"] - record[fw + "_start"]
+
+
+def _case_peak(peaks):
+    return None if None in peaks else max(peaks)
+
+
+def print_report(records, summary, scratch_ratio):
+    mb = 2**20
+    frameworks = [fw for fw in ("torch", "paddle") if fw + "_start" in records[0]]
+    header = "{:<44} {:<20}".format("case", "phase")
+    for fw in frameworks:
+        header += " {:>12} {:>12}".format(fw + " alloc", fw + " resv")
+    header += " {:>12} {:>12}".format("host peak", "rss delta")
+    print(header + "   (MB)")
+    print("-" * len(header))
+    for r in records:
+        line = "{:<44} {:<20}".format(r["case"][:44], r["phase"])
+        for fw in frameworks:
+            line += " {:>12.1f} {:>12.1f}".format(
+                r[fw + "_peak_allocated"] / mb, r[fw + "_peak_reserved"] / mb
+            )
+        line += " {:>12.1f} {:>12.1f}".format(
+            r["host_peak_traced"] / mb, (r["rss_end"] - r["rss_start"]) / mb
+        )
+        print(line)
+
+    print()
+    header = "{:<44} {:>14} {:>14} {:>8}".format(
+        "case", "theory (MB)", "peak (MB)", "ratio"
+    )
+    print(header)
+    print("-" * len(header))
+    largest = 0
+    for s in summary:
+        peaks = list(s["device_peak"].values())
+        if None in peaks:
+            # includes the cases before this one, like perf_gate reports it
+            print(
+                "{:<44} {:>14.1f} {:>14} {:>8}".format(
+                    s["case"][:44], s["theoretical"] / mb, "n/a", "n/a"
+                )
+            )
+            continue
+        peak = max(peaks)
+        largest = max(largest, peak)
+        ratio = peak / s["theoretical"] if s["theoretical"] else float("inf")
+        print(
+            "{:<44} {:>14.1f} {:>14.1f} {:>8.2f}{}".format(
+                s["case"][:44],
+                s["theoretical"] / mb,
+                peak / mb,
+                ratio,
+                "  scratch heavy" if ratio > scratch_ratio else "",
+            )
+        )
+    if largest > 0:
+        _, total = MemoryPlanner.reserved_and_total(frameworks[-1])
+        print(
+            "\nlargest case peak {:.1f} MB, {} such workers fit in {:.1f} MB "
+            "of device memory".format(
+                largest / mb, int(total // largest), total / mb
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="per-case memory profile")
+    parser.add_argument("test_file", type=str)
+    parser.add_argument("--cases", type=str, default=None)
+    parser.add_argument("--scratch_ratio", type=float, default=2.0)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    case_classes = load_test_cases(args.test_file)
+    if args.cases:
+        case_classes = [
+            cls for cls in case_classes if re.search(args.cases, cls.__name__)
+        ]
+    records, summary = profile_cases(case_classes)
+    if records:
+        print_report(records, summary, args.scratch_ratio)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for record in records:
+            record["test_file"] = args.test_file
+            store.append("memory", record)
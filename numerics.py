@@ -0,0 +1,460 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Framework free numpy helpers for low precision values.
+
+Kept out of utils.py, which imports paddle, so that result stores and
+numpy references also work in the torch only environment.
+
+Saved results use a compact encoding: a float32 array whose values are
+all exactly bfloat16 (e.g. an upcast bf16 output) is stored as its uint16
+bit patterns, one whose values are all exactly float16 as float16. The
+encoding of every array is kept next to it and the float32 values are
+restored only when the array is read back for comparison.
+
+ulp_stats measures the distance of two results in units in the last place
+of a low precision dtype, streaming over them in chunks. drift_stats adds
+the absolute and relative error distribution in the same pass.
+"""
+import json
+
+import numpy as np
+
+# arrays are checked on a prefix first so float32 results give up early
+_PROBE_SIZE = 4096
+ENCODINGS_KEY = "__encodings__"
+
+
+def convert_float_to_bfloat16_bits(x):
+    """Round float32 values to bfloat16 (nearest even), return the uint16 bits."""
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    bits = x.view(np.uint32)
+    rounding_bias = ((bits >> 16) & 1) + np.uint32(0x7FFF)
+    rounded = (bits + rounding_bias) >> 16
+    # rounding carries the payload of some NaNs into the sign and exponent,
+    # keep them quiet NaNs of the same sign instead
+    sign = (bits >> 16) & np.uint32(0x8000)
+    return np.where(
+        np.isnan(x), np.uint32(0x7FC0) | sign, rounded
+    ).astype(np.uint16)
+
+
+def convert_bfloat16_bits_to_float(bits):
+    """Widen uint16 bfloat16 bit patterns to the exactly equal float32 values."""
+    bits = np.ascontiguousarray(bits, dtype=np.uint16)
+    return (bits.astype(np.uint32) << 16).view(np.float32)
+
+
+def np_round_to_dtype(x, dtype):
+    """Return the float32/float16 values a device tensor of dtype really holds."""
+    if dtype == "bfloat16":
+        return convert_bfloat16_bits_to_float(convert_float_to_bfloat16_bits(x))
+    return np.asarray(x).astype(dtype)
+
+
+def _is_bfloat16(x):
+    return not np.any(x.view(np.uint32) & np.uint32(0xFFFF))
+
+
+def _is_float16(x):
+    with np.errstate(over="ignore"):
+        return np.array_equal(
+            x.astype(np.float16).astype(np.float32), x, equal_nan=True
+        )
+
+
+def encode_compact(x):
+    """Narrowest lossless encoding of x, returns (payload, encoding).
+
+    encoding is "bfloat16" (payload holds the uint16 bits), "float16", or
+    None when x is stored as it is.
+    """
+    x = np.asarray(x)
+    if x.dtype != np.float32:
+        return x, None
+    x = np.ascontiguousarray(x)
+    probe = x.reshape(-1)[:_PROBE_SIZE]
+    if _is_bfloat16(probe) and _is_bfloat16(x):
+        return (x.view(np.uint32) >> 16).astype(np.uint16), "bfloat16"
+    if _is_float16(probe) and _is_float16(x):
+        return x.astype(np.float16), "float16"
+    return x, None
+
+
+def decode_compact(payload, encoding):
+    """Inverse of encode_compact, gives back the float32 values."""
+    if encoding == "bfloat16":
+        return convert_bfloat16_bits_to_float(payload)
+    if encoding == "float16":
+        return np.asarray(payload).astype(np.float32)
+    return payload
+
+
+class CompactResults:
+    """Read side of save_results, decodes an array when it is accessed."""
+
+    def __init__(self, npz):
+        self._npz = npz
+        self._encodings = {}
+        if ENCODINGS_KEY in npz.files:
+            self._encodings = json.loads(str(npz[ENCODINGS_KEY]))
+
+    @property
+    def files(self):
+        return [k for k in self._npz.files if k != ENCODINGS_KEY]
+
+    def __contains__(self, key):
+        return key in self.files
+
+    def __getitem__(self, key):
+        return decode_compact(self._npz[key], self._encodings.get(key))
+
+
+def save_results(path, **arrays):
+    """np.savez with the compact encoding of every array."""
+    payloads, encodings = {}, {}
+    for key, x in arrays.items():
+        payloads[key], encoding = encode_compact(x)
+        if encoding is not None:
+            encodings[key] = encoding
+    np.savez(path, **payloads, **{ENCODINGS_KEY: json.dumps(encodings)})
+
+
+def load_results(path):
+    """np.load of save_results (or plain np.savez) files."""
+    return CompactResults(np.load(path))
+
+
+# smallest normal numbers, differences below them are not counted in ULP
+_ULP_FLOOR = {
+    "float16": float(np.finfo(np.float16).tiny),
+    "bfloat16": 2.0**-126,
+    "float32": float(np.finfo(np.float32).tiny),
+}
+
+
+def to_ordered_int(x, dtype):
+    """Map values to integers whose differences are distances in ULP of dtype.
+
+    The sign-magnitude bit patterns of dtype become two's complement like
+    integers, so that +0 and -0 are both 0 and adjacent values differ by 1.
+    """
+    if dtype == "bfloat16":
+        bits, nbits = convert_float_to_bfloat16_bits(x).view(np.int16), 16
+    elif dtype == "float16":
+        bits, nbits = np.asarray(x).astype(np.float16).view(np.int16), 16
+    else:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        bits, nbits = x.view(np.int32), 32
+    bits = bits.astype(np.int64)
+    magnitude = bits & ((1 << (nbits - 1)) - 1)
+    return np.where(bits < 0, -magnitude, bits)
+
+
+class UlpStats:
+    """ULP distance statistics of two arrays, accumulated chunk by chunk.
+
+    histogram[0] counts exact matches and histogram[k] the distances in
+    [2**(k-1), 2**k). NaN in both arrays is a match, NaN in only one is
+    counted in nan_mismatch.
+    """
+
+    NUM_BUCKETS = 34
+
+    def __init__(self, dtype, floor=None):
+        self.dtype = dtype
+        self.floor = _ULP_FLOOR.get(dtype, 0.0) if floor is None else floor
+        self.histogram = np.zeros(self.NUM_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.max_ulp = 0
+        self.max_index = -1
+        self.nan_mismatch = 0
+
+    def update(self, a, b, offset=0):
+        a = np.asarray(a, dtype=np.float32).reshape(-1)
+        b = np.asarray(b, dtype=np.float32).reshape(-1)
+        dist = np.abs(
+            to_ordered_int(a, self.dtype) - to_ordered_int(b, self.dtype)
+        )
+        nan_a, nan_b = np.isnan(a), np.isnan(b)
+        dist[nan_a & nan_b] = 0
+        mismatch = nan_a ^ nan_b
+        self.nan_mismatch += int(np.count_nonzero(mismatch))
+        dist[mismatch] = 0
+        with np.errstate(invalid="ignore"):
+            dist[np.abs(a - b) <= self.floor] = 0
+        # frexp gives the bit length of the distance, 0 for 0
+        buckets = np.frexp(dist.astype(np.float64))[1]
+        self.histogram += np.bincount(buckets, minlength=self.NUM_BUCKETS)
+        if dist.size:
+            i = int(np.argmax(dist))
+            if dist[i] > self.max_ulp:
+                self.max_ulp = int(dist[i])
+                self.max_index = offset + i
+        self.count += dist.size
+        return self
+
+    def percentile(self, q):
+        """Upper bound of the q-th percentile distance, from the histogram."""
+        if self.count == 0:
+            return 0
+        cumulative = np.cumsum(self.histogram)
+        k = int(np.searchsorted(cumulative, q / 100 * self.count))
+        return 0 if k == 0 else min(2**k - 1, self.max_ulp)
+
+    def histogram_dict(self):
+        ret = {}
+        for k in np.nonzero(self.histogram)[0]:
+            low, high = (0, 0) if k == 0 else (2 ** (k - 1), 2**k - 1)
+            name = str(low) if low == high else "{}-{}".format(low, high)
+            ret[name] = int(self.histogram[k])
+        return ret
+
+    def summary(self):
+        return {
+            "dtype": self.dtype,
+            "count": self.count,
+            "max_ulp": self.max_ulp,
+            "max_index": self.max_index,
+            "p50_ulp": self.percentile(50),
+            "p90_ulp": self.percentile(90),
+            "p99_ulp": self.percentile(99),
+            "nan_mismatch": self.nan_mismatch,
+            "histogram": self.histogram_dict(),
+        }
+
+
+def ulp_stats(a, b, dtype, chunk_size=1 << 22, floor=None):
+    """UlpStats of a against b in one pass of chunk_size elements at a time.
+
+    Works on memory mapped results without loading them whole.
+    """
+    if a.shape != b.shape:
+        raise ValueError(
+            "ulp_stats needs equal shapes, got {} and {}".format(a.shape, b.shape)
+        )
+    a, b = a.reshape(-1), b.reshape(-1)
+    stats = UlpStats(dtype, floor)
+    for start in range(0, a.size, chunk_size):
+        stats.update(
+            a[start : start + chunk_size], b[start : start + chunk_size], start
+        )
+    return stats
+
+
+class DriftStats:
+    """Error distribution of a against a reference b, chunk by chunk.
+
+    Keeps max / mean / rms of the absolute error, max relative error, a
+    decade histogram of the relative error (rel_histogram[0] counts
+    errors below REL_EDGES[0], the last bucket those >= 1) and the
+    UlpStats of ulp_dtype, all from the same pass over the data.
+    Non-finite errors are left to the nan_mismatch count of the ULP part.
+    """
+
+    REL_EDGES = 10.0 ** np.arange(-8, 1)
+
+    def __init__(self, ulp_dtype):
+        self.ulp = UlpStats(ulp_dtype)
+        self.rel_histogram = np.zeros(len(self.REL_EDGES) + 1, dtype=np.int64)
+        self.max_abs = 0.0
+        self.max_rel = 0.0
+        self.sum_abs = 0.0
+        self.sum_sq = 0.0
+        self.count = 0
+
+    def update(self, a, b, offset=0):
+        a64 = np.asarray(a, dtype=np.float64).reshape(-1)
+        b64 = np.asarray(b, dtype=np.float64).reshape(-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            diff = np.abs(a64 - b64)
+            rel = np.where(b64 != 0, diff / np.abs(b64), diff)
+        finite = np.isfinite(diff) & np.isfinite(rel)
+        diff, rel = diff[finite], rel[finite]
+        if diff.size:
+            self.max_abs = max(self.max_abs, float(diff.max()))
+            self.max_rel = max(self.max_rel, float(rel.max()))
+        self.sum_abs += float(diff.sum())
+        self.sum_sq += float(np.dot(diff, diff))
+        self.count += diff.size
+        self.rel_histogram += np.bincount(
+            np.searchsorted(self.REL_EDGES, rel, side="right"),
+            minlength=self.rel_histogram.size,
+        )
+        self.ulp.update(a, b, offset)
+        return self
+
+    def rel_histogram_dict(self):
+        names = ["<{:.0e}".format(self.REL_EDGES[0])]
+        names += [
+            "{:.0e}-{:.0e}".format(low, high)
+            for low, high in zip(self.REL_EDGES[:-1], self.REL_EDGES[1:])
+        ]
+        names.append(">={:.0e}".format(self.REL_EDGES[-1]))
+        return {
+            name: int(n) for name, n in zip(names, self.rel_histogram) if n
+        }
+
+    def summary(self):
+        ret = {
+            "max_abs": self.max_abs,
+            "mean_abs": self.sum_abs / max(self.count, 1),
+            "rms": float(np.sqrt(self.sum_sq / max(self.count, 1))),
+            "max_rel": self.max_rel,
+            "rel_histogram": self.rel_histogram_dict(),
+            # UlpStats counts nan mismatches as distance 0, they are not exact
+            "exact_fraction": float(
+                (self.ulp.histogram[0] - self.ulp.nan_mismatch)
+                / max(self.ulp.count, 1)
+            ),
+        }
+        ulp = self.ulp.summary()
+        ret["ulp_dtype"] = ulp.pop("dtype")
+        ret["ulp_histogram"] = ulp.pop("histogram")
+        ret.update(ulp)
+        return ret
+
+
+def drift_stats(a, b, ulp_dtype, chunk_size=1 << 22):
+    """DriftStats of a against the reference b, chunk_size elements at a time."""
+    if a.shape != b.shape:
+        raise ValueError(
+            "drift_stats needs equal shapes, got {} and {}".format(a.shape, b.shape)
+        )
+    a, b = a.reshape(-1), b.reshape(-1)
+    stats = DriftStats(ulp_dtype)
+    for start in range(0, a.size, chunk_size):
+        stats.update(
+            a[start : start + chunk_size], b[start : start + chunk_size], start
+        )
+    return stats
+
+
+def screen_blocks(
+    a, b, atol, rtol, block_size=1 << 18, samples_per_block=64, seed=2023
+):
+    """Blocks of a and b (flattened) that may fail allclose(a, b, atol, rtol).
+
+    Every block gets two cheap tests that allclose always passes:
+    - a stratified random sample of samples_per_block elements is compared
+      elementwise;
+    - its moments are compared against the bounds allclose implies, with
+      S1 = sum|b|, S2 = sum b^2 and n elements:
+          |sum a - sum b|      <= n atol + rtol S1
+          |sum a^2 - sum b^2|  <= n atol^2 + 2 atol (1 + rtol) S1
+                                  + rtol (2 + rtol) S2
+          max|a| <= (1 + rtol) max|b| + atol, (1 - rtol) max|b| <= max|a| + atol
+    The moments are float64 sums streamed block by block, no temporaries
+    of the size of the arrays are made. Returns [(start, stop), ...] of the
+    blocks that failed a test (NaN fails them all) and need an exact check.
+
+    The moment bounds grow with n, so they catch biased or widespread
+    errors and large outliers; small errors confined to a few elements
+    that the sample misses can pass the screen.
+    """
+    a, b = a.reshape(-1), b.reshape(-1)
+    rng = np.random.default_rng(seed)
+    suspicious = []
+    for start in range(0, a.size, block_size):
+        stop = min(start + block_size, a.size)
+        a_blk, b_blk = a[start:stop], b[start:stop]
+        n = stop - start
+        idx = rng.integers(0, n, size=min(samples_per_block, n))
+        sample_ok = np.all(
+            np.isclose(a_blk[idx], b_blk[idx], rtol, atol, equal_nan=True)
+        )
+        sum_a = a_blk.sum(dtype=np.float64)
+        sum_b = b_blk.sum(dtype=np.float64)
+        s1 = np.abs(b_blk).sum(dtype=np.float64)
+        sq_a = np.square(a_blk, dtype=np.float64).sum()
+        s2 = np.square(b_blk, dtype=np.float64).sum()
+        max_a = max(float(a_blk.max()), -float(a_blk.min()))
+        max_b = max(float(b_blk.max()), -float(b_blk.min()))
+        moments_ok = (
+            abs(sum_a - sum_b) <= n * atol + rtol * s1
+            and abs(sq_a - s2)
+            <= n * atol * atol
+            + 2 * atol * (1 + rtol) * s1
+            + rtol * (2 + rtol) * s2
+            and max_a <= (1 + rtol) * max_b + atol
+            and (1 - rtol) * max_b <= max_a + atol
+        )
+        if not (sample_ok and moments_ok):
+            suspicious.append((start, stop))
+    return suspicious
+
+
+def shard_range(numel, rank, world_size):
+    """[start, stop) of the rank-th of world_size near equal element shards."""
+    return numel * rank // world_size, numel * (rank + 1) // world_size
+
+
+def allclose_stats(a, b, atol, rtol, chunk_size=1 << 22):
+    """Scalar statistics of allclose(a, b, atol, rtol), streamed in chunks.
+
+    Returns maxes = [max |a - b|, max |a - b| / |b|] and sums =
+    [violations, nan mismatches, count], which stay meaningful when they
+    are reduced (max and sum) over the shards of a larger result.
+    """
+    a, b = a.reshape(-1), b.reshape(-1)
+    maxes = np.zeros(2, dtype=np.float64)
+    sums = np.zeros(3, dtype=np.float64)
+    for start in range(0, a.size, chunk_size):
+        a_c = np.asarray(a[start : start + chunk_size], dtype=np.float64)
+        b_c = np.asarray(b[start : start + chunk_size], dtype=np.float64)
+        nan_a, nan_b = np.isnan(a_c), np.isnan(b_c)
+        both, mismatch = nan_a & nan_b, nan_a ^ nan_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            diff = np.abs(a_c - b_c)
+            ok = (diff <= atol + rtol * np.abs(b_c)) | both
+            diff[both | mismatch] = 0
+            rel = np.where(b_c != 0, diff / np.abs(b_c), 0)
+        if diff.size:
+            maxes[0] = max(maxes[0], np.nanmax(diff))
+            maxes[1] = max(maxes[1], np.nanmax(rel))
+        sums += [np.count_nonzero(~ok), np.count_nonzero(mismatch), a_c.size]
+    return maxes, sums
+
+
+def _untouched_runs(rows, height):
+    """[start, stop) runs of the rows in [0, height) that are not in rows."""
+    bounds = np.concatenate(([-1], rows, [height]))
+    gaps = np.flatnonzero(np.diff(bounds) > 1)
+    return [(int(bounds[i] + 1), int(bounds[i + 1])) for i in gaps]
+
+
+class SparseRows:
+    """A row sparse gradient, e.g. the weight grad of an embedding.
+
+    rows are the sorted unique row ids of the lookups, values the dense
+    rows they select (values[i] is row rows[i]) and height the number of
+    rows of the dense gradient. nonzero_untouched counts the rows outside
+    of rows that are not all zero, they should not have been written.
+    """
+
+    def __init__(self, rows, values, height, nonzero_untouched=0):
+        self.rows = rows
+        self.values = values
+        self.height = height
+        self.nonzero_untouched = nonzero_untouched
+
+    @classmethod
+    def from_dense(cls, dense, ids):
+        dense = np.asarray(dense)
+        rows = np.unique(np.asarray(ids).reshape(-1))
+        rows = rows[(rows >= 0) & (rows < dense.shape[0])]
+        nonzero_untouched = 0
+        for start, stop in _untouched_runs(rows, dense.shape[0]):
+            block = dense[start:stop].reshape(stop - start, -1)
+            nonzero_untouched += int(np.count_nonzero(block.any(axis=1)))
+        return cls(rows, dense[rows], dense.shape[0], nonzero_untouched)
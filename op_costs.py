@@ -0,0 +1,31 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Framework free byte counts of ops, shared by the get_bytes() of the test
+cases and the dedicated benchmark scripts so both report the same GB/s.
+"""
+
+
+def layer_norm_bytes(rows, hidden, dtype, backward=True):
+    """Bytes layer_norm over the last axis reads and writes at least.
+
+    The forward pass reads x, weight and bias and writes out plus the
+    float32 mean and variance of every row. The backward pass reads dout,
+    x, weight, mean and variance and writes dx, dweight and dbias.
+    """
+    element_size = 4 if dtype == "float32" else 2
+    numel = rows * hidden
+    nbytes = (2 * numel + 2 * hidden) * element_size + 2 * rows * 4
+    if backward:
+        nbytes += (3 * numel + 3 * hidden) * element_size + 2 * rows * 4
+    return nbytes
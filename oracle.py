@@ -0,0 +1,293 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""float64 numpy reference implementations ("oracles") of paddle apis.
+
+An oracle is registered per api name with a forward and an analytic grad:
+
+    forward(inputs, **attrs) -> list of outputs
+    grad(inputs, outputs, out_grads, **attrs) -> list of grads, one per input
+
+inputs, outputs and out_grads are float64 numpy arrays. ApiTest uses the
+oracle of self.api (with self.api_attrs) instead of torch when one is
+registered, so those cases never touch torch.
+"""
+import numpy as np
+
+_ORACLES = {}
+
+
+class Oracle:
+    def __init__(self, api, forward, grad=None):
+        self.api = api
+        self.forward = forward
+        self.grad = grad
+
+    def __call__(self, inputs, out_grads=None, **attrs):
+        outputs = self.forward(inputs, **attrs)
+        if out_grads is None:
+            return outputs, []
+        if self.grad is None:
+            raise NotImplementedError(
+                f"The oracle of {self.api} has no grad function."
+            )
+        return outputs, self.grad(inputs, outputs, out_grads, **attrs)
+
+
+def register_oracle(api, forward, grad=None):
+    if api in _ORACLES:
+        raise KeyError(f"An oracle of {api} is already registered.")
+    _ORACLES[api] = Oracle(api, forward, grad)
+    return _ORACLES[api]
+
+
+def get_oracle(api):
+    return _ORACLES.get(api)
+
+
+def unbroadcast(grad, shape):
+    """Sum a broadcast gradient back to the shape of its input."""
+    shape = tuple(shape)
+    ndim_diff = grad.ndim - len(shape)
+    if ndim_diff > 0:
+        grad = grad.sum(axis=tuple(range(ndim_diff)))
+    axes = tuple(
+        i for i, n in enumerate(shape) if n == 1 and grad.shape[i] != 1
+    )
+    if axes:
+        grad = grad.sum(axis=axes, keepdims=True)
+    return grad.reshape(shape)
+
+
+def _add_grad(inputs, outputs, out_grads):
+    x, y = inputs
+    (dout,) = out_grads
+    return [unbroadcast(dout, x.shape), unbroadcast(dout, y.shape)]
+
+
+def _multiply_grad(inputs, outputs, out_grads):
+    x, y = inputs
+    (dout,) = out_grads
+    return [unbroadcast(dout * y, x.shape), unbroadcast(dout * x, y.shape)]
+
+
+def _divide_grad(inputs, outputs, out_grads):
+    x, y = inputs
+    (dout,) = out_grads
+    return [
+        unbroadcast(dout / y, x.shape),
+        unbroadcast(-dout * x / (y * y), y.shape),
+    ]
+
+
+def _pow_forward(inputs, y=None):
+    if y is None:
+        return [np.power(inputs[0], inputs[1])]
+    return [np.power(inputs[0], y)]
+
+
+def _pow_grad(inputs, outputs, out_grads, y=None):
+    (dout,) = out_grads
+    x = inputs[0]
+    if y is not None:
+        return [dout * y * np.power(x, y - 1)]
+    y = inputs[1]
+    (out,) = outputs
+    return [
+        unbroadcast(dout * y * np.power(x, y - 1), x.shape),
+        unbroadcast(dout * out * np.log(x), y.shape),
+    ]
+
+
+def _scale_forward(inputs, scale=1.0, bias=0.0, bias_after_scale=True):
+    (x,) = inputs
+    if bias_after_scale:
+        return [x * scale + bias]
+    return [(x + bias) * scale]
+
+
+def _scale_grad(
+    inputs, outputs, out_grads, scale=1.0, bias=0.0, bias_after_scale=True
+):
+    return [out_grads[0] * scale]
+
+
+def _maximum_grad(inputs, outputs, out_grads):
+    # same tie breaking as paddle: the grad goes to y when x == y
+    x, y = inputs
+    (dout,) = out_grads
+    return [
+        unbroadcast(dout * (x > y), x.shape),
+        unbroadcast(dout * (x <= y), y.shape),
+    ]
+
+
+register_oracle(
+    "paddle.add",
+    lambda inputs: [inputs[0] + inputs[1]],
+    _add_grad,
+)
+register_oracle(
+    "paddle.multiply",
+    lambda inputs: [inputs[0] * inputs[1]],
+    _multiply_grad,
+)
+register_oracle(
+    "paddle.divide",
+    lambda inputs: [inputs[0] / inputs[1]],
+    _divide_grad,
+)
+register_oracle("paddle.pow", _pow_forward, _pow_grad)
+register_oracle(
+    "paddle.sqrt",
+    lambda inputs: [np.sqrt(inputs[0])],
+    lambda inputs, outputs, out_grads: [0.5 * out_grads[0] / outputs[0]],
+)
+register_oracle(
+    "paddle.sin",
+    lambda inputs: [np.sin(inputs[0])],
+    lambda inputs, outputs, out_grads: [out_grads[0] * np.cos(inputs[0])],
+)
+register_oracle(
+    "paddle.cos",
+    lambda inputs: [np.cos(inputs[0])],
+    lambda inputs, outputs, out_grads: [-out_grads[0] * np.sin(inputs[0])],
+)
+register_oracle("paddle.scale", _scale_forward, _scale_grad)
+register_oracle(
+    "paddle.maximum",
+    lambda inputs: [np.maximum(inputs[0], inputs[1])],
+    _maximum_grad,
+)
+register_oracle(
+    "paddle.square",
+    lambda inputs: [np.square(inputs[0])],
+    lambda inputs, outputs, out_grads: [2.0 * inputs[0] * out_grads[0]],
+)
+
+
+def _attention_blocks(seqlen_q, seqlen_k, block_size, causal):
+    """(q_start, q_stop, k_start, k_stop) tiles; causal skips the tiles
+    above the diagonal (bottom-right aligned, like flash_attn)."""
+    offset = seqlen_k - seqlen_q
+    for q_start in range(0, seqlen_q, block_size):
+        q_stop = min(q_start + block_size, seqlen_q)
+        k_end = min(q_stop + offset, seqlen_k) if causal else seqlen_k
+        for k_start in range(0, max(k_end, 0), block_size):
+            yield q_start, q_stop, k_start, min(k_start + block_size, k_end)
+
+
+def _attention_scores(q, k, q_start, q_stop, k_start, k_stop, scale, causal):
+    # q, k: [batch, heads, seqlen, head_dim] -> [batch, heads, bq, bk]
+    s = np.matmul(q[:, :, q_start:q_stop], k[:, :, k_start:k_stop].swapaxes(-1, -2))
+    s *= scale
+    if causal:
+        offset = k.shape[2] - q.shape[2]
+        rows = np.arange(q_start, q_stop)[:, None] + offset
+        cols = np.arange(k_start, k_stop)[None, :]
+        s[..., cols > rows] = -np.inf
+    return s
+
+
+def _flash_attention_lse(q, k, v, scale, causal, block_size):
+    """Tiled causal attention with online softmax.
+
+    Only one [batch, heads, block_size, block_size] tile of scores is alive
+    at a time, so the memory is O(seqlen * block_size) instead of the
+    O(seqlen ** 2) of the full score matrix. Returns the output and the
+    logsumexp of every query row, both in [batch, heads, seqlen, ...].
+    """
+    out = np.zeros(q.shape[:3] + (v.shape[-1],), dtype=q.dtype)
+    row_max = np.full(q.shape[:3], -np.inf, dtype=q.dtype)
+    row_sum = np.zeros(q.shape[:3], dtype=q.dtype)
+    for q_start, q_stop, k_start, k_stop in _attention_blocks(
+        q.shape[2], k.shape[2], block_size, causal
+    ):
+        s = _attention_scores(
+            q, k, q_start, q_stop, k_start, k_stop, scale, causal
+        )
+        m_old = row_max[:, :, q_start:q_stop]
+        m_new = np.maximum(m_old, s.max(axis=-1))
+        # rows without any visible key yet keep -inf, exp(-inf - -inf) is nan
+        m_safe = np.where(np.isneginf(m_new), 0.0, m_new)
+        p = np.exp(s - m_safe[..., None])
+        correction = np.exp(m_old - m_safe)
+        row_sum[:, :, q_start:q_stop] = (
+            row_sum[:, :, q_start:q_stop] * correction + p.sum(axis=-1)
+        )
+        out[:, :, q_start:q_stop] = out[:, :, q_start:q_stop] * correction[
+            ..., None
+        ] + np.matmul(p, v[:, :, k_start:k_stop])
+        row_max[:, :, q_start:q_stop] = m_new
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out /= row_sum[..., None]
+        lse = row_max + np.log(row_sum)
+    # fully masked rows (seqlen_q > seqlen_k) are zero, as in flash_attn
+    out[row_sum == 0] = 0.0
+    return out, lse
+
+
+def _to_bhsd(x):
+    # paddle layout [batch, seqlen, heads, head_dim] <-> [batch, heads, seqlen, head_dim]
+    return np.ascontiguousarray(x.transpose(0, 2, 1, 3))
+
+
+def _flash_attention_forward(
+    inputs, dropout=0.0, causal=False, block_size=256
+):
+    if dropout != 0.0:
+        raise NotImplementedError(
+            "The flash_attention oracle has no dropout."
+        )
+    q, k, v = (_to_bhsd(x) for x in inputs)
+    scale = 1.0 / np.sqrt(q.shape[-1])
+    out, _ = _flash_attention_lse(q, k, v, scale, causal, block_size)
+    return [out.transpose(0, 2, 1, 3)]
+
+
+def _flash_attention_grad(
+    inputs, outputs, out_grads, dropout=0.0, causal=False, block_size=256
+):
+    # like flash_attn the probabilities are recomputed tile by tile from the
+    # logsumexp instead of being kept from the forward pass
+    q, k, v = (_to_bhsd(x) for x in inputs)
+    out, dout = _to_bhsd(outputs[0]), _to_bhsd(out_grads[0])
+    scale = 1.0 / np.sqrt(q.shape[-1])
+    _, lse = _flash_attention_lse(q, k, v, scale, causal, block_size)
+    # fully masked rows get no probability mass
+    lse[np.isneginf(lse)] = np.inf
+    delta = (dout * out).sum(axis=-1)
+    dq, dk, dv = np.zeros_like(q), np.zeros_like(k), np.zeros_like(v)
+    for q_start, q_stop, k_start, k_stop in _attention_blocks(
+        q.shape[2], k.shape[2], block_size, causal
+    ):
+        s = _attention_scores(
+            q, k, q_start, q_stop, k_start, k_stop, scale, causal
+        )
+        p = np.exp(s - lse[:, :, q_start:q_stop, None])
+        do = dout[:, :, q_start:q_stop]
+        dv[:, :, k_start:k_stop] += np.matmul(p.swapaxes(-1, -2), do)
+        dp = np.matmul(do, v[:, :, k_start:k_stop].swapaxes(-1, -2))
+        ds = p * (dp - delta[:, :, q_start:q_stop, None]) * scale
+        dq[:, :, q_start:q_stop] += np.matmul(ds, k[:, :, k_start:k_stop])
+        dk[:, :, k_start:k_stop] += np.matmul(
+            ds.swapaxes(-1, -2), q[:, :, q_start:q_stop]
+        )
+    return [x.transpose(0, 2, 1, 3) for x in (dq, dk, dv)]
+
+
+register_oracle(
+    "paddle.nn.functional.flash_attention.flash_attention",
+    _flash_attention_forward,
+    _flash_attention_grad,
+)
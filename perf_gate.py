@@ -0,0 +1,252 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Performance regression gate between two paddle builds.
+
+1. two virtualenvs, one per wheel; the trials of both builds are interleaved
+   so slow drifts of the machine hit both sides alike:
+
+    python perf_gate.py --test_file test_matmul/test_matmul_develop.py \
+        --baseline_python /venv_rel/bin/python \
+        --candidate_python /venv_dev/bin/python \
+        --trials 5 --iters 20 --output_dir perf_gate
+
+2. one environment and sequential installs, like the test_cast README:
+   run benchmark.py --frameworks paddle --record_dir DIR --tag trialN with
+   each wheel installed, then only compare the two record dirs:
+
+    python perf_gate.py --baseline_dir rel_records --candidate_dir dev_records
+
+Each trial is a separate benchmark.py process. For every case the ratio of
+candidate to baseline median latency gets a bootstrap confidence interval
+(trials are resampled, then their iterations are pooled); a case is flagged
+when the lower bound of that interval exceeds 1 + --max_slowdown, i.e. the
+slowdown is both significant and large enough to matter. Peak allocated
+memory is flagged when it grows by more than --max_mem_growth. Peaks of
+builds that can't reset the peak between cases (peak_is_cumulative) also
+cover the cases run before, those cases get no memory verdict.
+
+The record dirs are append-only, so the trials of each run are tagged
+<run_id>/trialN and only the records of --run_id are compared. It
+defaults to the time the trials start; in the compare-only mode all
+records of the dirs are compared unless --run_id is given.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+from records import RecordStore
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_trials(
+    python, test_file, record_dir, run_id, trial, cases, warmup, iters
+):
+    test_file = os.path.abspath(test_file)
+    cmd = [
+        python,
+        os.path.join(REPO_ROOT, "benchmark.py"),
+        os.path.basename(test_file),
+        "--frameworks",
+        "paddle",
+        "--warmup",
+        str(warmup),
+        "--iters",
+        str(iters),
+        "--record_dir",
+        os.path.abspath(record_dir),
+        "--tag",
+        "{}/trial{}".format(run_id, trial),
+    ]
+    if cases:
+        cmd += ["--cases", cases]
+    subprocess.run(cmd, cwd=os.path.dirname(test_file), check=True)
+
+
+def load_trials(record_dir, run_id=None):
+    """{case: {"times": [per-trial arrays of ms], "peak": [bytes],
+    "cumulative": bool}} of the records tagged <run_id>/..."""
+    cases = defaultdict(lambda: {"times": [], "peak": [], "cumulative": False})
+    for record in RecordStore(record_dir).load("benchmark"):
+        if record["framework"] != "paddle":
+            continue
+        tag = record.get("tag") or ""
+        if run_id is not None and not tag.startswith(run_id + "/"):
+            continue
+        case = cases[record["case"]]
+        case["times"].append(np.array(record["times_ms"]))
+        case["peak"].append(record.get("peak_allocated", 0))
+        if record.get("peak_is_cumulative"):
+            case["cumulative"] = True
+    return cases
+
+
+def bootstrap_ratio(baseline, candidate, n_boot=2000, alpha=0.05, seed=2023):
+    """Median(candidate) / median(baseline) with a bootstrap CI.
+
+    baseline and candidate are lists of per-trial sample arrays.
+    """
+    rng = np.random.default_rng(seed)
+
+    def resampled_median(trials):
+        picked = rng.integers(0, len(trials), size=len(trials))
+        pooled = np.concatenate([trials[i] for i in picked])
+        return np.median(rng.choice(pooled, size=pooled.size))
+
+    ratios = np.array(
+        [
+            resampled_median(candidate) / resampled_median(baseline)
+            for _ in range(n_boot)
+        ]
+    )
+    point = np.median(np.concatenate(candidate)) / np.median(
+        np.concatenate(baseline)
+    )
+    low, high = np.percentile(ratios, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return float(point), float(low), float(high)
+
+
+def compare(
+    baseline_dir, candidate_dir, max_slowdown, max_mem_growth, run_id=None
+):
+    baseline = load_trials(baseline_dir, run_id)
+    candidate = load_trials(candidate_dir, run_id)
+    rows = []
+    for case in baseline:
+        if case not in candidate:
+            continue
+        ratio, low, high = bootstrap_ratio(
+            baseline[case]["times"], candidate[case]["times"]
+        )
+        if baseline[case]["cumulative"] or candidate[case]["cumulative"]:
+            # includes the cases before this one, not comparable
+            base_peak = cand_peak = None
+            mem_ratio = 1.0
+        else:
+            base_peak = max(baseline[case]["peak"])
+            cand_peak = max(candidate[case]["peak"])
+            mem_ratio = cand_peak / base_peak if base_peak else 1.0
+        rows.append(
+            {
+                "case": case,
+                "trials": (
+                    len(baseline[case]["times"]),
+                    len(candidate[case]["times"]),
+                ),
+                "base_ms": float(np.median(np.concatenate(baseline[case]["times"]))),
+                "cand_ms": float(np.median(np.concatenate(candidate[case]["times"]))),
+                "ratio": ratio,
+                "ci": (low, high),
+                "slower": low > 1.0 + max_slowdown,
+                "faster": high < 1.0 - max_slowdown,
+                "base_peak": base_peak,
+                "cand_peak": cand_peak,
+                "mem_grew": mem_ratio > 1.0 + max_mem_growth,
+            }
+        )
+    return rows
+
+
+def _mb(nbytes):
+    return "n/a" if nbytes is None else "{:.1f}".format(nbytes / 2**20)
+
+
+def print_rows(rows):
+    header = "{:<44} {:>10} {:>10} {:>7} {:>17} {:>10} {:>10}  {}".format(
+        "case", "base(ms)", "cand(ms)", "ratio", "95% CI", "base MB",
+        "cand MB", "verdict",
+    )
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        verdict = []
+        if r["slower"]:
+            verdict.append("SLOWER")
+        if r["faster"]:
+            verdict.append("faster")
+        if r["mem_grew"]:
+            verdict.append("MORE MEMORY")
+        print(
+            "{:<44} {:>10.4f} {:>10.4f} {:>7.3f} {:>17} {:>10} {:>10}  {}".format(
+                r["case"][:44],
+                r["base_ms"],
+                r["cand_ms"],
+                r["ratio"],
+                "[{:.3f}, {:.3f}]".format(*r["ci"]),
+                _mb(r["base_peak"]),
+                _mb(r["cand_peak"]),
+                " ".join(verdict) if verdict else "ok",
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="paddle perf regression gate")
+    parser.add_argument("--test_file", type=str, default=None)
+    parser.add_argument("--cases", type=str, default=None)
+    parser.add_argument("--baseline_python", type=str, default=None)
+    parser.add_argument("--candidate_python", type=str, default=None)
+    parser.add_argument("--baseline_dir", type=str, default=None)
+    parser.add_argument("--candidate_dir", type=str, default=None)
+    parser.add_argument("--output_dir", type=str, default="./perf_gate")
+    parser.add_argument("--run_id", type=str, default=None)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument("--max_slowdown", type=float, default=0.05)
+    parser.add_argument("--max_mem_growth", type=float, default=0.05)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    baseline_dir = args.baseline_dir or os.path.join(args.output_dir, "baseline")
+    candidate_dir = args.candidate_dir or os.path.join(
+        args.output_dir, "candidate"
+    )
+    run_id = args.run_id
+    if args.baseline_python and args.candidate_python:
+        if args.test_file is None:
+            sys.exit("--test_file is required to run the benchmarks")
+        if run_id is None:
+            run_id = time.strftime("%Y%m%d-%H%M%S")
+        for trial in range(args.trials):
+            for python, record_dir in (
+                (args.baseline_python, baseline_dir),
+                (args.candidate_python, candidate_dir),
+            ):
+                run_trials(
+                    python,
+                    args.test_file,
+                    record_dir,
+                    run_id,
+                    trial,
+                    args.cases,
+                    args.warmup,
+                    args.iters,
+                )
+    rows = compare(
+        baseline_dir,
+        candidate_dir,
+        args.max_slowdown,
+        args.max_mem_growth,
+        run_id,
+    )
+    print_rows(rows)
+    if any(r["slower"] or r["mem_grew"] for r in rows):
+        sys.exit(1)
@@ -0,0 +1,235 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Run ApiTest cases as a three stage pipeline.
+
+Usage:
+    python pipeline_runner.py test_square/test_square_develop.py \
+        [--prefetch 2] [--num_consumers 2] [--max_inflight 2]
+
+  * a producer thread builds the numpy inputs of case N+1 (setUp) and stages
+    them in pinned host memory for torch and paddle;
+  * the main thread uploads the staged inputs asynchronously and runs
+    cal_torch_res / cal_paddle_res of case N;
+  * a consumer thread pool downloads the outputs (D2H) and compares them
+    with ApiTest.compare_eager_res.
+
+Cases are produced in file order and seeded like setUpClass does, split
+by thread: only the producer uses the numpy / python rngs, it seeds them
+(ApiTest.seed_host_rngs) and runs setUp, and only the main thread uses
+the paddle / torch rngs, it seeds them (ApiTest.seed_device_rngs) before
+running the case. No rng is shared, so inputs and device rng state of
+every case are identical to a sequential run without any lock.
+
+A case that fails in setUp or while running is reported as failed, the
+other cases still run.
+"""
+import argparse
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from api_test import (
+    CaseResult,
+    _as_list,
+    case_numpy_arrays,
+    flatten,
+    load_api_test_cases,
+    print_case_results,
+)
+from records import RecordStore
+from tensor_arena import TensorArena
+
+import paddle
+
+_DONE = object()
+
+
+class StagedCase:
+    def __init__(self, case, torch_staged, paddle_staged):
+        self.case = case
+        self.torch_staged = torch_staged
+        self.paddle_staged = paddle_staged
+        self.error = None
+
+
+def _stage(case):
+    torch_staged, paddle_staged = [], []
+    for x in case_numpy_arrays(case):
+        x = np.ascontiguousarray(x)
+        torch_staged.append(torch.from_numpy(x).pin_memory())
+        paddle_staged.append(
+            paddle.to_tensor(x, dtype=x.dtype, place=paddle.CUDAPinnedPlace())
+        )
+    return StagedCase(case, torch_staged, paddle_staged)
+
+
+def _produce(case_classes, out_queue):
+    # the eager mode is per thread in paddle, a new thread starts without it
+    if not paddle.in_dynamic_mode():
+        paddle.disable_static()
+    for cls in case_classes:
+        case = None
+        try:
+            # the device rngs are seeded by the main thread
+            cls.seed_host_rngs()
+            case = cls()
+            case.setUp()
+            case.check_custom_config()
+            staged = _stage(case)
+        except Exception as e:
+            staged = StagedCase(case if case is not None else cls(), [], [])
+            staged.error = e
+        out_queue.put(staged)
+    out_queue.put(_DONE)
+
+
+def _split(case, tensors):
+    n_inputs = len(flatten(case.inputs))
+    inputs, out_grads = tensors[:n_inputs], tensors[n_inputs:]
+    return inputs, (out_grads if hasattr(case, "out_grads") else None)
+
+
+def _upload_torch(staged):
+    tensors = []
+    for x in staged.torch_staged:
+        t = x.to("cuda", non_blocking=True)
+        if t.is_floating_point():
+            t.requires_grad_(True)
+        if staged.case.dtype == "bfloat16" and t.dtype == torch.float32:
+            t = t.to(dtype=torch.bfloat16)
+        tensors.append(t)
+    return _split(staged.case, tensors)
+
+
+def _upload_paddle(staged):
+    tensors = []
+    for x in staged.paddle_staged:
+        t = x.cuda(blocking=False)
+        t.stop_gradient = not t.is_floating_point()
+        if staged.case.dtype == "bfloat16" and t.dtype == paddle.float32:
+            t = paddle.cast(t, dtype="uint16")
+        tensors.append(t)
+    return _split(staged.case, tensors)
+
+
+def _run_torch(case, inputs, out_grads):
+    outputs, gradouts = case.cal_torch_res(inputs, out_grads)
+    outputs = flatten(_as_list(outputs))
+    gradouts = flatten(_as_list(gradouts)) if gradouts is not None else []
+    if case.dtype == "bfloat16":
+        outputs = [x.to(torch.float32) for x in outputs]
+        gradouts = [x.to(torch.float32) for x in gradouts]
+    return [x.detach() for x in outputs], [x.detach() for x in gradouts]
+
+
+def _run_paddle(case, inputs, out_grads):
+    outputs, gradouts = case.cal_paddle_res(inputs, out_grads)
+    if out_grads is None:
+        gradouts = []
+    outputs, gradouts = flatten(_as_list(outputs)), flatten(
+        _as_list(gradouts)
+    )
+    if case.dtype == "bfloat16":
+        outputs = [paddle.cast(x, "float32") for x in outputs]
+        gradouts = [paddle.cast(x, "float32") for x in gradouts]
+    return outputs, gradouts
+
+
+def _download_and_compare(case, torch_res, paddle_res):
+    threshold = case.get_default_threshold()
+    with TensorArena("torch") as torch_arena, TensorArena(
+        "paddle"
+    ) as paddle_arena:
+        torch_outputs, torch_gradouts = torch_arena.track(torch_res)
+        pd_outputs, pd_gradouts = paddle_arena.track(paddle_res)
+        pd_outputs_np = [x.numpy() for x in pd_outputs]
+        pd_gradouts_np = [x.numpy() for x in pd_gradouts]
+        torch_outputs_np = [x.cpu().numpy() for x in torch_outputs]
+        torch_gradouts_np = [x.cpu().numpy() for x in torch_gradouts]
+    try:
+        case.compare_eager_res(
+            pd_outputs_np,
+            pd_gradouts_np,
+            torch_outputs_np,
+            torch_gradouts_np,
+            threshold["atol"],
+            threshold["rtol"],
+        )
+    except AssertionError as e:
+        return CaseResult(case, False, str(e))
+    return CaseResult(case, True)
+
+
+def run_pipelined(
+    case_classes, prefetch=2, num_consumers=2, max_inflight=2
+):
+    """Run ApiTest classes with input staging, execution and comparison overlapped."""
+    staged_queue = queue.Queue(maxsize=prefetch)
+    producer = threading.Thread(
+        target=_produce, args=(case_classes, staged_queue), daemon=True
+    )
+    producer.start()
+
+    # bounds the number of cases whose device outputs are still alive
+    inflight = threading.Semaphore(max_inflight)
+    futures = []
+    with ThreadPoolExecutor(max_workers=num_consumers) as consumers:
+        while True:
+            staged = staged_queue.get()
+            if staged is _DONE:
+                break
+            if staged.error is not None:
+                futures.append(
+                    CaseResult(staged.case, False, repr(staged.error))
+                )
+                continue
+            inflight.acquire()
+            try:
+                staged.case.seed_device_rngs()
+                torch_res = _run_torch(staged.case, *_upload_torch(staged))
+                paddle_res = _run_paddle(staged.case, *_upload_paddle(staged))
+            except Exception as e:
+                inflight.release()
+                futures.append(CaseResult(staged.case, False, repr(e)))
+                continue
+            future = consumers.submit(
+                _download_and_compare, staged.case, torch_res, paddle_res
+            )
+            future.add_done_callback(lambda _: inflight.release())
+            futures.append(future)
+    producer.join()
+    return [f if isinstance(f, CaseResult) else f.result() for f in futures]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="pipelined api test")
+    parser.add_argument("test_file", type=str)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--num_consumers", type=int, default=2)
+    parser.add_argument("--max_inflight", type=int, default=2)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_pipelined(
+        load_api_test_cases(args.test_file),
+        prefetch=args.prefetch,
+        num_consumers=args.num_consumers,
+        max_inflight=args.max_inflight,
+    )
+    if print_case_results(results, RecordStore.from_env()):
+        raise SystemExit(1)
@@ -0,0 +1,421 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Precision drift of paddle apis between float32 and bfloat16 / float16.
+
+Usage:
+    python precision_drift.py [--apis paddle.matmul ...] \
+        [--test_files test_add/test_add_develop.py ...] \
+        [--low_dtype bfloat16] [--modes mode1 mode2] [--baseline] \
+        [--fields p99_ulp nan_mismatch] [--rel_slack 0.1] [--abs_slack 1] \
+        [--record_dir DIR]
+
+The mode1 / mode2 checks of test_fp32_with_bf16 for any api. The inputs
+are rounded to --low_dtype once, then the api runs forward + backward on
+them in float32 and in the low dtype, and every output and grad of the
+low dtype run is compared with
+
+    mode1  the float32 result
+    mode2  the float32 result rounded to the low dtype
+
+mode1 is the whole error of computing in the low dtype. mode2 leaves out
+the unavoidable rounding of the answer, a correctly rounded kernel is at
+0 ulp there. Nothing is asserted: drift_stats reduces each pair in one
+chunked pass to the abs / rel error, a decade histogram of the relative
+error and an ULP histogram (float32 ULP in mode1, low dtype ULP in
+mode2). The report has one row per api, output and mode. The records go
+to the "drift" kind of records.RecordStore.
+
+With --baseline every record is compared with the latest stored record
+of the same case, output, mode and dtype. A field of --fields is a
+regression when it exceeds the baseline by more than
+old * --rel_slack + --abs_slack (abs_slack in the unit of the field), and
+the exit code is then 1. max_ulp and the other max fields hang on a
+single element, which moves with the summation order of nondeterministic
+kernels (atomic adds in the backward passes), so by default only p99_ulp
+and nan_mismatch are compared.
+
+Apis are registered with register_drift_api, like the oracles of
+oracle.py. The built-ins are the cases of test_fp32_with_bf16. --test_files
+adds the float32 ApiTest cases of test files, run through their
+cal_paddle_res on their own inputs.
+"""
+import argparse
+import itertools
+import math
+import sys
+
+import numpy as np
+from api_test import _as_list, flatten, load_api_test_cases, pack_like
+from numerics import drift_stats, np_round_to_dtype
+from records import RecordStore
+
+import paddle
+from paddle.nn.functional.flash_attention import flash_attention
+
+_DRIFT_APIS = {}
+
+
+class DriftApi:
+    """make_inputs(rng) -> (inputs, out_grads), float32 numpy lists.
+
+    forward(*inputs) returns the output tensor(s). reference_forward is
+    run for float32 instead of forward, for kernels without float32
+    support.
+    """
+
+    def __init__(self, api, make_inputs, forward, reference_forward=None):
+        self.api = api
+        self.make_inputs = make_inputs
+        self.forward = forward
+        self.reference_forward = reference_forward
+
+    def call(self, dtype):
+        forward = self.forward
+        if dtype == "float32" and self.reference_forward is not None:
+            forward = self.reference_forward
+
+        def call(inputs, out_grads):
+            outs = _as_list(forward(*inputs))
+            grads = paddle.grad(
+                outs,
+                [x for x in inputs if not x.stop_gradient],
+                grad_outputs=out_grads,
+                allow_unused=True,
+            )
+            return outs, grads
+
+        return call
+
+
+def register_drift_api(api, make_inputs, forward, reference_forward=None):
+    if api in _DRIFT_APIS:
+        raise KeyError(f"A drift case of {api} is already registered.")
+    _DRIFT_APIS[api] = DriftApi(api, make_inputs, forward, reference_forward)
+    return _DRIFT_APIS[api]
+
+
+def get_drift_api(api):
+    return _DRIFT_APIS.get(api)
+
+
+def _uniform(rng, *shapes):
+    return [rng.random_sample(shape).astype("float32") - 0.5 for shape in shapes]
+
+
+def _layer_norm(x, w, b):
+    return paddle.nn.functional.layer_norm(x, x.shape[2:], w, b, 1e-05)
+
+
+def _flash_attention(x):
+    out, _ = flash_attention(x, x, x, 0.0, True, False)
+    return out
+
+
+def _math_attention(x):
+    # [b, s, nh, hd] -> [b, nh, s, hd]
+    xt = paddle.transpose(x, [0, 2, 1, 3])
+    scores = paddle.matmul(xt, xt, transpose_y=True) / math.sqrt(xt.shape[-1])
+    mask = paddle.triu(
+        paddle.full(scores.shape[-2:], float("-inf"), dtype=scores.dtype),
+        diagonal=1,
+    )
+    probs = paddle.nn.functional.softmax(scores + mask)
+    return paddle.transpose(paddle.matmul(probs, xt), [0, 2, 1, 3])
+
+
+register_drift_api(
+    "paddle.matmul",
+    lambda rng: (
+        _uniform(rng, [1, 8192, 14336], [14336, 12528]),
+        _uniform(rng, [1, 8192, 12528]),
+    ),
+    paddle.matmul,
+)
+register_drift_api(
+    "paddle.nn.functional.layer_norm",
+    lambda rng: (
+        _uniform(rng, [1, 8192, 14336], [14336], [14336]),
+        _uniform(rng, [1, 8192, 14336]),
+    ),
+    _layer_norm,
+)
+register_drift_api(
+    "paddle.nn.functional.silu",
+    lambda rng: (_uniform(rng, [1, 8192, 4816]), _uniform(rng, [1, 8192, 4816])),
+    paddle.nn.functional.silu,
+)
+register_drift_api(
+    "paddle.incubate.nn.functional.fused_linear",
+    lambda rng: (
+        _uniform(rng, [1, 8192, 14336], [14336, 5376], [5376]),
+        _uniform(rng, [1, 8192, 5376]),
+    ),
+    paddle.incubate.nn.functional.fused_linear,
+)
+register_drift_api(
+    "paddle.nn.functional.flash_attention.flash_attention",
+    lambda rng: (_uniform(rng, [1, 8192, 14, 128]), _uniform(rng, [1, 8192, 14, 128])),
+    _flash_attention,
+    reference_forward=_math_attention,
+)
+
+
+def _to_paddle(x, dtype):
+    if x.dtype.kind != "f":
+        return paddle.to_tensor(x, place="gpu")
+    t = paddle.to_tensor(x, dtype="float32", place="gpu")
+    if dtype != "float32":
+        t = paddle.cast(t, dtype="uint16" if dtype == "bfloat16" else dtype)
+    t.stop_gradient = False
+    return t
+
+
+def _numpy(x):
+    if x.dtype in [paddle.float16, paddle.bfloat16]:
+        x = paddle.cast(x, dtype="float32")
+    return x.numpy()
+
+
+def run_call(call, inputs, out_grads, dtype):
+    """Named float32 numpy outputs and grads of call run in dtype."""
+    xs = [_to_paddle(x, dtype) for x in inputs]
+    douts = [_to_paddle(g, dtype) for g in out_grads]
+    outs, grads = call(xs, douts)
+    outs, grads = flatten(_as_list(outs)), flatten(_as_list(grads))
+    results = {}
+    for i, out in enumerate(outs):
+        name = "forward" if len(outs) == 1 else "forward_{}".format(i)
+        results[name] = _numpy(out)
+    for i, grad in enumerate(grads):
+        if grad is not None:
+            results["backward_{}".format(i)] = _numpy(grad)
+    del xs, douts, outs, grads
+    paddle.device.cuda.empty_cache()
+    return results
+
+
+def analyze(case, api, calls, inputs, out_grads, low_dtype, modes):
+    """Drift records of every output of one case.
+
+    calls maps "float32" and low_dtype to call(inputs, out_grads) ->
+    (outputs, grads) of paddle tensors.
+    """
+    inputs = [
+        np_round_to_dtype(x, low_dtype) if x.dtype.kind == "f" else x
+        for x in inputs
+    ]
+    out_grads = [np_round_to_dtype(g, low_dtype) for g in out_grads]
+    low = run_call(calls[low_dtype], inputs, out_grads, low_dtype)
+    high = run_call(calls["float32"], inputs, out_grads, "float32")
+    records = []
+    for name, a in low.items():
+        if name not in high:
+            continue
+        for mode in modes:
+            if mode == "mode1":
+                reference, ulp_dtype = high[name], "float32"
+            else:
+                reference = np_round_to_dtype(high[name], low_dtype)
+                ulp_dtype = low_dtype
+            record = {
+                "case": case,
+                "api": api,
+                "dtype": low_dtype,
+                "mode": mode,
+                "output": name,
+            }
+            record.update(drift_stats(a, reference, ulp_dtype).summary())
+            records.append(record)
+    return records
+
+
+def registered_cases(apis, low_dtype, seed):
+    for api in apis:
+        drift_api = get_drift_api(api)
+        if drift_api is None:
+            raise KeyError(f"No drift case of {api} is registered.")
+        inputs, out_grads = drift_api.make_inputs(np.random.RandomState(seed))
+        calls = {d: drift_api.call(d) for d in ("float32", low_dtype)}
+        yield api, api, calls, inputs, out_grads
+
+
+def _nested_call(case):
+    """case.cal_paddle_res on flat inputs, nested back like case.inputs."""
+
+    def call(xs, douts):
+        out_grads = (
+            pack_like(case.out_grads, douts)
+            if hasattr(case, "out_grads")
+            else None
+        )
+        return case.cal_paddle_res(pack_like(case.inputs, xs), out_grads)
+
+    return call
+
+
+def api_test_cases(path, low_dtype):
+    for cls in load_api_test_cases(path):
+        case = cls()
+        # init_configs sets the dtype without drawing any inputs
+        getattr(case, "init_configs", case.setUp)()
+        # the float32 cases hold the float32 inputs both runs start from
+        if case.dtype != "float32":
+            continue
+        cls.setUpClass()
+        case.setUp()
+        calls = {d: _nested_call(case) for d in ("float32", low_dtype)}
+        api = getattr(case, "api", cls.__name__)
+        inputs = flatten(case.inputs)
+        out_grads = flatten(getattr(case, "out_grads", None) or [])
+        yield cls.__name__, api, calls, inputs, out_grads
+
+
+def _key(record):
+    return (
+        record["case"],
+        record["output"],
+        record["mode"],
+        record["dtype"],
+    )
+
+
+REGRESSION_FIELDS = ["p99_ulp", "nan_mismatch"]
+
+
+def find_regressions(
+    records, baseline, fields=REGRESSION_FIELDS, rel_slack=0.1, abs_slack=1
+):
+    """[(record, baseline record, [grown fields])]
+
+    A field grew when it is larger than old * (1 + rel_slack) + abs_slack.
+    """
+    latest = {}
+    for r in baseline:
+        latest[_key(r)] = r
+    regressions = []
+    for r in records:
+        old = latest.get(_key(r))
+        if old is None:
+            continue
+        grown = [
+            field
+            for field in fields
+            if field in old
+            and r[field] > old[field] * (1 + rel_slack) + abs_slack
+        ]
+        if grown:
+            regressions.append((r, old, grown))
+    return regressions
+
+
+def print_report(records):
+    header = "{:<36} {:<12} {:<5} {:>10} {:>10} {:>10} {:>8} {:>8} {:>8}".format(
+        "case", "output", "mode", "max abs", "max rel", "rms", "exact%",
+        "p99 ulp", "max ulp",
+    )
+    print(header)
+    print("-" * len(header))
+    for r in records:
+        print(
+            "{:<36} {:<12} {:<5} {:>10.3e} {:>10.3e} {:>10.3e} {:>8.2f} {:>8} {:>8}".format(
+                r["case"][-36:],
+                r["output"],
+                r["mode"],
+                r["max_abs"],
+                r["max_rel"],
+                r["rms"],
+                r["exact_fraction"] * 100,
+                r["p99_ulp"],
+                r["max_ulp"],
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="precision drift analyzer")
+    parser.add_argument("--apis", nargs="*", default=None)
+    parser.add_argument("--test_files", nargs="*", default=[])
+    parser.add_argument(
+        "--low_dtype",
+        type=str,
+        default="bfloat16",
+        choices=["float16", "bfloat16"],
+    )
+    parser.add_argument(
+        "--modes", nargs="+", default=["mode1", "mode2"],
+        choices=["mode1", "mode2"],
+    )
+    parser.add_argument("--baseline", action="store_true")
+    parser.add_argument(
+        "--fields",
+        nargs="+",
+        default=REGRESSION_FIELDS,
+        choices=[
+            "p50_ulp", "p90_ulp", "p99_ulp", "max_ulp", "nan_mismatch",
+            "max_abs", "mean_abs", "rms", "max_rel",
+        ],
+    )
+    parser.add_argument("--rel_slack", type=float, default=0.1)
+    parser.add_argument("--abs_slack", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    apis = list(_DRIFT_APIS) if args.apis is None else args.apis
+    # generators, so only the inputs of the running case are alive
+    cases = itertools.chain(
+        registered_cases(apis, args.low_dtype, args.seed),
+        *[api_test_cases(path, args.low_dtype) for path in args.test_files],
+    )
+    records = []
+    for case, api, calls, inputs, out_grads in cases:
+        records += analyze(
+            case, api, calls, inputs, out_grads, args.low_dtype, args.modes
+        )
+    print_report(records)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    regressions = []
+    if store is not None:
+        if args.baseline:
+            regressions = find_regressions(
+                records,
+                store.load("drift"),
+                args.fields,
+                args.rel_slack,
+                args.abs_slack,
+            )
+        for record in records:
+            store.append("drift", record)
+    for r, old, grown in regressions:
+        print(
+            "regression {} {} {} {}: {}".format(
+                r["case"],
+                r["output"],
+                r["mode"],
+                r["dtype"],
+                ", ".join(
+                    "{} {} -> {}".format(field, old[field], r[field])
+                    for field in grown
+                ),
+            )
+        )
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,70 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Append-only json lines store for accuracy and benchmark records.
+
+Every kind of record goes to <record_dir>/<kind>.jsonl, one json object per
+line, tagged with the time and the paddle/torch versions that produced it so
+runs of different builds can be put side by side.
+"""
+import json
+import os
+import time
+
+RECORD_DIR = os.getenv("API_TEST_RECORD_DIR")
+
+
+def _framework_versions():
+    versions = {}
+    try:
+        import paddle
+
+        versions["paddle"] = paddle.__version__
+        versions["paddle_commit"] = paddle.version.commit
+    except ImportError:
+        pass
+    try:
+        import torch
+
+        versions["torch"] = torch.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+class RecordStore:
+    def __init__(self, record_dir):
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+        self._versions = _framework_versions()
+
+    @classmethod
+    def from_env(cls):
+        """Store in $API_TEST_RECORD_DIR, or None when it is not set."""
+        return cls(RECORD_DIR) if RECORD_DIR else None
+
+    def path(self, kind):
+        return os.path.join(self.record_dir, kind + ".jsonl")
+
+    def append(self, kind, record):
+        record = dict(record)
+        record.setdefault("time", time.strftime("%Y-%m-%d %H:%M:%S"))
+        record.setdefault("versions", self._versions)
+        with open(self.path(kind), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def load(self, kind):
+        if not os.path.exists(self.path(kind)):
+            return []
+        with open(self.path(kind)) as f:
+            return [json.loads(line) for line in f if line.strip()]
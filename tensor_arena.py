@@ -0,0 +1,180 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Scoped release of the device tensors created in one test phase.
+
+    with TensorArena("torch") as arena:
+        x = arena.track(gen_torch_data(...))
+        out, out_grads = arena.track(cal_torch_res(x))
+        out_np = out.cpu().numpy()
+    # storage of x, out and out_grads is released here
+
+Leaving the scope frees the storage of every tracked tensor right away,
+whatever python references are still around, so no gc.collect() is needed.
+The cached allocator is only trimmed (empty_cache) when the MemoryPlanner
+sees that the reserved memory went above its budget.
+"""
+import os
+
+# fraction of the device memory the caching allocator may keep reserved
+# before the planner asks it to give memory back
+DEFAULT_TRIM_RATIO = float(os.getenv("API_TEST_TRIM_RATIO", "0.8"))
+
+
+class MemoryPlanner:
+    def __init__(self, trim_ratio=DEFAULT_TRIM_RATIO):
+        self.trim_ratio = trim_ratio
+
+    @staticmethod
+    def reserved_and_total(framework):
+        if framework == "torch":
+            import torch
+
+            total = torch.cuda.get_device_properties(
+                torch.cuda.current_device()
+            ).total_memory
+            return torch.cuda.memory_reserved(), total
+        elif framework == "paddle":
+            import paddle
+
+            total = paddle.device.cuda.get_device_properties().total_memory
+            return paddle.device.cuda.memory_reserved(), total
+        raise ValueError(
+            f"framework must be torch or paddle, but received {framework}."
+        )
+
+    @staticmethod
+    def allocated(framework):
+        if framework == "torch":
+            import torch
+
+            return torch.cuda.memory_allocated()
+        import paddle
+
+        return paddle.device.cuda.memory_allocated()
+
+    @staticmethod
+    def reset_peak(framework):
+        """Start a new peak window, return False if the build can't reset."""
+        if framework == "torch":
+            import torch
+
+            torch.cuda.reset_peak_memory_stats()
+            return True
+        import paddle
+
+        reset = getattr(paddle.device.cuda, "reset_max_memory_allocated", None)
+        if reset is None:
+            return False
+        reset()
+        reset_reserved = getattr(
+            paddle.device.cuda, "reset_max_memory_reserved", None
+        )
+        if reset_reserved is not None:
+            reset_reserved()
+        return True
+
+    @staticmethod
+    def peak_allocated_and_reserved(framework):
+        if framework == "torch":
+            import torch
+
+            return (
+                torch.cuda.max_memory_allocated(),
+                torch.cuda.max_memory_reserved(),
+            )
+        import paddle
+
+        return (
+            paddle.device.cuda.max_memory_allocated(),
+            paddle.device.cuda.max_memory_reserved(),
+        )
+
+    def should_trim(self, framework):
+        reserved, total = self.reserved_and_total(framework)
+        return reserved > self.trim_ratio * total
+
+    def maybe_trim(self, framework):
+        if not self.should_trim(framework):
+            return False
+        if framework == "torch":
+            import torch
+
+            torch.cuda.empty_cache()
+        else:
+            import paddle
+
+            paddle.device.cuda.empty_cache()
+        return True
+
+
+_default_planner = MemoryPlanner()
+
+
+def maybe_trim(framework):
+    """MemoryPlanner.maybe_trim of the default planner, for phases whose
+    memory is held by objects other than tensors, e.g. optimizers."""
+    return _default_planner.maybe_trim(framework)
+
+
+def _release_torch(x):
+    import torch
+
+    if not isinstance(x, torch.Tensor) or not x.is_cuda:
+        return
+    with torch.no_grad():
+        x.untyped_storage().resize_(0)
+
+
+def _release_paddle(x):
+    import paddle
+
+    if not isinstance(x, paddle.Tensor) or not x.place.is_gpu_place():
+        return
+    x._clear_data()
+
+
+class TensorArena:
+    def __init__(self, framework, planner=None):
+        if framework not in ("torch", "paddle"):
+            raise ValueError(
+                f"framework must be torch or paddle, but received {framework}."
+            )
+        self.framework = framework
+        self.planner = planner if planner is not None else _default_planner
+        self._tensors = []
+
+    def track(self, tensors):
+        """Register a tensor or a nested list/tuple of tensors, return it."""
+        if isinstance(tensors, (list, tuple)):
+            for x in tensors:
+                self.track(x)
+        elif tensors is not None:
+            self._tensors.append(tensors)
+        return tensors
+
+    def release(self):
+        release = (
+            _release_torch if self.framework == "torch" else _release_paddle
+        )
+        for x in self._tensors:
+            release(x)
+        self._tensors = []
+        self.planner.maybe_trim(self.framework)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
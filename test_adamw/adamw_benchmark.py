@@ -0,0 +1,371 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""AdamW step throughput of per-parameter, multi-tensor and fused updates.
+
+Usage (from test_adamw):
+    python adamw_benchmark.py [--dtype bfloat16] [--multi_precision] \
+        [--total_numel 67108864] [--num_params 1 16 256 1024 4096] \
+        [--distribution lognormal] [--iters 20] [--record_dir DIR]
+
+For every entry of --num_params, --total_numel elements are split into
+that many parameters. The split is equal sizes ("fixed"), a lognormal
+spread like real models ("lognormal"), or the test_shape sizes of
+test_adamw_develop.py cycled and scaled ("test_shape"). The variants are:
+
+    paddle per_param     AdamW, one kernel per parameter
+    paddle multi_tensor  _C_ops.fused_adam_ with use_adamw, see
+                         PaddleFusedAdamW
+    torch  for_loop      AdamW(foreach=False)
+    torch  foreach       AdamW(foreach=True)
+    torch  fused         AdamW(fused=True)
+
+Only optimizer.step() is timed. For torch with --multi_precision that is
+the step of the float32 master copies; the cast back of
+adamw_trajectory.TorchAdamW is not timed.
+
+The sweep keeps the bytes constant and changes only the tensor count, so
+a least squares fit of p50 = overhead * num_params + bandwidth_time splits
+each variant's step time into a per-tensor launch overhead (us/tensor)
+and a bandwidth part (GB/s). A variant is limited by launches when
+overhead * num_params dominates.
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+
+import numpy as np
+
+import paddle
+from paddle import _C_ops
+
+from adamw_trajectory import (
+    BETAS,
+    EPS,
+    LR,
+    PaddleAdamW,
+    TorchAdamW,
+    _random,
+    _to_paddle,
+    step_bytes,
+)
+
+sys.path.append("..")
+from benchmark import summarize
+from records import RecordStore
+
+
+def _test_shape_numels():
+    """Numels of the test_shape list of test_adamw_develop.py, read from its
+    source so that the test module (and its unittest cases) is not imported.
+    """
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "test_adamw_develop.py"
+    )
+    with open(path) as f:
+        module = ast.parse(f.read())
+    for node in module.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "test_shape"
+            for t in node.targets
+        ):
+            shapes = ast.literal_eval(node.value)
+            return [int(np.prod(shape, dtype=np.int64)) for shape in shapes]
+    raise ValueError(f"No test_shape list in {path}.")
+
+
+TEST_SHAPE_NUMELS = _test_shape_numels()
+
+
+class PaddleFusedAdamW:
+    """AdamW of paddle's multi-tensor fused_adam_ kernel.
+
+    paddle.optimizer.AdamW launches the adamw kernel once per parameter
+    and has no multi-tensor path, fused_adam_ updates a whole list in
+    chunk_size launches. It takes one weight_decay, so the decay and the
+    no decay parameters are two calls. self.opt is the wrapper itself,
+    like the optimizers of the other wrappers its step() is what is timed.
+    """
+
+    def __init__(
+        self,
+        shapes,
+        values,
+        dtype,
+        multi_precision,
+        weight_decay,
+        chunk_size=65536,
+    ):
+        if not hasattr(_C_ops, "fused_adam_"):
+            raise AttributeError(
+                "paddle has no _C_ops.fused_adam_, the multi_tensor variant "
+                "needs it; drop paddle from --frameworks to run without it"
+            )
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.multi_precision = multi_precision and dtype != "float32"
+        moment_dtype = "float32" if self.multi_precision else dtype
+        self.lr = paddle.to_tensor([LR], dtype="float32", place="gpu")
+        self.params = []
+        self.groups = []
+        for decay in (True, False):
+            group = {
+                "weight_decay": weight_decay if decay else 0.0,
+                "params": [],
+                "moments1": [],
+                "moments2": [],
+                "beta1_pows": [],
+                "beta2_pows": [],
+                "master_params": [] if self.multi_precision else None,
+                "index": [],
+                "grads": [],
+            }
+            for i, ((_, shape, d), x) in enumerate(zip(shapes, values)):
+                if d != decay:
+                    continue
+                p = _to_paddle(x, dtype)
+                group["index"].append(i)
+                group["params"].append(p)
+                group["moments1"].append(_to_paddle(np.zeros(shape), moment_dtype))
+                group["moments2"].append(_to_paddle(np.zeros(shape), moment_dtype))
+                group["beta1_pows"].append(
+                    paddle.to_tensor([BETAS[0]], dtype="float32", place="gpu")
+                )
+                group["beta2_pows"].append(
+                    paddle.to_tensor([BETAS[1]], dtype="float32", place="gpu")
+                )
+                if self.multi_precision:
+                    group["master_params"].append(
+                        paddle.cast(p, dtype="float32")
+                    )
+                self.params.append(p)
+            if group["params"]:
+                self.groups.append(group)
+        self.opt = self
+
+    def set_grads(self, grads):
+        for group in self.groups:
+            group["grads"] = [
+                _to_paddle(grads[i], self.dtype) for i in group["index"]
+            ]
+
+    def step(self):
+        for group in self.groups:
+            _C_ops.fused_adam_(
+                group["params"],
+                group["grads"],
+                self.lr,
+                group["moments1"],
+                group["moments2"],
+                group["beta1_pows"],
+                group["beta2_pows"],
+                group["master_params"],
+                None,
+                BETAS[0],
+                BETAS[1],
+                EPS,
+                self.chunk_size,
+                group["weight_decay"],
+                True,
+                self.multi_precision,
+                False,
+            )
+
+    def synchronize(self):
+        paddle.device.cuda.synchronize()
+
+
+VARIANTS = [
+    ("paddle", "per_param", PaddleAdamW, {}),
+    ("paddle", "multi_tensor", PaddleFusedAdamW, {}),
+    ("torch", "for_loop", TorchAdamW, {"foreach": False}),
+    ("torch", "foreach", TorchAdamW, {"foreach": True}),
+    ("torch", "fused", TorchAdamW, {"fused": True}),
+]
+
+
+def split_numel(total_numel, num_params, distribution, rng):
+    """num_params sizes >= 1 that add up to about total_numel."""
+    if distribution == "fixed":
+        weights = np.ones(num_params)
+    elif distribution == "lognormal":
+        weights = rng.lognormal(mean=0.0, sigma=2.0, size=num_params)
+    else:
+        weights = np.resize(
+            np.array(TEST_SHAPE_NUMELS, dtype=np.float64), num_params
+        )
+    sizes = np.maximum(1, np.round(weights / weights.sum() * total_numel))
+    return [int(n) for n in sizes]
+
+
+def time_variant(wrapper, warmup, iters):
+    for _ in range(warmup):
+        wrapper.opt.step()
+    wrapper.synchronize()
+    times = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        wrapper.opt.step()
+        wrapper.synchronize()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def benchmark_sweep(args):
+    rng = np.random.default_rng(args.seed)
+    records = []
+    for num_params in args.num_params:
+        sizes = split_numel(
+            args.total_numel, num_params, args.distribution, rng
+        )
+        shapes = [
+            ("param_{}".format(i), [n], True) for i, n in enumerate(sizes)
+        ]
+        values = [_random(rng, [n], args.dtype) for n in sizes]
+        grads = [_random(rng, [n], args.dtype) for n in sizes]
+        nbytes = step_bytes(shapes, args.dtype, args.multi_precision)
+        case = "adamw_{}_{}params_{}{}".format(
+            args.distribution,
+            num_params,
+            args.dtype,
+            "_multi_precision" if args.multi_precision else "",
+        )
+        for framework, variant, optimizer_cls, kwargs in VARIANTS:
+            if framework not in args.frameworks:
+                continue
+            try:
+                wrapper = optimizer_cls(
+                    shapes,
+                    values,
+                    args.dtype,
+                    args.multi_precision,
+                    args.weight_decay,
+                    **kwargs,
+                )
+                wrapper.set_grads(grads)
+                times = time_variant(wrapper, args.warmup, args.iters)
+                del wrapper
+            except (RuntimeError, TypeError, ValueError) as e:
+                # e.g. torch fused=True of a dtype it has no kernel for,
+                # a failing paddle variant is an error
+                if framework != "torch":
+                    raise
+                print("skip {} {}: {}".format(framework, variant, e))
+                continue
+            record = summarize(
+                case, framework, args.dtype, times, nbytes, None
+            )
+            record["variant"] = variant
+            record["num_params"] = num_params
+            record["distribution"] = args.distribution
+            record["multi_precision"] = args.multi_precision
+            records.append(record)
+    return records
+
+
+def fit_overhead(records):
+    """{(framework, variant): (us per tensor, bandwidth ms, GB/s)}"""
+    fits = {}
+    keys = sorted({(r["framework"], r["variant"]) for r in records})
+    for key in keys:
+        rows = [r for r in records if (r["framework"], r["variant"]) == key]
+        if len({r["num_params"] for r in rows}) < 2:
+            continue
+        n = np.array([r["num_params"] for r in rows], dtype=np.float64)
+        t = np.array([r["p50_ms"] for r in rows])
+        slope, intercept = np.polyfit(n, t, 1)
+        intercept = max(intercept, 1e-6)
+        fits[key] = (slope * 1e3, intercept, rows[0]["bytes"] / intercept / 1e6)
+    return fits
+
+
+def print_report(records, fits):
+    header = "{:<8} {:<13} {:>10} {:>10} {:>10} {:>9} {:>12}".format(
+        "fw", "variant", "params", "p50(ms)", "p90(ms)", "GB/s", "us/tensor"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in sorted(
+        records, key=lambda r: (r["num_params"], r["framework"], r["variant"])
+    ):
+        print(
+            "{:<8} {:<13} {:>10} {:>10.4f} {:>10.4f} {:>9.1f} {:>12.2f}".format(
+                r["framework"],
+                r["variant"],
+                r["num_params"],
+                r["p50_ms"],
+                r["p90_ms"],
+                r["gbps"],
+                r["p50_ms"] * 1e3 / r["num_params"],
+            )
+        )
+    if not fits:
+        return
+    print()
+    header = "{:<8} {:<13} {:>18} {:>16} {:>14}".format(
+        "fw", "variant", "launch (us/tensor)", "bandwidth (ms)", "bandwidth GB/s"
+    )
+    print(header)
+    print("-" * len(header))
+    for (framework, variant), (overhead, bandwidth_ms, gbps) in fits.items():
+        print(
+            "{:<8} {:<13} {:>18.2f} {:>16.4f} {:>14.1f}".format(
+                framework, variant, overhead, bandwidth_ms, gbps
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AdamW step benchmark")
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16", "bfloat16"],
+    )
+    parser.add_argument("--multi_precision", action="store_true")
+    parser.add_argument("--weight_decay", type=float, default=0.1)
+    parser.add_argument("--total_numel", type=int, default=1 << 26)
+    parser.add_argument(
+        "--num_params", type=int, nargs="+", default=[1, 16, 256, 1024, 4096]
+    )
+    parser.add_argument(
+        "--distribution",
+        type=str,
+        default="lognormal",
+        choices=["fixed", "lognormal", "test_shape"],
+    )
+    parser.add_argument(
+        "--frameworks", nargs="+", default=["torch", "paddle"]
+    )
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    records = benchmark_sweep(args)
+    print_report(records, fit_overhead(records))
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for r in records:
+            store.append("optimizer", r)
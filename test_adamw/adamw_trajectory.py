@@ -0,0 +1,348 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Multi-parameter, multi-step AdamW trajectories of paddle and torch.
+
+Usage (from test_adamw):
+    python adamw_trajectory.py [--dtype bfloat16] [--multi_precision] \
+        [--num_layers 24] [--hidden 1024] [--ffn 4096] [--vocab 32000] \
+        [--steps 50] [--checkpoint_every 10] [--record_dir DIR]
+
+test_adamw_develop.py steps a single tensor 5 times with the same grad.
+Here both optimizers update the parameter list of a transformer for
+--steps steps, with fresh grads every step. The list holds the embeddings,
+then per layer the qkv/out/ffn weights and biases and two norms. Weight
+decay only applies to the matrices; biases and norms get the usual
+no-decay rule.
+
+Every --checkpoint_every steps the parameters of both frameworks are
+compared with np_assert_accuracy. With --multi_precision, paddle keeps
+float32 master weights for float16/bfloat16 parameters. The torch
+reference then steps float32 copies and casts them back after every step.
+
+Only opt.step() is timed, with a device synchronize around it. The report
+gives the per-step latency and the GB/s of the parameters, grads, moments
+and master weights a step reads and writes.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import torch
+
+import paddle
+
+sys.path.append("..")
+from benchmark import summarize
+from records import RecordStore
+from utils import (
+    TOLERANCE,
+    convert_dtype_to_torch_type,
+    np_assert_accuracy,
+    np_round_to_dtype,
+)
+
+LR = 0.001
+BETAS = (0.9, 0.95)
+EPS = 1e-08
+
+
+def transformer_shapes(num_layers, hidden, ffn, vocab, max_seqlen=2048):
+    """[(name, shape, decay)] of a pre-norm gpt-style transformer."""
+    shapes = [
+        ("word_embeddings", [vocab, hidden], True),
+        ("position_embeddings", [max_seqlen, hidden], True),
+    ]
+    for i in range(num_layers):
+        prefix = "layers.{}.".format(i)
+        shapes += [
+            (prefix + "norm1.weight", [hidden], False),
+            (prefix + "norm1.bias", [hidden], False),
+            (prefix + "qkv.weight", [hidden, 3 * hidden], True),
+            (prefix + "qkv.bias", [3 * hidden], False),
+            (prefix + "out.weight", [hidden, hidden], True),
+            (prefix + "out.bias", [hidden], False),
+            (prefix + "norm2.weight", [hidden], False),
+            (prefix + "norm2.bias", [hidden], False),
+            (prefix + "ffn1.weight", [hidden, ffn], True),
+            (prefix + "ffn1.bias", [ffn], False),
+            (prefix + "ffn2.weight", [ffn, hidden], True),
+            (prefix + "ffn2.bias", [hidden], False),
+        ]
+    shapes += [
+        ("final_norm.weight", [hidden], False),
+        ("final_norm.bias", [hidden], False),
+    ]
+    return shapes
+
+
+def _random(rng, shape, dtype):
+    x = rng.random(size=shape, dtype=np.float32) - 0.5
+    return np_round_to_dtype(x, dtype)
+
+
+def _to_paddle(x, dtype):
+    t = paddle.to_tensor(
+        x,
+        dtype=dtype if dtype != "bfloat16" else "float32",
+        place="gpu",
+    )
+    if dtype == "bfloat16":
+        t = paddle.cast(t, dtype="uint16")
+    return t
+
+
+def _to_torch(x, dtype):
+    return torch.tensor(
+        x, device="cuda", dtype=convert_dtype_to_torch_type(dtype)
+    )
+
+
+def _paddle_numpy(t):
+    if t.dtype == paddle.bfloat16:
+        t = paddle.cast(t, dtype="float32")
+    return t.numpy()
+
+
+def _torch_numpy(t):
+    return t.detach().to(dtype=torch.float32).cpu().numpy()
+
+
+class PaddleAdamW:
+    def __init__(
+        self, shapes, values, dtype, multi_precision, weight_decay, **kwargs
+    ):
+        self.params = []
+        decay_names = set()
+        for (_, _, decay), x in zip(shapes, values):
+            p = _to_paddle(x, dtype).detach()
+            p.stop_gradient = False
+            if decay:
+                decay_names.add(p.name)
+            self.params.append(p)
+        self.dtype = dtype
+        self.opt = paddle.optimizer.AdamW(
+            learning_rate=LR,
+            beta1=BETAS[0],
+            beta2=BETAS[1],
+            epsilon=EPS,
+            parameters=self.params,
+            weight_decay=weight_decay,
+            apply_decay_param_fun=lambda name: name in decay_names,
+            multi_precision=multi_precision,
+            **kwargs,
+        )
+
+    def set_grads(self, grads):
+        for p, g in zip(self.params, grads):
+            p.grad = _to_paddle(g, self.dtype)
+
+    def step(self):
+        self.opt.step()
+
+    def synchronize(self):
+        paddle.device.cuda.synchronize()
+
+    def numpy(self):
+        return [_paddle_numpy(p) for p in self.params]
+
+
+class TorchAdamW:
+    """torch.optim.AdamW, on float32 master copies for multi_precision."""
+
+    def __init__(
+        self, shapes, values, dtype, multi_precision, weight_decay, **kwargs
+    ):
+        self.master = multi_precision and dtype != "float32"
+        self.step_dtype = "float32" if self.master else dtype
+        self.params = [
+            _to_torch(x, dtype).to(
+                dtype=convert_dtype_to_torch_type(self.step_dtype)
+            ).requires_grad_()
+            for x in values
+        ]
+        self.low_params = (
+            [_to_torch(x, dtype) for x in values] if self.master else None
+        )
+        decay = [p for p, (_, _, d) in zip(self.params, shapes) if d]
+        no_decay = [p for p, (_, _, d) in zip(self.params, shapes) if not d]
+        self.opt = torch.optim.AdamW(
+            [
+                {"params": decay, "weight_decay": weight_decay},
+                {"params": no_decay, "weight_decay": 0.0},
+            ],
+            lr=LR,
+            betas=BETAS,
+            eps=EPS,
+            **kwargs,
+        )
+        self.dtype = dtype
+
+    def set_grads(self, grads):
+        # the grads already hold values of dtype, float32 keeps them exact
+        for p, g in zip(self.params, grads):
+            p.grad = _to_torch(g, self.dtype).to(dtype=p.dtype)
+
+    def step(self):
+        self.opt.step()
+        if self.master:
+            with torch.no_grad():
+                for low, p in zip(self.low_params, self.params):
+                    low.copy_(p)
+
+    def synchronize(self):
+        torch.cuda.synchronize()
+
+    def numpy(self):
+        return [
+            _torch_numpy(p) for p in (self.low_params or self.params)
+        ]
+
+
+def step_bytes(shapes, dtype, multi_precision):
+    """Bytes one AdamW step reads and writes over all parameters."""
+    element_size = 4 if dtype == "float32" else 2
+    master = multi_precision and dtype != "float32"
+    moment_size = 4 if master else element_size
+    numel = sum(int(np.prod(shape)) for _, shape, _ in shapes)
+    # param r/w, grad r, two moments r/w, master weight r/w
+    per_element = 3 * element_size + 4 * moment_size + (8 if master else 0)
+    return numel * per_element
+
+
+def compare_params(step, shapes, paddle_values, torch_values, dtype):
+    failures = []
+    for (name, _, _), a, b in zip(shapes, paddle_values, torch_values):
+        try:
+            np_assert_accuracy(
+                a,
+                b,
+                TOLERANCE[dtype]["atol"],
+                TOLERANCE[dtype]["rtol"],
+                dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="eager",
+                fwd_or_bkd="step {} {}".format(step, name),
+                api="paddle.optimizer.AdamW",
+            )
+        except AssertionError as e:
+            failures.append((step, name, str(e)))
+    return failures
+
+
+def run_trajectory(args):
+    shapes = transformer_shapes(
+        args.num_layers, args.hidden, args.ffn, args.vocab
+    )
+    rng = np.random.default_rng(args.seed)
+    values = [_random(rng, shape, args.dtype) for _, shape, _ in shapes]
+    optimizers = {
+        "paddle": PaddleAdamW(
+            shapes, values, args.dtype, args.multi_precision, args.weight_decay
+        ),
+        "torch": TorchAdamW(
+            shapes, values, args.dtype, args.multi_precision, args.weight_decay
+        ),
+    }
+    del values
+    times = {name: [] for name in optimizers}
+    failures = []
+    for step in range(1, args.steps + 1):
+        grads = [_random(rng, shape, args.dtype) for _, shape, _ in shapes]
+        for name, opt in optimizers.items():
+            opt.set_grads(grads)
+            opt.synchronize()
+            start = time.perf_counter()
+            opt.step()
+            opt.synchronize()
+            if step > args.warmup:
+                times[name].append(time.perf_counter() - start)
+        del grads
+        if step % args.checkpoint_every == 0 or step == args.steps:
+            failures += compare_params(
+                step,
+                shapes,
+                optimizers["paddle"].numpy(),
+                optimizers["torch"].numpy(),
+                args.dtype,
+            )
+    return shapes, times, failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AdamW trajectory harness")
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16", "bfloat16"],
+    )
+    parser.add_argument("--multi_precision", action="store_true")
+    parser.add_argument("--weight_decay", type=float, default=0.1)
+    parser.add_argument("--num_layers", type=int, default=24)
+    parser.add_argument("--hidden", type=int, default=1024)
+    parser.add_argument("--ffn", type=int, default=4096)
+    parser.add_argument("--vocab", type=int, default=32000)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--checkpoint_every", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    shapes, times, failures = run_trajectory(args)
+    case = "adamw_{}layers_{}{}".format(
+        args.num_layers,
+        args.dtype,
+        "_multi_precision" if args.multi_precision else "",
+    )
+    nbytes = step_bytes(shapes, args.dtype, args.multi_precision)
+    records = [
+        summarize(case, name, args.dtype, np.array(t), nbytes, None)
+        for name, t in times.items()
+        if t
+    ]
+    numel = sum(int(np.prod(shape)) for _, shape, _ in shapes)
+    print(
+        "{} parameters, {:.1f}M elements, {} steps".format(
+            len(shapes), numel / 1e6, args.steps
+        )
+    )
+    for r in records:
+        print(
+            "{:<7} p50 {:>9.3f} ms  p90 {:>9.3f} ms  {:>8.1f} GB/s".format(
+                r["framework"], r["p50_ms"], r["p90_ms"], r["gbps"]
+            )
+        )
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for r in records:
+            r["multi_precision"] = args.multi_precision
+            r["steps"] = args.steps
+            store.append("optimizer", r)
+    for step, name, message in failures:
+        print(message)
+    if failures:
+        print(
+            "{} parameter checkpoints differ from torch".format(len(failures))
+        )
+        sys.exit(1)
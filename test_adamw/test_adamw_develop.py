@@ -25,11 +25,15 @@ import torch
 import paddle
 from paddle.utils import map_structure
 sys.path.append("..")
+from tensor_arena import TensorArena, maybe_trim
 from utils import (
     TOLERANCE,
+    convert_bfloat16_bits_to_float,
     convert_dtype_to_torch_type,
+    convert_float_to_bfloat16_bits,
     np_assert_accuracy,
     np_assert_staility,
+    np_round_to_dtype,
 )
 
 class TestAdamWDevelopCase1_FP32(unittest.TestCase):
@@ -37,20 +41,18 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.index = 0
+        self.steps = 5
         self.use_weight_deacy = np.random.randint(0 , 1, size=[16])
         self.gen_torch_data()
 
     def gen_torch_data(self):
         self.init_np_inputs_and_grad()
-        x_torch, grad_torch = self.gen_torch_inputs_and_grad()
-        out_torch = self.cal_torch_res(
-            x_torch, grad_torch
-        )
-        del x_torch
-        del grad_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        del out_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, grad_torch = arena.track(self.gen_torch_inputs_and_grad())
+            out_torch = arena.track(self.cal_torch_res(
+                x_torch, grad_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
 
     def init_params(self):
         self.dtype = "float32"
@@ -103,21 +105,6 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
         grad_eager.stop_gradient = False
         return x_eager, grad_eager
 
-    def gen_static_inputs_and_grad(self):
-        x_static = paddle.static.data(
-            'x',
-            shape=self.np_x.shape,
-            dtype=self.dtype if self.dtype != "bfloat16" else "float32",
-        )
-        x_static.stop_gradient = False
-        grad_static = paddle.static.data(
-            'grad',
-            shape=self.np_grad.shape,
-            dtype=self.dtype if self.dtype != "bfloat16" else "float32",
-        )
-        grad_static.stop_gradient = False
-        return x_static, grad_static
-
     def cal_torch_res(self, x, grad):
         if self.dtype == "bfloat16":
             x = x.to(dtype=torch.bfloat16)
@@ -134,11 +121,11 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
 
         x.grad = grad
         
-        for _ in range(5):
+        for _ in range(self.steps):
             opt.step()
 
         del opt
-        torch.cuda.empty_cache()
+        maybe_trim("torch")
 
         if self.dtype == "bfloat16":
             x = x.to(dtype=torch.float32)
@@ -166,58 +153,81 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
 
         x.grad = grad
 
-        for _ in range(5):
+        for _ in range(self.steps):
             opt.step()
 
         del opt
         gc.collect()
-        paddle.device.cuda.empty_cache()
+        maybe_trim("paddle")
         
         if self.dtype == "bfloat16":
             x = paddle.cast(x, dtype="float32")
         return x
 
-    def cal_static_res(self, x, grad):
+    def static_value(self, x):
+        # feeds and scope tensors of a bfloat16 variable hold its uint16 bits
         if self.dtype == "bfloat16":
-            x = paddle.cast(x, dtype="uint16")
-            grad = paddle.cast(grad, dtype="uint16")
-
-        x.regularizer = None
-        x.stop_gradient = False
-
-        opt = paddle.optimizer.AdamW(learning_rate=0.001,
-                                     beta1=0.9,
-                                     beta2=0.95,
-                                     epsilon=1e-08,
-                                     parameters=x,
-                                     weight_decay= 0.1 if self.use_weight_deacy[self.index] else 0.0,
-                                     multi_precision=True,
-                                    )
-
-        x.grad = grad
-        
-        for _ in range(5):
-            opt._apply_optimize(loss=x, startup_program=paddle.fluid.default_main_program(), params_grads=[(x, x.grad)])
-
-        del opt
-        paddle.device.cuda.empty_cache()
+            return convert_float_to_bfloat16_bits(x)
+        return x
 
+    def build_static_program(self):
+        """Append the AdamW update of one persistable parameter once.
+
+        Every executor run of the main program is one optimizer step, the
+        moments, beta pows and master weight stay in the scope between runs,
+        so a step costs the same however many steps are run.
+        """
+        mp, sp = paddle.static.Program(), paddle.static.Program()
+        with paddle.static.program_guard(mp, sp):
+            dtype = self.dtype if self.dtype != "bfloat16" else "uint16"
+            x_static = paddle.static.create_parameter(
+                shape=self.np_x.shape, dtype=dtype, name="x"
+            )
+            grad_static = paddle.static.data(
+                'grad', shape=self.np_grad.shape, dtype=dtype
+            )
+            opt = paddle.optimizer.AdamW(learning_rate=0.001,
+                                         beta1=0.9,
+                                         beta2=0.95,
+                                         epsilon=1e-08,
+                                         parameters=[x_static],
+                                         weight_decay= 0.1 if self.use_weight_deacy[self.index] else 0.0,
+                                         multi_precision=True,
+                                        )
+            opt.apply_gradients([(x_static, grad_static)])
+        return mp, sp, x_static, opt
+
+    def run_static_steps(self, exe, mp, sp, x_static, opt):
+        # the startup program resets the optimizer state, then x (and its
+        # master weight) are set to np_x instead of their initializer values
+        exe.run(sp)
+        scope = paddle.static.global_scope()
+        place = paddle.CUDAPlace(0)
+        scope.find_var(x_static.name).get_tensor().set(
+            self.static_value(self.np_x), place
+        )
+        master_weight = opt._master_weights.get(x_static.name)
+        if master_weight is not None:
+            scope.find_var(master_weight.name).get_tensor().set(
+                np_round_to_dtype(self.np_x, self.dtype).astype("float32"),
+                place,
+            )
+        feed = {"grad": self.static_value(self.np_grad)}
+        for _ in range(self.steps - 1):
+            exe.run(mp, feed=feed)
+        out = exe.run(mp, feed=feed, fetch_list=[x_static])[0]
         if self.dtype == "bfloat16":
-            x = paddle.cast(x, dtype="float32")
-        return x
+            out = convert_bfloat16_bits_to_float(out)
+        return out
 
     def test_eager_accuracy(self):
 
-        x_eager, grad_eager = self.gen_eager_inputs_and_grad()
-        out_eager = self.cal_eager_res(
-            x_eager, grad_eager
-        )
-        del x_eager
-        del grad_eager
-        out_eager_np = out_eager.numpy()
-        del out_eager
-        gc.collect()
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, grad_eager = arena.track(self.gen_eager_inputs_and_grad())
+            out_eager = arena.track(self.cal_eager_res(
+                x_eager, grad_eager
+            ))
+            out_eager_np = out_eager.numpy()
 
         # compare develop eager forward res with torch
         np_assert_accuracy(
@@ -235,28 +245,13 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
 
     def test_static_accuracy(self):
         with paddle.fluid.framework._dygraph_guard(None):
-            mp, sp = paddle.static.Program(), paddle.static.Program()
-            with paddle.static.program_guard(mp, sp):
-                (
-                    x_static,
-                    grad_static,
-                ) = self.gen_static_inputs_and_grad()
-                out_static = self.cal_static_res(
-                    x_static,
-                    grad_static,
-                )
+            mp, sp, x_static, opt = self.build_static_program()
             exe = paddle.static.Executor(place=paddle.CUDAPlace(0))
-            exe.run(sp)
-            out = exe.run(
-                mp,
-                feed={"x": self.np_x, "grad": self.np_grad},
-                fetch_list=[out_static],
-            )
-            out_static= out[0]
-        
+            out_static = self.run_static_steps(exe, mp, sp, x_static, opt)
+
             del exe
             gc.collect()
-            paddle.device.cuda.empty_cache()
+            maybe_trim("paddle")
 
         # compare develop static forward res with torch
         np_assert_accuracy(
@@ -273,74 +268,41 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
         )
 
     def test_eager_stability(self):
-        x_eager, grad_eager = self.gen_eager_inputs_and_grad()
-        out_eager_baseline = self.cal_eager_res(
-            x_eager, grad_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        del out_eager_baseline
-        del x_eager
-        del grad_eager
-        paddle.device.cuda.empty_cache()
-
-        for i in range(10):
-            x_eager, grad_eager = self.gen_eager_inputs_and_grad()
-            out_eager = self.cal_eager_res(
+        with TensorArena("paddle") as arena:
+            x_eager, grad_eager = arena.track(self.gen_eager_inputs_and_grad())
+            out_eager_baseline = arena.track(self.cal_eager_res(
                 x_eager, grad_eager
-            )
-            out_eager_np = out_eager.numpy()
-            # test develop eager forward stability
-            np_assert_staility(
-                out_eager_np,
-                out_eager_baseline_np,
-                self.dtype,
-                version="paddle_develop",
-                eager_or_static_mode="eager",
-                fwd_or_bkd="forward",
-                api="paddle.optimizer.adamw",
-            )
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
 
-            del x_eager
-            del grad_eager
-            del out_eager
-            gc.collect()
-            paddle.device.cuda.empty_cache()
+        for i in range(10):
+            with TensorArena("paddle") as arena:
+                x_eager, grad_eager = arena.track(self.gen_eager_inputs_and_grad())
+                out_eager = arena.track(self.cal_eager_res(
+                    x_eager, grad_eager
+                ))
+                out_eager_np = out_eager.numpy()
+                # test develop eager forward stability
+                np_assert_staility(
+                    out_eager_np,
+                    out_eager_baseline_np,
+                    self.dtype,
+                    version="paddle_develop",
+                    eager_or_static_mode="eager",
+                    fwd_or_bkd="forward",
+                    api="paddle.optimizer.adamw",
+                )
 
     def test_static_stability(self):
         with paddle.fluid.framework._dygraph_guard(None):
-            mp, sp = paddle.static.Program(), paddle.static.Program()
-            with paddle.static.program_guard(mp, sp):
-                (
-                    x_static,
-                    grad_static,
-                ) = self.gen_static_inputs_and_grad()
-
-                out_static_pg = self.cal_static_res(
-                    x_static,
-                    grad_static,
-                )
-
+            mp, sp, x_static, opt = self.build_static_program()
             exe = paddle.static.Executor(place=paddle.CUDAPlace(0))
-            exe.run(sp)
-            out = exe.run(
-                mp,
-                feed={"x": self.np_x, "grad": self.np_grad},
-                fetch_list=[out_static_pg],
+            out_static_baseline = self.run_static_steps(
+                exe, mp, sp, x_static, opt
             )
-            out_static_baseline = out[0]
-
-            del exe
-            gc.collect()
 
             for i in range(10):
-                exe = paddle.static.Executor(place=paddle.CUDAPlace(0))
-                exe.run(sp)
-                out = exe.run(
-                    mp,
-                    feed={"x": self.np_x, "grad": self.np_grad},
-                    fetch_list=[out_static_pg],
-                )
-                out_static = out[0]
+                out_static = self.run_static_steps(exe, mp, sp, x_static, opt)
                 # test develop static forward stability
                 np_assert_staility(
                     out_static,
@@ -352,9 +314,9 @@ class TestAdamWDevelopCase1_FP32(unittest.TestCase):
                     api="paddle.optimizer.adamw",
                 )
 
-                del exe
-                gc.collect()
-                paddle.device.cuda.empty_cache()
+            del exe
+            gc.collect()
+            maybe_trim("paddle")
 
 test_shape = [[1], [4096], [50176, 8192], [2048, 4096], [4096, 10944],
                     [10944], [5472, 4096], [50176, 4096], [6144], 
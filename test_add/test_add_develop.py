@@ -22,32 +22,31 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    grad
 )
+from api_test import ApiTest
 
 class TestAddDevelopCase1_FP32(unittest.TestCase):
     def setUp(self):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, y_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, y_torch, dout_torch
-        )
-        del x_torch
-        del y_torch
-        del dout_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, y_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, y_torch, dout_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.dtype = "float32"
@@ -175,22 +174,16 @@ class TestAddDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, y_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, y_eager, dout_eager
-        )
-        del x_eager
-        del y_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, y_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, y_eager, dout_eager
+            ))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # compare develop eager forward res with torch
         np_assert_accuracy(
             out_eager_np,
@@ -272,17 +265,15 @@ class TestAddDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, y_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(
-            x_eager, y_eager, dout_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager_baseline,
-        )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, y_eager, dout_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
 
         for i in range(5):
             out_eager, out_grads_eager = self.cal_eager_res(
@@ -737,6 +728,83 @@ class TestAddDevelopCase20_BFP16(TestAddDevelopCase20_FP32):
         self.dtype = "bfloat16"
         self.shape =[1]
 
+
+class TestAddFP32(ApiTest):
+    def setUp(self):
+        self.init_configs()
+        self.init_inputs()
+
+    def init_configs(self):
+        self.dtype = "float32"
+        self.shape = [1]
+        self.api = "paddle.add"
+
+    def init_inputs(self):
+        np_dtype = "float16" if self.dtype == "float16" else "float32"
+        x = np.random.random(size=self.shape).astype(np_dtype) - 0.5
+        y = np.random.random(size=self.shape).astype(np_dtype) - 0.5
+        self.inputs = [x, y]
+        self.out_grads = [
+            np.random.random(size=self.shape).astype(np_dtype) - 0.5
+        ]
+
+    def cal_paddle_res(self, inputs, out_grads=None):
+        out = paddle.add(inputs[0], inputs[1])
+        grad_out = grad(out, inputs, out_grads)
+        return out, grad_out
+
+    def cal_torch_res(self, inputs, out_grads=None):
+        out = torch.add(inputs[0], inputs[1])
+        grad_out = torch.autograd.grad(out, inputs, out_grads)
+        return out, grad_out
+
+    def test_eager_res(self):
+        self.check_eager_res()
+
+    def test_static_res(self):
+        self.check_static_res()
+
+    def test_eager_stability(self):
+        self.check_eager_stability()
+
+    def test_static_stability(self):
+        self.check_static_stability()
+
+
+class TestAddFP16(TestAddFP32):
+    def init_configs(self):
+        self.dtype = "float16"
+        self.shape = [1]
+        self.api = "paddle.add"
+
+
+class TestAddBFP16(TestAddFP32):
+    def init_configs(self):
+        self.dtype = "bfloat16"
+        self.shape = [1]
+        self.api = "paddle.add"
+
+
+class TestAddCase2FP32(TestAddFP32):
+    def init_configs(self):
+        self.dtype = "float32"
+        self.shape = [1, 12288]
+        self.api = "paddle.add"
+
+
+class TestAddCase2FP16(TestAddFP32):
+    def init_configs(self):
+        self.dtype = "float16"
+        self.shape = [1, 12288]
+        self.api = "paddle.add"
+
+
+class TestAddCase2BFP16(TestAddFP32):
+    def init_configs(self):
+        self.dtype = "bfloat16"
+        self.shape = [1, 12288]
+        self.api = "paddle.add"
+
 if __name__ == '__main__':
     np.random.seed(2023)
     unittest.main()
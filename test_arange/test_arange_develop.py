@@ -8,6 +8,7 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -19,10 +20,9 @@ class TestArangeDevelopCase1_FP32(unittest.TestCase):
     def setUp(self):
         self.init_params()
         self.init_threshold()
-        out_torch = self.cal_torch_res()
-        self.out_torch = out_torch.cpu().detach().numpy()
-        del out_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            out_torch = arena.track(self.cal_torch_res())
+            self.out_torch = out_torch.cpu().detach().numpy()
 
     def init_params(self):
         self.dtype = "float32"
@@ -56,11 +56,9 @@ class TestArangeDevelopCase1_FP32(unittest.TestCase):
         return out
 
     def test_eager_accuracy(self):
-        out_eager = self.cal_eager_res()
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        del out_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager = arena.track(self.cal_eager_res())
+            out_eager_np = out_eager.numpy()
         # compare develop eager forward res with torch
         np_assert_accuracy(
             out_eager_np,
@@ -102,10 +100,9 @@ class TestArangeDevelopCase1_FP32(unittest.TestCase):
         )
 
     def test_eager_stability(self):
-        out_eager_baseline = self.cal_eager_res()
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        del out_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline = arena.track(self.cal_eager_res())
+            out_eager_baseline_np = out_eager_baseline.numpy()
 
         for i in range(5):
             out_eager = self.cal_eager_res()
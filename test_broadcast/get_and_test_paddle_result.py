@@ -5,6 +5,7 @@ import paddle.distributed.fleet as fleet
 import init_config_class
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     np_assert_accuracy,
     np_assert_staility,
@@ -64,15 +65,11 @@ class TestPaddle(init_config_class.InitConfigClass):
         return x_t
 
     def _test_eager_accuracy(self):
-        x_eager = self._gen_eager_inputs_and_dout()
-        out_eager = self._cal_eager_res(x_eager)
-
-        del x_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
+        with TensorArena("paddle") as arena:
+            x_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager = arena.track(self._cal_eager_res(x_eager))
 
-        del out_eager
-        paddle.device.cuda.empty_cache()
+            out_eager_np = out_eager.numpy()
 
         # compare eager res with numpy
         try:
@@ -129,10 +126,9 @@ class TestPaddle(init_config_class.InitConfigClass):
 
     def _test_eager_stability(self):
         x_eager = self._gen_eager_inputs_and_dout()
-        out_eager_baseline = self._cal_eager_res(x_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        del out_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline = arena.track(self._cal_eager_res(x_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
 
         for i in range(50):
             out_eager = self._cal_eager_res(x_eager)
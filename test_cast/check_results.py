@@ -1,24 +1,28 @@
 import argparse
-from common import io
+import sys
+
+sys.path.append("..")
+from engine import NpyStore
 
 def parse_args():
   parser = argparse.ArgumentParser(description="test")
-  parser.add_argument("--paddle_rel", type=str, default="paddle_rel.pkl")
-  parser.add_argument("--paddle_dev", type=str, default="paddle_dev.pkl")
-  parser.add_argument("--torch", type=str, default="torch.pkl")
+  parser.add_argument("--paddle_rel", type=str, default="paddle_rel")
+  parser.add_argument("--paddle_dev", type=str, default="paddle_dev")
+  parser.add_argument("--torch", type=str, default="torch")
   args = parser.parse_args()
   return args.paddle_rel, args.paddle_dev, args.torch
 
 if __name__ == "__main__":
   pd_rel_p, pd_dev_p, torch_p = parse_args()
 
-  pd_rel_list = io.Pickle.load(pd_rel_p)
-  pd_dev_list = io.Pickle.load(pd_dev_p)
-  torch_list = io.Pickle.load(torch_p)
+  pd_rel_store = NpyStore(pd_rel_p)
+  pd_dev_store = NpyStore(pd_dev_p)
+  torch_store = NpyStore(torch_p)
 
-  assert(len(pd_dev_list) == len(pd_rel_list))
-  assert(len(pd_dev_list) == len(torch_list))
+  assert(len(pd_dev_store) == len(pd_rel_store))
+  assert(len(pd_dev_store) == len(torch_store))
 
-  for pd_dev, pd_rel, torch in zip(pd_dev_list, pd_rel_list, torch_list):
+  # one memory mapped result of each store at a time
+  for pd_dev, pd_rel, torch in zip(pd_dev_store, pd_rel_store, torch_store):
     pd_dev.assert_equal(pd_rel)
     pd_dev.assert_equal(torch)
@@ -1,3 +1,6 @@
+import sys
+
+sys.path.append("..")
 import attribute
 from common import io
 
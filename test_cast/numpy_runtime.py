@@ -0,0 +1,15 @@
+from common import framework
+from numerics import np_round_to_dtype
+
+def _round(x, dtype):
+  # uint16 is how paddle spells bfloat16
+  if dtype == "uint16":
+    dtype = "bfloat16"
+  return np_round_to_dtype(x, dtype).astype("float32")
+
+class Cast(framework.Framework):
+  @staticmethod
+  def launch(input_data, attr):
+    out = _round(_round(input_data.x, attr.src_dtype), attr.tgt_dtype)
+    out_grad = _round(_round(input_data.out_t, attr.tgt_dtype), attr.src_dtype)
+    return out, out_grad
@@ -4,9 +4,17 @@ from common import framework
 import numpy as np
 import attribute
 
+def init_worker():
+  # the eager mode is per thread in paddle, engine workers start without it
+  if not paddle.in_dynamic_mode():
+    paddle.disable_static()
+
 class Cast(framework.Framework):
+  # (x shape, out_t shape, src_dtype, tgt_dtype) -> (program, executor, fetch_list)
+  _static_cache = {}
+
   @staticmethod
-  def launch_static(input_data, attr):
+  def build_static(input_data, attr):
     with paddle.fluid.framework._dygraph_guard(None):
       mp, sp = paddle.static.Program(), paddle.static.Program()
       with paddle.static.program_guard(mp, sp):
@@ -32,12 +40,22 @@ class Cast(framework.Framework):
           place=paddle.CUDAPlace(0)
         )
         exe.run(sp)
-        ret = exe.run(
-          mp,
-          feed={"x": input_data.x, "out_t": input_data.out_t},
-          fetch_list=[out_static_fp32, out_static_grads_fp32],
-        )
-        return ret
+    return mp, exe, [out_static_fp32, out_static_grads_fp32]
+
+  @staticmethod
+  def launch_static(input_data, attr):
+    # build the program once, the stability rounds and later feeds of the
+    # same shape reuse it and its executor cache
+    key = (input_data.x.shape, input_data.out_t.shape, attr.src_dtype, attr.tgt_dtype)
+    if key not in Cast._static_cache:
+      Cast._static_cache[key] = Cast.build_static(input_data, attr)
+    mp, exe, fetch_list = Cast._static_cache[key]
+    with paddle.fluid.framework._dygraph_guard(None):
+      return exe.run(
+        mp,
+        feed={"x": input_data.x, "out_t": input_data.out_t},
+        fetch_list=fetch_list,
+      )
 
   @staticmethod
   def launch_eager(input_data, attr):
@@ -59,6 +77,7 @@ class Cast(framework.Framework):
         [out], [input_tensor], [t_tensor]
     )
     assert(len(out_grads) == 1)
-    return paddle.cast(out, "float32").numpy(), paddle.cast(out_grads[0], "float32").numpy()
+    # the engine downloads the results outside of its launch lock
+    return paddle.cast(out, "float32"), paddle.cast(out_grads[0], "float32")
 
 
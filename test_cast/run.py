@@ -1,37 +1,26 @@
 import os
+import sys
 import argparse
-import itertools
 import logging
+
+sys.path.append("..")
 from common import io
-from common import framework
-import attribute
 from attribute import CastAttr
-import numpy as np
-
-class CastRuntime(framework.Runtime):
-  def __init__(self, mode, attr):
-    sup = super(CastRuntime, self)
-    if mode == "paddle_eager":
-      import paddle_runtime
-      sup.__init__(mode, attr, paddle_runtime.Cast.launch_eager)
-    elif mode == "paddle_static":
-      import paddle_runtime
-      sup.__init__(mode, attr, paddle_runtime.Cast.launch_static)
-    elif mode == "torch_eager":
-      import torch_runtime
-      sup.__init__(mode, attr, torch_runtime.Cast.launch_eager)
+from engine import Engine, NpyStore
 
 def parse_args():
   parser = argparse.ArgumentParser(description="test")
-  parser.add_argument("--tag", type=str) # paddle_dev, paddle_rel, torch
+  parser.add_argument("--tag", type=str) # paddle_dev, paddle_rel, torch, numpy
   parser.add_argument("--input_path", type=str, default="inputs.pkl")
   parser.add_argument("--output_dir", type=str, default="./")
+  parser.add_argument("--num_workers", type=int, default=2)
+  parser.add_argument("--pool", type=str, default="thread") # thread, process
   args = parser.parse_args()
-  return args.tag, args.input_path, args.output_dir
+  return args.tag, args.input_path, args.output_dir, args.num_workers, args.pool
 
 
 if __name__ == "__main__":
-  tag, input_path, output_path = parse_args()
+  tag, input_path, output_path, num_workers, pool = parse_args()
   logging.warning("-- tag={}".format(tag))
   logging.warning("-- input_path={}".format(input_path))
   logging.warning("-- output_path={}".format(output_path))
@@ -39,8 +28,6 @@ if __name__ == "__main__":
   feeds = io.Pickle.load(input_path)
   logging.warning("-- feed data length={}".format(len(feeds)))
 
-  result = list()
-
   attrs = (
     CastAttr("float32", "float16"),
     CastAttr("float16", "float32"),
@@ -52,13 +39,13 @@ if __name__ == "__main__":
 
   if (tag.startswith("paddle")):
     modes = ("paddle_eager", "paddle_static")
+  elif tag == "numpy":
+    modes = ("numpy", "numpy")
   else:
     modes = ("torch_eager", "torch_eager")
 
-  for (feed, attr, mode) in itertools.product(feeds, attrs, modes):
-    runtime = CastRuntime(mode, attr)
-    runtime.stability_test(feed)
-    result.append(runtime.dispatch(feed))
-
-  io.Pickle.save(result, os.path.join(output_path, tag + ".pkl"))
-
+  # results are streamed to <output_dir>/<tag>/ as they complete
+  store = NpyStore(os.path.join(output_path, tag))
+  engine = Engine("Cast", sink=store, num_workers=num_workers, pool=pool)
+  engine.run(feeds, attrs, modes)
+  logging.warning("-- saved {} results to {}".format(len(store), store.root))
@@ -41,4 +41,5 @@ class Cast(framework.Framework):
     out_grads = torch.autograd.grad(
         [out], [input_tensor], [t_tensor]
     )
-    return out.to(torch.float32).cpu().detach().numpy(), out_grads[0].to(torch.float32).cpu().detach().numpy()
+    # the engine downloads the results outside of its launch lock
+    return out.to(torch.float32).detach(), out_grads[0].to(torch.float32).detach()
@@ -1,6 +1,5 @@
 import sys
 import unittest
-import gc
 
 import numpy as np
 import torch
@@ -9,6 +8,7 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -21,22 +21,16 @@ class TestConcatDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, dout_torch
-        )
-        for i in range(self.data_num):
-            del x_torch[0]
-        del x_torch
-        del dout_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        gc.collect()
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, dout_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.dtype = "float32"
@@ -157,25 +151,16 @@ class TestConcatDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, dout_eager
-        )
-        for i in range(self.data_num):
-            del x_eager[0]
-        del x_eager
-        del dout_eager
-        gc.collect()
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        gc.collect()
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, dout_eager
+            ))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # compare develop eager forward res with torch
         np_assert_accuracy(
             out_eager_np,
@@ -259,18 +244,15 @@ class TestConcatDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(
-            x_eager, dout_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager_baseline,
-        )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        gc.collect()
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, dout_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
 
         for i in range(5):
             out_eager, out_grads_eager = self.cal_eager_res(
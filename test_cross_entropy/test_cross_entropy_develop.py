@@ -5,11 +5,13 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    save_results,
 )
 
 
@@ -26,19 +28,15 @@ class TestCrossEntropyDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, y_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, y_torch, dout_torch)
-        del x_torch
-        del y_torch
-        del dout_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, y_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, y_torch, dout_torch))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -192,23 +190,17 @@ class TestCrossEntropyDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        logits_eager, label_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            logits_eager, label_eager, dout_eager)
-        del logits_eager
-        del label_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            logits_eager, label_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                logits_eager, label_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # save eager res for test_cross_entropy_incubate
-        np.savez(self.save_eager_res_path, out_eager=out_eager_np,
+        save_results(self.save_eager_res_path, out_eager=out_eager_np,
                  out_grads_eager_0=out_grads_eager_np[0])
 
         # compare eager res with torch
@@ -261,7 +253,7 @@ class TestCrossEntropyDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_cross_entropy_incubate
-        np.savez(self.save_static_res_path, out_static=out_static,
+        save_results(self.save_static_res_path, out_static=out_static,
                  out_grads_static_0=out_grads_static[0])
 
         # compare static res with torch
@@ -293,16 +285,14 @@ class TestCrossEntropyDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         logits_eager, label_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            logits_eager, label_eager, dout_eager)
-        out_eager_baseline_np = out_eager.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                logits_eager, label_eager, dout_eager))
+            out_eager_baseline_np = out_eager.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(
@@ -1,4 +1,5 @@
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from tensor_arena import TensorArena
+from utils import TOLERANCE, convert_dtype_to_torch_type, load_results
 import numpy as np
 import paddle
 import torch
@@ -119,26 +120,20 @@ class TestCrossEntropyLossIncubateCase1_FP32(unittest.TestCase):
     def test_eager_accuracy(self):
 
         # get develop eager res
-        develop_res_array = np.load(self.save_eager_res_path)
+        develop_res_array = load_results(self.save_eager_res_path)
         out_eager_develop = develop_res_array["out_eager"]
         out_eager_grad_0_develop = develop_res_array["out_grads_eager_0"][0]
         out_eager_grads_develop = [out_eager_grad_0_develop]
 
-        logits_eager, label_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            logits_eager, label_eager, dout_eager)
-        del logits_eager
-        del label_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            logits_eager, label_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                logits_eager, label_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # compare incubate eager res with develop eager res
         np.testing.assert_equal(
             out_eager_np,
@@ -160,7 +155,7 @@ class TestCrossEntropyLossIncubateCase1_FP32(unittest.TestCase):
 
     def test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self.save_static_res_path)
+        develop_res_array = load_results(self.save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
         out_grads_static_0_develop = develop_res_array["out_grads_static_0"][0]
         out_grads_static_develop = [out_grads_static_0_develop]
@@ -208,16 +203,14 @@ class TestCrossEntropyLossIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         logits_eager, label_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            logits_eager, label_eager, dout_eager)
-        out_eager_baseline_np = out_eager.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                logits_eager, label_eager, dout_eager))
+            out_eager_baseline_np = out_eager.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(
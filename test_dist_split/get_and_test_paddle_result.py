@@ -6,7 +6,7 @@ import init_config_class
 import random
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from utils import TOLERANCE, convert_dtype_to_torch_type, save_results
 
 def set_random_seed(seed):
     """Set random seed for reproducability."""
@@ -103,7 +103,7 @@ class TestPaddle(init_config_class.InitConfigClass):
             out_static, out_grads_static = out[0], out[1:]
             out_grads_static = out_grads_static[0]
 
-        np.savez(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
+        save_results(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
 
         # compare static res with torch
         try:
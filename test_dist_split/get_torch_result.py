@@ -5,6 +5,7 @@ import init_config_class
 import prepare_data
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import TOLERANCE, convert_dtype_to_torch_type
 
 class TestTorch(init_config_class.InitConfigClass):
@@ -13,19 +14,13 @@ class TestTorch(init_config_class.InitConfigClass):
         self._init_threshold()
         self._init_np_inputs_and_dout()
         self._device = device
-        data_torch = self._gen_torch_inputs_and_dout()
-        x_torch, weight_torch, bias_torch, dout_torch = data_torch[0], data_torch[1], data_torch[2], data_torch[3]
-        out_torch, out_grads_torch = self._cal_torch_res(x_torch, weight_torch, bias_torch, dout_torch)
-        del x_torch 
-        del weight_torch
-        del bias_torch
-        del dout_torch
-        
-        a = out_torch.cpu().detach().numpy()
-        b = [data.cpu().detach().numpy() for data in out_grads_torch]
+        with TensorArena("torch") as arena:
+            data_torch = arena.track(self._gen_torch_inputs_and_dout())
+            x_torch, weight_torch, bias_torch, dout_torch = data_torch[0], data_torch[1], data_torch[2], data_torch[3]
+            out_torch, out_grads_torch = arena.track(self._cal_torch_res(x_torch, weight_torch, bias_torch, dout_torch))
+            a = out_torch.cpu().detach().numpy()
+            b = [data.cpu().detach().numpy() for data in out_grads_torch]
         np.savez(torch_dir, torch_out=a, torch_out_grad=b)
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
     
     def _gen_torch_inputs_and_dout(self):
         x_torch = torch.tensor(
@@ -6,7 +6,7 @@ import init_config_class
 import random
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from utils import TOLERANCE, convert_dtype_to_torch_type, load_results
 
 def set_random_seed(seed):
     """Set random seed for reproducability."""
@@ -80,7 +80,7 @@ class TestPaddle(init_config_class.InitConfigClass):
         
     def _test_static_accuracy(self):
 
-        develop_res_array = np.load(self._save_static_res_path)
+        develop_res_array = load_results(self._save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
         out_grads_static_develop = develop_res_array["out_grads_static"]
 
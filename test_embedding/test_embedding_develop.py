@@ -5,15 +5,20 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
+    SparseRows,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
+    np_assert_sparse_rows,
     np_assert_staility,
+    save_results,
 )
+from token_ids import ID_WORKLOAD, generate_ids
 def generate_np_inputs_and_dout():
 
-    x_case1 = np.random.randint(1,3072,size=[1,4096])
+    x_case1 = generate_ids(ID_WORKLOAD, 1, 3072, [1,4096])
     w_case1 = np.random.random(size=[3072, 12288]).astype("float32")
     dout_case1 = np.random.random(size=[1,4096, 12288]).astype("float32")
     np.savez("./inputs_case1.npz", x = x_case1, weight = w_case1, dout = dout_case1)
@@ -23,18 +28,15 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, w_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(x_torch, w_torch, dout_torch)
-        del x_torch 
-        del w_torch 
-        del dout_torch 
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-                                lambda x: x.cpu().numpy(),
-                                out_grads_torch,
-                            )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, w_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(x_torch, w_torch, dout_torch))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            # only the rows looked up by x are kept of the weight grad
+            self.out_grads_torch = map_structure(
+                                    lambda x: SparseRows.from_dense(x.cpu().numpy(), self.np_x),
+                                    out_grads_torch,
+                                )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -176,21 +178,15 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_accuracy(self):
         # calculate develop eager res
-        x_eager, w_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, w_eager, dout_eager)
-        del x_eager
-        del w_eager 
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
-        np.savez(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0])
+        with TensorArena("paddle") as arena:
+            x_eager, w_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(x_eager, w_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
+        save_results(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0])
         # compare eager res with torch
         np_assert_accuracy(
             out_eager_np,
@@ -205,9 +201,10 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
             api="embedding",
         )
         for idx in range(len(out_grads_eager_np)):
-            np_assert_accuracy(
+            np_assert_sparse_rows(
                 out_grads_eager_np[idx],
                 self.out_grads_torch[idx],
+                self.np_x,
                 self.atol,
                 self.rtol,
                 self.dtype,
@@ -236,7 +233,7 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_scale_incubate
-        np.savez(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0])
+        save_results(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0])
         
         # compare static res with torch
         np_assert_accuracy(
@@ -252,9 +249,10 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
             api="embedding",
         )
         for idx in range(len(out_grads_static)):
-            np_assert_accuracy(
+            np_assert_sparse_rows(
                 out_grads_static[idx],
                 self.out_grads_torch[idx],
+                self.np_x,
                 self.atol,
                 self.rtol,
                 self.dtype,
@@ -267,15 +265,13 @@ class TestEmbeddingDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, w_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(x_eager, w_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                            )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(x_eager, w_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(x_eager, w_eager, dout_eager)
@@ -22,6 +22,7 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena, maybe_trim
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -34,12 +35,10 @@ class TestFill_DevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch = self.gen_torch_inputs_and_dout()
-        out_torch = self.cal_torch_res(x_torch)
-        del x_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        del out_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch = arena.track(self.cal_torch_res(x_torch))
+            self.out_torch = out_torch.cpu().detach().numpy()
 
     def init_params(self):
         self.dtype = "float32"
@@ -91,13 +90,10 @@ class TestFill_DevelopCase1_FP32(unittest.TestCase):
         return x
 
     def test_eager_accuracy(self):
-        x_eager = self.gen_eager_inputs_and_dout()
-        out_eager = self.cal_eager_res(x_eager)
-        del x_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        del out_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager = arena.track(self.cal_eager_res(x_eager))
+            out_eager_np = out_eager.numpy()
         # compare develop eager forward res with torch
         np_assert_accuracy(
             out_eager_np,
@@ -114,10 +110,12 @@ class TestFill_DevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager = self.gen_eager_inputs_and_dout()
+        # fill_ works in place, the float32 baseline is x_eager itself and
+        # must not be released
         out_eager_baseline = self.cal_eager_res(x_eager)
         out_eager_baseline_np = out_eager_baseline.numpy()
         del out_eager_baseline
-        paddle.device.cuda.empty_cache()
+        maybe_trim("paddle")
 
         for i in range(5):
             out_eager = self.cal_eager_res(x_eager)
@@ -21,11 +21,13 @@ import paddle
 import torch
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    save_results,
 )
 
 
@@ -57,16 +59,12 @@ class TestFillConstantDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs()
-        shape_torch, fill_value_torch, dtype_torch = self.gen_torch_inputs()
-        out_torch = self.cal_torch_res(
-            shape_torch, fill_value_torch, dtype_torch
-        )
-        del shape_torch
-        del fill_value_torch
-        del dtype_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        del out_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            shape_torch, fill_value_torch, dtype_torch = arena.track(self.gen_torch_inputs())
+            out_torch = arena.track(self.cal_torch_res(
+                shape_torch, fill_value_torch, dtype_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -122,20 +120,15 @@ class TestFillConstantDevelopCase1_FP32(unittest.TestCase):
         return out
 
     def test_eager_accuracy(self):
-        shape_eager, fill_value_eager, dtype_eager = self.gen_eager_inputs()
+        with TensorArena("paddle") as arena:
+            shape_eager, fill_value_eager, dtype_eager = arena.track(self.gen_eager_inputs())
 
-        out_eager = self.cal_eager_res(
-            shape_eager, fill_value_eager, dtype_eager
-        )
-        del shape_eager
-        del fill_value_eager
-        del dtype_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        del out_eager
-        paddle.device.cuda.empty_cache()
+            out_eager = arena.track(self.cal_eager_res(
+                shape_eager, fill_value_eager, dtype_eager
+            ))
+            out_eager_np = out_eager.numpy()
         # save eager res for test_full_incubate
-        np.savez(self.save_eager_res_path, out_eager=out_eager_np)
+        save_results(self.save_eager_res_path, out_eager=out_eager_np)
 
         # compare eager res with torch
         np_assert_accuracy(
@@ -174,7 +167,7 @@ class TestFillConstantDevelopCase1_FP32(unittest.TestCase):
             out_static = out[0]
 
         # save static res for test_full_incubate
-        np.savez(self.save_static_res_path, out_static=out_static)
+        save_results(self.save_static_res_path, out_static=out_static)
 
         # compare static res with torch
         np_assert_accuracy(
@@ -192,12 +185,11 @@ class TestFillConstantDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         shape_eager, fill_value_eager, dtype_eager = self.gen_eager_inputs()
-        out_eager_baseline = self.cal_eager_res(
-            shape_eager, fill_value_eager, dtype_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        del out_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline = arena.track(self.cal_eager_res(
+                shape_eager, fill_value_eager, dtype_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
 
         for i in range(50):
             out_eager = self.cal_eager_res(
@@ -6,6 +6,7 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("../..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     np_assert_accuracy
@@ -106,13 +107,9 @@ class TestFCDevelop(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, w_eager, b_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, w_eager, b_eager, dout_eager)
-        del x_eager
-        del w_eager 
-        del b_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, w_eager, b_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = self.cal_eager_res(x_eager, w_eager, b_eager, dout_eager)
         out_eager_np = out_eager.numpy()
         out_grads_eager_np = out_grads_eager.numpy()
         global_out.append(out_eager_np)
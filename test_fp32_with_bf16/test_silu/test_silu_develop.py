@@ -8,6 +8,7 @@ import paddle
 from paddle.utils import map_structure
 import sys
 sys.path.append("../..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     np_assert_accuracy
@@ -79,23 +80,18 @@ class TestSiluDevelop():
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, dout_eager
-        )
-        del x_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        global_out.append(out_eager_np)
-        global_dout.append(out_grads_eager_np)
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, dout_eager
+            ))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
+            global_out.append(out_eager_np)
+            global_dout.append(out_grads_eager_np)
         # compare develop eager forward res with torch
 
 
@@ -6,6 +6,7 @@ import init_config_class
 import random
 import sys
 sys.path.append("../..")
+from tensor_arena import TensorArena
 from utils import (
     np_assert_accuracy
 )
@@ -97,55 +98,48 @@ class TestPaddle(init_config_class.InitConfigClass):
         return out, out_grads
 
     def _test_eager_accuracy(self):
-        x_eager, table_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self._cal_eager_res(x_eager, table_eager, dout_eager)
-
-        del x_eager
-        del table_eager 
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = out_grads_eager.numpy()
-
-        global_out.append(out_eager_np)
-        global_dout.append(out_grads_eager_np)
-
-        if(self._dtype == "bfloat16"):
-            try:
-                np_assert_accuracy(
-                    global_out[0],
-                    global_out[1],
-                    self._atol,
-                    self._atol,
-                    "fp32_vs_bf16",
-                    version_a="fp32",
-                    version_b="bf16",
-                    eager_or_static_mode="eager",
-                    fwd_or_bkd="forward",
-                    api="fleet.meta_parallel.VocabParallelEmbedding",
-                )
-            except Exception as e:
-                print(e)
-
-            try:
-                np_assert_accuracy(
-                    global_dout[0],
-                    global_dout[1],
-                    self._atol,
-                    self._atol,
-                    "fp32_vs_bf16",
-                    version_a="fp32",
-                    version_b="bf16",
-                    eager_or_static_mode="eager",
-                    fwd_or_bkd="backward",
-                    api="fleet.meta_parallel.VocabParallelEmbedding",
-                )
-            except Exception as e:
-                print(e)
-
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, table_eager, dout_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self._cal_eager_res(x_eager, table_eager, dout_eager))
+
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = out_grads_eager.numpy()
+
+            global_out.append(out_eager_np)
+            global_dout.append(out_grads_eager_np)
+
+            if(self._dtype == "bfloat16"):
+                try:
+                    np_assert_accuracy(
+                        global_out[0],
+                        global_out[1],
+                        self._atol,
+                        self._atol,
+                        "fp32_vs_bf16",
+                        version_a="fp32",
+                        version_b="bf16",
+                        eager_or_static_mode="eager",
+                        fwd_or_bkd="forward",
+                        api="fleet.meta_parallel.VocabParallelEmbedding",
+                    )
+                except Exception as e:
+                    print(e)
+
+                try:
+                    np_assert_accuracy(
+                        global_dout[0],
+                        global_dout[1],
+                        self._atol,
+                        self._atol,
+                        "fp32_vs_bf16",
+                        version_a="fp32",
+                        version_b="bf16",
+                        eager_or_static_mode="eager",
+                        fwd_or_bkd="backward",
+                        api="fleet.meta_parallel.VocabParallelEmbedding",
+                    )
+                except Exception as e:
+                    print(e)
 
 
 dtype_list = ["float32", "bfloat16"]
@@ -20,7 +20,8 @@ import numpy as np
 import paddle
 
 sys.path.append("..")
-from utils import TOLERANCE
+from tensor_arena import TensorArena
+from utils import TOLERANCE, load_results
 
 
 class TestFullIncubateCase1_FP32(unittest.TestCase):
@@ -72,21 +73,16 @@ class TestFullIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_accuracy(self):
         # get develop eager res
-        develop_res_array = np.load(self.save_eager_res_path)
+        develop_res_array = load_results(self.save_eager_res_path)
         out_eager_develop = develop_res_array["out_eager"]
 
         # calculate incubate eager res
-        shape_eager, fill_value_eager, dtype_eager = self.gen_eager_inputs()
-        out_eager = self.cal_eager_res(
-            shape_eager, fill_value_eager, dtype_eager
-        )
-        del shape_eager
-        del fill_value_eager
-        del dtype_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        del out_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            shape_eager, fill_value_eager, dtype_eager = arena.track(self.gen_eager_inputs())
+            out_eager = arena.track(self.cal_eager_res(
+                shape_eager, fill_value_eager, dtype_eager
+            ))
+            out_eager_np = out_eager.numpy()
 
         # compare incubate eager res with develop eager res
         np.testing.assert_equal(
@@ -100,7 +96,7 @@ class TestFullIncubateCase1_FP32(unittest.TestCase):
 
     def test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self.save_static_res_path)
+        develop_res_array = load_results(self.save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
 
         # calculate incubate static res
@@ -137,12 +133,11 @@ class TestFullIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         shape_eager, fill_value_eager, dtype_eager = self.gen_eager_inputs()
-        out_eager_baseline = self.cal_eager_res(
-            shape_eager, fill_value_eager, dtype_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        del out_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline = arena.track(self.cal_eager_res(
+                shape_eager, fill_value_eager, dtype_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
 
         for i in range(50):
             out_eager = self.cal_eager_res(
@@ -6,7 +6,7 @@ import unittest
 from paddle.fluid.layers.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from utils import TOLERANCE, convert_dtype_to_torch_type, load_results
 
 
 class TestFCIncubateCase1_FP32(unittest.TestCase):
@@ -101,7 +101,7 @@ class TestFCIncubateCase1_FP32(unittest.TestCase):
 
     def test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self.save_static_res_path)
+        develop_res_array = load_results(self.save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
         out_grads_static_0_develop = develop_res_array["out_grads_static_0"]
         out_grads_static_1_develop = develop_res_array["out_grads_static_1"]
@@ -0,0 +1,237 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""fused_linear_param_grad_add chained over K microbatches.
+
+Usage (from test_fused_linear_param_grad_add):
+    python accumulate_microbatches.py [--shape 1 8192 14336] \
+        [--output_size 5376] [--dtype bfloat16] [--microbatches 8] \
+        [--multi_precision 0 1] [--modes fused unfused] [--record_dir DIR]
+
+In pipeline training the op runs once per microbatch into the same
+dweight/dbias accumulator. Here each mode accumulates the same K
+microbatches (fresh x and dy per microbatch) into one accumulator:
+
+    fused    _C_ops.fused_linear_param_grad_add(x, dy, dweight, dbias, mp)
+    unfused  matmul(x, dy, transpose_x=True) and dy.sum(0), cast to
+             float32 for multi_precision, then add_ into the accumulator
+
+Every call is timed with a device synchronize around it. After every
+microbatch the accumulators are compared with a float64 accumulation of
+the same inputs. The report shows per-call latency and how the max
+abs/relative error grows with the number of microbatches, so the float32
+accumulator of multi_precision can be told apart from accumulating in the
+input dtype.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import paddle
+from paddle import _C_ops
+
+sys.path.append("..")
+from benchmark import summarize
+from records import RecordStore
+
+
+def _cast(x, dtype):
+    if dtype == "bfloat16":
+        return paddle.cast(x, dtype="uint16")
+    return x.astype(dtype)
+
+
+def _to_float64(x):
+    if x.dtype in [paddle.float16, paddle.bfloat16]:
+        x = x.astype("float32")
+    return x.astype("float64")
+
+
+def _as_2d(x):
+    return x.reshape([-1, x.shape[-1]])
+
+
+def fused_step(x, dy, dweight, dbias, multi_precision):
+    return _C_ops.fused_linear_param_grad_add(
+        x, dy, dweight, dbias, multi_precision
+    )
+
+
+def unfused_step(x, dy, dweight, dbias, multi_precision):
+    x_2d, dy_2d = _as_2d(x), _as_2d(dy)
+    dweight_tmp = paddle.matmul(x_2d, dy_2d, transpose_x=True)
+    dbias_tmp = dy_2d.sum(axis=0)
+    if multi_precision:
+        dweight_tmp = dweight_tmp.astype("float32")
+        dbias_tmp = dbias_tmp.astype("float32")
+    if dweight is None:
+        return dweight_tmp, dbias_tmp
+    dweight.add_(dweight_tmp)
+    dbias.add_(dbias_tmp)
+    return dweight, dbias
+
+
+MODES = {"fused": fused_step, "unfused": unfused_step}
+
+
+def reference_step(x, dy, dweight, dbias):
+    x_2d, dy_2d = _as_2d(_to_float64(x)), _as_2d(_to_float64(dy))
+    dweight_tmp = paddle.matmul(x_2d, dy_2d, transpose_x=True)
+    dbias_tmp = dy_2d.sum(axis=0)
+    if dweight is None:
+        return dweight_tmp, dbias_tmp
+    dweight.add_(dweight_tmp)
+    dbias.add_(dbias_tmp)
+    return dweight, dbias
+
+
+def error(x, reference):
+    """(max abs error, max abs error / max |reference|)"""
+    max_abs = float((_to_float64(x) - reference).abs().max())
+    scale = float(reference.abs().max())
+    return max_abs, max_abs / scale if scale else max_abs
+
+
+def microbatch(shape, output_size, dtype):
+    x = paddle.rand(shape, dtype="float32") - 0.5
+    dy = paddle.rand(shape[:-1] + [output_size], dtype="float32") - 0.5
+    return _cast(x, dtype), _cast(dy, dtype)
+
+
+def accumulate(args, multi_precision):
+    """Per mode call times and per microbatch errors of one accumulation."""
+    paddle.seed(args.seed)
+    # warm up the kernels (and the allocator) of every mode once
+    x, dy = microbatch(args.shape, args.output_size, args.dtype)
+    for mode in args.modes:
+        MODES[mode](x, dy, None, None, multi_precision)
+    reference = (None, None)
+    accumulators = {mode: (None, None) for mode in args.modes}
+    times = {mode: [] for mode in args.modes}
+    errors = {mode: [] for mode in args.modes}
+    for _ in range(args.microbatches):
+        x, dy = microbatch(args.shape, args.output_size, args.dtype)
+        reference = reference_step(x, dy, *reference)
+        for mode in args.modes:
+            paddle.device.cuda.synchronize()
+            start = time.perf_counter()
+            accumulators[mode] = MODES[mode](
+                x, dy, *accumulators[mode], multi_precision
+            )
+            paddle.device.cuda.synchronize()
+            times[mode].append(time.perf_counter() - start)
+            dweight, dbias = accumulators[mode]
+            errors[mode].append(
+                error(dweight, reference[0]) + error(dbias, reference[1])
+            )
+    return times, errors
+
+
+def call_bytes(args, multi_precision):
+    element_size = 4 if args.dtype == "float32" else 2
+    acc_size = 4 if multi_precision else element_size
+    rows = int(np.prod(args.shape[:-1]))
+    k, n = args.shape[-1], args.output_size
+    # read x and dy, read and write dweight and dbias
+    return rows * (k + n) * element_size + 2 * (k * n + n) * acc_size
+
+
+def call_flops(args):
+    return 2 * int(np.prod(args.shape)) * args.output_size
+
+
+def print_report(records):
+    header = "{:<10} {:<4} {:>10} {:>10} {:>9} {:>9}  {}".format(
+        "mode", "mp", "p50(ms)", "p90(ms)", "TFLOP/s", "GB/s",
+        "dweight rel err after 1, K/2, K microbatches",
+    )
+    print(header)
+    print("-" * len(header))
+    for r in records:
+        rel = [e[1] for e in r["errors"]]
+        picks = [rel[0], rel[(len(rel) - 1) // 2], rel[-1]]
+        print(
+            "{:<10} {:<4} {:>10.4f} {:>10.4f} {:>9.2f} {:>9.1f}  {}".format(
+                r["mode"],
+                int(r["multi_precision"]),
+                r["p50_ms"],
+                r["p90_ms"],
+                r["tflops"],
+                r["gbps"],
+                " ".join("{:.3e}".format(e) for e in picks),
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="fused_linear_param_grad_add microbatch accumulation"
+    )
+    parser.add_argument(
+        "--shape", type=int, nargs="+", default=[1, 8192, 14336]
+    )
+    parser.add_argument("--output_size", type=int, default=5376)
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="bfloat16",
+        choices=["float32", "float16", "bfloat16"],
+    )
+    parser.add_argument("--microbatches", type=int, default=8)
+    parser.add_argument(
+        "--multi_precision", type=int, nargs="+", default=[0, 1]
+    )
+    parser.add_argument(
+        "--modes", nargs="+", default=["fused", "unfused"], choices=list(MODES)
+    )
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    records = []
+    for multi_precision in args.multi_precision:
+        times, errors = accumulate(args, bool(multi_precision))
+        for mode in args.modes:
+            record = summarize(
+                "fused_linear_param_grad_add_{}_{}{}_K{}".format(
+                    mode,
+                    args.dtype,
+                    "_multi_precision" if multi_precision else "",
+                    args.microbatches,
+                ),
+                "paddle",
+                args.dtype,
+                np.array(times[mode]),
+                call_bytes(args, multi_precision),
+                call_flops(args),
+            )
+            record["mode"] = mode
+            record["multi_precision"] = bool(multi_precision)
+            record["microbatches"] = args.microbatches
+            # per microbatch: dweight abs, dweight rel, dbias abs, dbias rel
+            record["errors"] = errors[mode]
+            records.append(record)
+    print_report(records)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for record in records:
+            store.append("benchmark", record)
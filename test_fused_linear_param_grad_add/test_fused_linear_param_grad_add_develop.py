@@ -24,6 +24,7 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -88,19 +89,13 @@ class TestFusedLinearParamGradAddDevelopCase1_FP32(unittest.TestCase):
         self.has_dweight = None
         self.has_dbias = None
         self.multi_precision = True
-        x_torch, dy_torch, dweight_torch, dbias_torch = self.gen_torch_inputs_and_dout()
-        out_dweight_torch, out_dbias_torch = self.cal_torch_res(
-            x_torch, dy_torch, dweight_torch, dbias_torch
-        )
-        del x_torch
-        del dy_torch
-        del dweight_torch
-        del dbias_torch
-        self.out_dweight_torch = out_dweight_torch.cpu().numpy()
-        self.out_dbias_torch = out_dbias_torch.cpu().numpy()
-
-        del out_dweight_torch, out_dbias_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, dy_torch, dweight_torch, dbias_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_dweight_torch, out_dbias_torch = arena.track(self.cal_torch_res(
+                x_torch, dy_torch, dweight_torch, dbias_torch
+            ))
+            self.out_dweight_torch = out_dweight_torch.cpu().numpy()
+            self.out_dbias_torch = out_dbias_torch.cpu().numpy()
 
     def init_params(self):
         self.dtype = "float32"
@@ -213,21 +208,13 @@ class TestFusedLinearParamGradAddDevelopCase1_FP32(unittest.TestCase):
         return out_dweight, out_dbias
 
     def test_eager_accuracy(self):
-        x_eager, dy_eager, dweight_eager, dbias_eager = self.gen_eager_inputs_and_dout()
-        out_dweight_eager, out_dbias_eager = self.cal_eager_res(
-            x_eager, dy_eager, dweight_eager, dbias_eager
-        )
-        del x_eager
-        del dy_eager
-        del dweight_eager
-        del dbias_eager
-        paddle.device.cuda.empty_cache()
-        out_dweight_eager_np = out_dweight_eager.numpy()
-        out_dbias_eager_np = out_dbias_eager.numpy()
-
-        del out_dweight_eager
-        del out_dbias_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dy_eager, dweight_eager, dbias_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_dweight_eager, out_dbias_eager = arena.track(self.cal_eager_res(
+                x_eager, dy_eager, dweight_eager, dbias_eager
+            ))
+            out_dweight_eager_np = out_dweight_eager.numpy()
+            out_dbias_eager_np = out_dbias_eager.numpy()
         # compare develop eager forward res with torch
         np_assert_accuracy(
             out_dweight_eager_np,
@@ -256,15 +243,12 @@ class TestFusedLinearParamGradAddDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, dy_eager, dweight_eager, dbias_eager = self.gen_eager_inputs_and_dout()
-        out_dweight_eager_baseline, out_dbias_eager_baseline = self.cal_eager_res(
-            x_eager, dy_eager, dweight_eager, dbias_eager
-        )
-        out_dweight_eager_baseline_np = out_dweight_eager_baseline.numpy()
-        out_dbias_eager_baseline_np = out_dbias_eager_baseline.numpy()
-
-        del out_dweight_eager_baseline
-        del out_dbias_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_dweight_eager_baseline, out_dbias_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, dy_eager, dweight_eager, dbias_eager
+            ))
+            out_dweight_eager_baseline_np = out_dweight_eager_baseline.numpy()
+            out_dbias_eager_baseline_np = out_dbias_eager_baseline.numpy()
 
         for i in range(5):
             x_eager, dy_eager, dweight_eager, dbias_eager = self.gen_eager_inputs_and_dout()
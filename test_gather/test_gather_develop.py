@@ -5,12 +5,14 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from tensor_arena import TensorArena
+from utils import TOLERANCE, convert_dtype_to_torch_type, save_results
+from token_ids import ID_WORKLOAD, generate_ids
 
 
 def generate_np_inputs_and_dout():
     input_case1 = np.random.random(size=[12288]).astype("float32")-0.5
-    index_case1 = np.random.randint(12288, size=[1]).astype("int32")
+    index_case1 = generate_ids(ID_WORKLOAD, 0, 12288, [1]).astype("int32")
     dout_case1 = np.random.random(size=[1]).astype("float32")-0.5
 
     np.savez("./inputs_case1.npz", x = input_case1, index = index_case1, dout = dout_case1)
@@ -20,18 +22,14 @@ class TestGatherDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        input_torch, index_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(input_torch, index_torch, dout_torch)
-        del input_torch 
-        del index_torch
-        del dout_torch 
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-                                lambda x: x.cpu().numpy(),
-                                out_grads_torch,
-                            )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            input_torch, index_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(input_torch, index_torch, dout_torch))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                                    lambda x: x.cpu().numpy(),
+                                    out_grads_torch,
+                                )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -166,22 +164,16 @@ class TestGatherDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        input_eager, index_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(input_eager, index_eager, dout_eager)
-        del input_eager
-        del index_eager 
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            input_eager, index_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(input_eager, index_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
         # save eager res for test_gather_incubate
-        np.savez(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0])
+        save_results(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0])
 
         max_atol_idx = np.argmax(np.abs(out_eager_np-self.out_torch))
         max_rtol_idx = np.argmax(np.abs((out_eager_np-self.out_torch)/out_eager_np))
@@ -238,7 +230,7 @@ class TestGatherDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_gather_incubate
-        np.savez(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0])
+        save_results(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0])
         
         max_atol_idx = np.argmax(np.abs(out_static-self.out_torch))
         max_rtol_idx = np.argmax(np.abs((out_static-self.out_torch)/out_static))
@@ -275,15 +267,13 @@ class TestGatherDevelopCase1_FP32(unittest.TestCase):
     
     def test_eager_stability(self):
         input_eager, index_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(input_eager, index_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                            )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(input_eager, index_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(input_eager, index_eager, dout_eager)
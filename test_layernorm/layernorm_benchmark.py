@@ -0,0 +1,237 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Achieved bandwidth of layer_norm over a rows x hidden sweep.
+
+Usage (from test_layernorm):
+    python layernorm_benchmark.py [--rows 1 4096 8192] \
+        [--hidden 12288 14336] [--dtypes float32 float16 bfloat16] \
+        [--passes forward forward_backward] [--peak_gbps 2039] \
+        [--record_dir DIR]
+
+The default grid holds the shapes of test_layernorm_develop.py ([1, 12288],
+[1, 4096, 12288] and [1, 8192, 14336], normalized over the last axis) and
+their rows x hidden neighbours. For every point, dtype and pass the
+paddle.nn.functional.layer_norm and torch.nn.functional.layer_norm calls
+are timed like benchmark.py does. The forward pass runs without autograd,
+the forward_backward pass also takes the x, weight and bias grads.
+
+layer_norm is memory bound, so the report gives GB/s of the effective
+bytes (op_costs.layer_norm_bytes), i.e. what the kernels have to read and
+write at least, and the fraction of --peak_gbps. Without --peak_gbps the peak is a
+measured device to device copy of the largest x in the sweep.
+
+The test cases themselves define get_bytes() with the same function, so
+    python ../benchmark.py test_layernorm_develop.py
+times the exact accuracy inputs with the same GB/s. Both append to the
+"benchmark" records of records.RecordStore next to the accuracy records.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+import paddle
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+sys.path.append("..")
+from benchmark import summarize, time_call
+from op_costs import layer_norm_bytes
+from records import RecordStore
+from utils import convert_dtype_to_torch_type
+
+EPSILON = 1e-05
+
+
+def _paddle_call(np_inputs, dtype, backward):
+    def to_tensor(x):
+        t = paddle.to_tensor(
+            x, dtype=dtype if dtype != "bfloat16" else "float32", place="gpu"
+        )
+        t = paddle.cast(t, dtype="uint16") if dtype == "bfloat16" else t
+        t.stop_gradient = False
+        return t
+
+    x, weight, bias, dout = [to_tensor(a) for a in np_inputs]
+    hidden = x.shape[-1]
+
+    def call():
+        if not backward:
+            with paddle.no_grad():
+                return paddle.nn.functional.layer_norm(
+                    x, [hidden], weight, bias, EPSILON
+                )
+        out = paddle.nn.functional.layer_norm(
+            x, [hidden], weight, bias, EPSILON
+        )
+        return paddle.grad([out], [x, weight, bias], grad_outputs=[dout])
+
+    return call
+
+
+def _torch_call(np_inputs, dtype, backward):
+    torch_dtype = convert_dtype_to_torch_type(dtype)
+    x, weight, bias, dout = [
+        torch.tensor(a, device="cuda", dtype=torch_dtype, requires_grad=True)
+        for a in np_inputs
+    ]
+    hidden = x.shape[-1]
+
+    def call():
+        if not backward:
+            with torch.no_grad():
+                return torch.nn.functional.layer_norm(
+                    x, [hidden], weight, bias, EPSILON
+                )
+        out = torch.nn.functional.layer_norm(
+            x, [hidden], weight, bias, EPSILON
+        )
+        return torch.autograd.grad(
+            [out], [x, weight, bias], grad_outputs=[dout]
+        )
+
+    return call
+
+
+def copy_gbps(numel, warmup, iters):
+    """GB/s of a device to device copy of numel float32 elements."""
+    x = paddle.rand([numel], dtype="float32")
+    times = time_call(
+        lambda: paddle.assign(x), paddle.device.cuda.synchronize, warmup, iters
+    )
+    del x
+    return 2 * numel * 4 / np.percentile(times, 50) / 1e9
+
+
+def benchmark_sweep(args):
+    frameworks = [fw for fw in args.frameworks if fw != "torch" or torch]
+    rng = np.random.RandomState(args.seed)
+    records = []
+    for rows in args.rows:
+        for hidden in args.hidden:
+            np_inputs = [
+                rng.random_sample(shape).astype("float32") - 0.5
+                for shape in ([rows, hidden], [hidden], [hidden], [rows, hidden])
+            ]
+            for dtype in args.dtypes:
+                if dtype == "float16":
+                    inputs = [a.astype("float16") for a in np_inputs]
+                else:
+                    inputs = np_inputs
+                for pass_name in args.passes:
+                    backward = pass_name == "forward_backward"
+                    nbytes = layer_norm_bytes(rows, hidden, dtype, backward)
+                    for framework in frameworks:
+                        make_call = (
+                            _torch_call if framework == "torch" else _paddle_call
+                        )
+                        call = make_call(inputs, dtype, backward)
+                        synchronize = (
+                            torch.cuda.synchronize
+                            if framework == "torch"
+                            else paddle.device.cuda.synchronize
+                        )
+                        times = time_call(
+                            call, synchronize, args.warmup, args.iters
+                        )
+                        del call
+                        record = summarize(
+                            "layer_norm_{}x{}_{}".format(rows, hidden, pass_name),
+                            framework,
+                            dtype,
+                            times,
+                            nbytes,
+                            None,
+                        )
+                        record["rows"] = rows
+                        record["hidden"] = hidden
+                        record["pass"] = pass_name
+                        records.append(record)
+    return records
+
+
+def print_report(records, peak_gbps):
+    header = "{:<7} {:>7} {:<9} {:<17} {:<7} {:>10} {:>10} {:>9} {:>7}".format(
+        "rows", "hidden", "dtype", "pass", "fw", "p50(ms)", "p90(ms)",
+        "GB/s", "% peak",
+    )
+    print("peak {:.1f} GB/s".format(peak_gbps))
+    print(header)
+    print("-" * len(header))
+    for r in records:
+        print(
+            "{:<7} {:>7} {:<9} {:<17} {:<7} {:>10.4f} {:>10.4f} {:>9.1f} {:>7.1f}".format(
+                r["rows"],
+                r["hidden"],
+                r["dtype"],
+                r["pass"],
+                r["framework"],
+                r["p50_ms"],
+                r["p90_ms"],
+                r["gbps"],
+                r["peak_fraction"] * 100,
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="layer_norm bandwidth sweep")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 4096, 8192])
+    parser.add_argument(
+        "--hidden", type=int, nargs="+", default=[12288, 14336]
+    )
+    parser.add_argument(
+        "--dtypes",
+        nargs="+",
+        default=["float32", "float16", "bfloat16"],
+        choices=["float32", "float16", "bfloat16"],
+    )
+    parser.add_argument(
+        "--passes",
+        nargs="+",
+        default=["forward", "forward_backward"],
+        choices=["forward", "forward_backward"],
+    )
+    parser.add_argument(
+        "--frameworks", nargs="+", default=["torch", "paddle"]
+    )
+    parser.add_argument("--peak_gbps", type=float, default=None)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--record_dir", type=str, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    peak_gbps = args.peak_gbps or copy_gbps(
+        max(args.rows) * max(args.hidden), args.warmup, args.iters
+    )
+    records = benchmark_sweep(args)
+    for record in records:
+        record["peak_gbps"] = peak_gbps
+        record["peak_fraction"] = record["gbps"] / peak_gbps
+    print_report(records, peak_gbps)
+    store = (
+        RecordStore(args.record_dir)
+        if args.record_dir
+        else RecordStore.from_env()
+    )
+    if store is not None:
+        for record in records:
+            store.append("benchmark", record)
@@ -5,7 +5,9 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from tensor_arena import TensorArena
+from utils import TOLERANCE, convert_dtype_to_torch_type, save_results
+from op_costs import layer_norm_bytes
 
  
 def generate_np_inputs_and_dout():    
@@ -54,6 +56,13 @@ class TestLayerNormDevelopCase1_FP32(unittest.TestCase):
         self.atol = TOLERANCE[self.dtype]["atol"]
         self.rtol = TOLERANCE[self.dtype]["rtol"]
 
+    def get_bytes(self):
+        # effective bytes of forward + backward
+        shape = self.np_x.shape
+        rows = int(np.prod(shape[:self.begin_norm_axis]))
+        hidden = int(np.prod(shape[self.begin_norm_axis:]))
+        return layer_norm_bytes(rows, hidden, self.dtype)
+
     def init_np_inputs_and_dout(self):
         np_inputs_array = np.load(self.np_input_dir)
         # get np array from npz file
@@ -121,19 +130,14 @@ class TestLayerNormDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
     
     def cal_torch_accuracy(self):
-        x_torch, weight_torch, bias_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(x_torch, weight_torch, bias_torch, dout_torch)
-        del x_torch 
-        del weight_torch
-        del bias_torch
-        del dout_torch 
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-                                lambda x: x.cpu().numpy(),
-                                out_grads_torch,
-                            )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, weight_torch, bias_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(x_torch, weight_torch, bias_torch, dout_torch))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                                    lambda x: x.cpu().numpy(),
+                                    out_grads_torch,
+                                )
         
     def gen_eager_inputs_and_dout(self):
         x_eager = paddle.to_tensor(
@@ -179,23 +183,16 @@ class TestLayerNormDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
         
     def test_eager_accuracy(self):
-        x_eager, weight_eager, bias_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
-        del x_eager
-        del weight_eager 
-        del bias_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, weight_eager, bias_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
         # save eager res for test_layer_norm_incubate
-        np.savez(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0], out_grads_eager_1=out_grads_eager_np[1], out_grads_eager_2=out_grads_eager_np[2])
+        save_results(self.save_eager_res_path, out_eager=out_eager_np, out_grads_eager_0=out_grads_eager_np[0], out_grads_eager_1=out_grads_eager_np[1], out_grads_eager_2=out_grads_eager_np[2])
         
         # compare eager res with torch
         np.testing.assert_allclose(
@@ -289,7 +286,7 @@ class TestLayerNormDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_layer_norm_incubate
-        np.savez(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0], out_grads_static_1=out_grads_static[1], out_grads_static_2=out_grads_static[2])
+        save_results(self.save_static_res_path, out_static=out_static, out_grads_static_0=out_grads_static[0], out_grads_static_1=out_grads_static[1], out_grads_static_2=out_grads_static[2])
         
         # compare static res with torch
         np.testing.assert_allclose(
@@ -316,16 +313,14 @@ class TestLayerNormDevelopCase1_FP32(unittest.TestCase):
             
     def test_eager_stability(self):        
         x_eager, weight_eager, bias_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager))
         
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                            )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
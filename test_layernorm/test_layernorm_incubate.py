@@ -4,7 +4,8 @@ import unittest
 from paddle.fluid.layers.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE
+from tensor_arena import TensorArena
+from utils import TOLERANCE, load_results
 
 class TestLayerNormIncubateCase1_FP32(unittest.TestCase):
     def setUp(self):
@@ -83,7 +84,7 @@ class TestLayerNormIncubateCase1_FP32(unittest.TestCase):
     
     def test_eager_accuracy(self):
         # get develop eager res
-        develop_res_array = np.load(self.save_eager_res_path)
+        develop_res_array = load_results(self.save_eager_res_path)
         out_eager_develop = develop_res_array["out_eager"]
         out_eager_grad_0_develop = develop_res_array["out_grads_eager_0"]
         out_eager_grad_1_develop = develop_res_array["out_grads_eager_1"]
@@ -91,21 +92,14 @@ class TestLayerNormIncubateCase1_FP32(unittest.TestCase):
         out_eager_grads_develop = [out_eager_grad_0_develop, out_eager_grad_1_develop, out_eager_grad_2_develop]
 
         # calculate incubate eager res
-        x_eager, weight_eager, bias_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
-        del x_eager
-        del weight_eager 
-        del bias_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, weight_eager, bias_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
         # compare incubate eager res with develop eager res
         np.testing.assert_equal(
             out_eager_np,
@@ -175,7 +169,7 @@ class TestLayerNormIncubateCase1_FP32(unittest.TestCase):
     
     def test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self.save_static_res_path)
+        develop_res_array = load_results(self.save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
         out_grads_static_0_develop = develop_res_array["out_grads_static_0"]
         out_grads_static_1_develop = develop_res_array["out_grads_static_1"]
@@ -225,16 +219,14 @@ class TestLayerNormIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, weight_eager, bias_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager))
         
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                            )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(x_eager, weight_eager, bias_eager, dout_eager)
@@ -22,11 +22,13 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    save_results,
 )
 
 
@@ -115,25 +117,33 @@ def generate_np_inputs_and_dout():
     np.savez("./inputs_case11.npz", x=x_case11, y=y_case11, dout=dout_case11)
     np.savez("./inputs_case12.npz", x=x_case12, y=y_case12, b=b_case12, dout=dout_case12)
 
+def matmul_flops(x_shape, y_shape, transpose_x, transpose_y):
+    """Flops of the forward matmul plus the two matmuls of its backward."""
+    x_shape, y_shape = list(x_shape), list(y_shape)
+    if transpose_x:
+        x_shape[-2], x_shape[-1] = x_shape[-1], x_shape[-2]
+    if transpose_y:
+        y_shape[-2], y_shape[-1] = y_shape[-1], y_shape[-2]
+    batch = np.broadcast_shapes(tuple(x_shape[:-2]), tuple(y_shape[:-2]))
+    m, k, n = x_shape[-2], x_shape[-1], y_shape[-1]
+    return 3 * 2 * int(np.prod(batch, dtype=np.int64)) * m * k * n
+
+
 class TestMatmulDevelopCase1_FP32(unittest.TestCase):
     def setUp(self):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, y_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, y_torch, self.transpose_x, self.transpose_y, dout_torch
-        )
-        del x_torch
-        del y_torch
-        del dout_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, y_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, y_torch, self.transpose_x, self.transpose_y, dout_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -159,6 +169,11 @@ class TestMatmulDevelopCase1_FP32(unittest.TestCase):
             self.np_y = self.np_y.astype("float16")
             self.np_dout = self.np_dout.astype("float16")
 
+    def get_flops(self):
+        return matmul_flops(
+            self.np_x.shape, self.np_y.shape, self.transpose_x, self.transpose_y
+        )
+
     def gen_torch_inputs_and_dout(self):
         x_torch = torch.tensor(
             self.np_x,
@@ -277,24 +292,18 @@ class TestMatmulDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, y_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, y_eager, self.transpose_x, self.transpose_y, dout_eager
-        )
-        del x_eager
-        del y_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, y_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, y_eager, self.transpose_x, self.transpose_y, dout_eager
+            ))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # save eager res for test_matmul_incubate
-        np.savez(
+        save_results(
             self.save_eager_res_path,
             out_eager=out_eager_np,
             out_grads_eager_0=out_grads_eager_np[0],
@@ -354,7 +363,7 @@ class TestMatmulDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_matmul_incubate
-        np.savez(
+        save_results(
             self.save_static_res_path,
             out_static=out_static,
             out_grads_static_0=out_grads_static[0],
@@ -390,17 +399,15 @@ class TestMatmulDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, y_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(
-            x_eager, y_eager, self.transpose_x, self.transpose_y, dout_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager_baseline,
-        )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, y_eager, self.transpose_x, self.transpose_y, dout_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
 
         for i in range(5):
             out_eager, out_grads_eager = self.cal_eager_res(
@@ -801,21 +808,16 @@ class TestMatmulAndAddDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, y_torch, b_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, y_torch, self.transpose_x, self.transpose_y, b_torch, dout_torch
-        )
-        del x_torch
-        del y_torch
-        del dout_torch
-        del b_torch
-        self.out_torch = out_torch.cpu().detach().numpy()
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, y_torch, b_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, y_torch, self.transpose_x, self.transpose_y, b_torch, dout_torch
+            ))
+            self.out_torch = out_torch.cpu().detach().numpy()
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case12.npz"
@@ -843,6 +845,11 @@ class TestMatmulAndAddDevelopCase1_FP32(unittest.TestCase):
             self.np_dout = self.np_dout.astype("float16")
             self.np_b = self.np_b.astype("float16")
 
+    def get_flops(self):
+        return matmul_flops(
+            self.np_x.shape, self.np_y.shape, self.transpose_x, self.transpose_y
+        )
+
     def gen_torch_inputs_and_dout(self):
         x_torch = torch.tensor(
             self.np_x,
@@ -990,25 +997,18 @@ class TestMatmulAndAddDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, y_eager, b_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, y_eager, self.transpose_x, self.transpose_y, b_eager, dout_eager
-        )
-        del x_eager
-        del b_eager
-        del y_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, y_eager, b_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, y_eager, self.transpose_x, self.transpose_y, b_eager, dout_eager
+            ))
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # save eager res for test_matmul_incubate
-        np.savez(
+        save_results(
             self.save_eager_res_path,
             out_eager=out_eager_np,
             out_grads_eager_0=out_grads_eager_np[0],
@@ -1070,7 +1070,7 @@ class TestMatmulAndAddDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[0], out[1:]
 
         # save static res for test_matmul_incubate
-        np.savez(
+        save_results(
             self.save_static_res_path,
             out_static=out_static,
             out_grads_static_0=out_grads_static[0],
@@ -1106,17 +1106,15 @@ class TestMatmulAndAddDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, y_eager, b_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(
-            x_eager, y_eager, self.transpose_x, self.transpose_y, b_eager, dout_eager
-        )
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager_baseline,
-        )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, y_eager, self.transpose_x, self.transpose_y, b_eager, dout_eager
+            ))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
 
         for i in range(5):
             out_eager, out_grads_eager = self.cal_eager_res(
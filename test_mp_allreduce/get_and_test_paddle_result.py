@@ -4,11 +4,13 @@ import paddle.distributed as paddle_dist
 import init_config_class
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
-    np_assert_accuracy,
+    np_assert_sharded,
     np_assert_staility,
+    save_results,
 )
 
 class TestPaddle(init_config_class.InitConfigClass):
@@ -17,11 +19,9 @@ class TestPaddle(init_config_class.InitConfigClass):
         self._init_threshold()
         self._init_np_inputs_and_dout()
         self._group = group
-        if paddle.distributed.get_rank() == 0:
-            np_inputs_array = np.load(torch_dir)
-            self._out_torch = np_inputs_array["torch_out"]
-            self._out_grads_torch = np_inputs_array["torch_out_grad"]
-        
+        # every rank compares its shard of the torch result, see np_assert_sharded
+        self._torch_out_path = torch_dir + "_out.npy"
+        self._torch_out_grad_path = torch_dir + "_out_grad.npy"
     
     def _gen_eager_inputs_and_dout(self):
         place = paddle.device.get_device()
@@ -95,57 +95,52 @@ class TestPaddle(init_config_class.InitConfigClass):
         return out, out_grads
 
     def _test_eager_accuracy(self):
-        x_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self._cal_eager_res(x_eager, dout_eager)
+        with TensorArena("paddle") as arena:
+            x_eager, dout_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self._cal_eager_res(x_eager, dout_eager))
 
-        del x_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = out_grads_eager.numpy()
-
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = out_grads_eager.numpy()
 
         if paddle.distributed.get_rank() == 0:
+            save_results(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
+
+        # compare eager res with torch, each rank checks its own shard
+        try:
+            np_assert_sharded(
+                out_eager_np,
+                self._torch_out_path,
+                self._atol,
+                self._rtol,
+                self._dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="eager",
+                fwd_or_bkd="forward",
+                api="paddle.distributed.collective._mp_allreduce",
+                group=self._group,
+            )
+        except Exception as e:
+            print(e)
+            print("eager_accuracy forward {dtype} failed".format(dtype=self._dtype))
+        try:
+            np_assert_sharded(
+                out_grads_eager_np,
+                self._torch_out_grad_path,
+                self._atol,
+                self._rtol,
+                self._dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="eager",
+                fwd_or_bkd="backward",
+                api="paddle.distributed.collective._mp_allreduce",
+                group=self._group,
+            )
+        except Exception as e:
+            print(e)
+            print("eager_accuracy backward {dtype} failed".format(dtype=self._dtype))
 
-            np.savez(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
-
-            # compare eager res with torch
-            try:
-                np_assert_accuracy(
-                    out_eager_np,
-                    self._out_torch,
-                    self._atol,
-                    self._rtol,
-                    self._dtype,
-                    version_a="paddle_develop",
-                    version_b="torch",
-                    eager_or_static_mode="eager",
-                    fwd_or_bkd="forward",
-                    api="paddle.distributed.collective._mp_allreduce",
-                )
-            except Exception as e:
-                print(e)
-                print("eager_accuracy forward {dtype} failed".format(dtype=self._dtype))
-            try:
-                np_assert_accuracy(
-                    out_grads_eager_np,
-                    self._out_grads_torch,
-                    self._atol,
-                    self._rtol,
-                    self._dtype,
-                    version_a="paddle_develop",
-                    version_b="torch",
-                    eager_or_static_mode="eager",
-                    fwd_or_bkd="backward",
-                    api="paddle.distributed.collective._mp_allreduce",
-                )
-            except Exception as e:
-                print(e)
-                print("eager_accuracy backward {dtype} failed".format(dtype=self._dtype))
-        
     def _test_static_accuracy(self):
         with paddle.fluid.framework._dygraph_guard(None):
             mp, sp = paddle.static.Program(), paddle.static.Program()
@@ -163,54 +158,53 @@ class TestPaddle(init_config_class.InitConfigClass):
                 fetch_list=[out_static] + [out_grads_static],
             )
             out_static, out_grads_static = out[0], out[1:]
-        
-        if paddle.distributed.get_rank() == 0:
-
-            np.savez(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
-
-            # compare static res with torch
-            try:
-                np_assert_accuracy(
-                    out_static,
-                    self._out_torch,
-                    self._atol,
-                    self._rtol,
-                    self._dtype,
-                    version_a="paddle_develop",
-                    version_b="torch",
-                    eager_or_static_mode="static",
-                    fwd_or_bkd="forward",
-                    api="paddle.distributed.collective._mp_allreduce",
-                )
-            except Exception as e:
-                print(e)
-                print("static_accuracy forward {dtype} failed".format(dtype=self._dtype))
 
-            try:
-                np_assert_accuracy(
-                    out_grads_static[0],
-                    self._out_grads_torch,
-                    self._atol,
-                    self._rtol,
-                    self._dtype,
-                    version_a="paddle_develop",
-                    version_b="torch",
-                    eager_or_static_mode="static",
-                    fwd_or_bkd="backward",
-                    api="paddle.distributed.collective._mp_allreduce",
-                )
-            except Exception as e:
-                print(e)
-                print("static_accuracy backward {dtype} failed".format(dtype=self._dtype))
+        if paddle.distributed.get_rank() == 0:
+            save_results(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
+
+        # compare static res with torch, each rank checks its own shard
+        try:
+            np_assert_sharded(
+                out_static,
+                self._torch_out_path,
+                self._atol,
+                self._rtol,
+                self._dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="static",
+                fwd_or_bkd="forward",
+                api="paddle.distributed.collective._mp_allreduce",
+                group=self._group,
+            )
+        except Exception as e:
+            print(e)
+            print("static_accuracy forward {dtype} failed".format(dtype=self._dtype))
+
+        try:
+            np_assert_sharded(
+                out_grads_static[0],
+                self._torch_out_grad_path,
+                self._atol,
+                self._rtol,
+                self._dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="static",
+                fwd_or_bkd="backward",
+                api="paddle.distributed.collective._mp_allreduce",
+                group=self._group,
+            )
+        except Exception as e:
+            print(e)
+            print("static_accuracy backward {dtype} failed".format(dtype=self._dtype))
 
     def _test_eager_stability(self):
         x_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self._cal_eager_res(x_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self._cal_eager_res(x_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
 
         for i in range(5):
             out_eager, out_grads_eager = self._cal_eager_res(x_eager, dout_eager)
@@ -314,7 +308,7 @@ for case_id in [1, 2, 3]:
         np_input_dir = "./inputs_case{id}.npz".format(id=case_id)
         save_static_res_path = "./{id}_static_develop_res_case1_{dtype}.npz".format(id=case_id, dtype=dtype) 
         save_eager_res_path = "./{id}_eager_develop_res_case1_{dtype}.npz".format(id=case_id, dtype=dtype)
-        torch_dir = "{id}_torch_out_{dtype}.npz".format(id=case_id, dtype=dtype)
+        torch_dir = "{id}_torch_out_{dtype}".format(id=case_id, dtype=dtype)
 
         test_paddle = TestPaddle(group, np_input_dir, dtype, save_static_res_path, save_eager_res_path, torch_dir)
         test_paddle._test_eager_accuracy()
@@ -4,6 +4,7 @@ import torch.distributed as torch_dist
 import init_config_class
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -18,12 +19,13 @@ class TestTorch(init_config_class.InitConfigClass):
         self._init_np_inputs_and_dout()
         self._group = group
         self._device = device
-        out_torch, out_grads_torch = self._get_and_compare_torch_result()
-        local_rank = torch.distributed.get_rank()
-        if local_rank == 0:
-            np.savez(torch_dir, torch_out=out_torch, torch_out_grad=out_grads_torch)
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            out_torch, out_grads_torch = arena.track(self._get_and_compare_torch_result())
+            local_rank = torch.distributed.get_rank()
+            if local_rank == 0:
+                # plain .npy so that every paddle rank can memory map its shard
+                np.save(torch_dir + "_out.npy", out_torch)
+                np.save(torch_dir + "_out_grad.npy", out_grads_torch)
     
     def _gen_torch_inputs_and_dout(self):
         x_torch = torch.tensor(
@@ -98,6 +100,6 @@ for case_id in [1, 2, 3]:
     for dtype in dtype_list:
 
         np_input_dir = "./inputs_case{id}.npz".format(id=case_id)
-        torch_dir = "{id}_torch_out_{dtype}.npz".format(id=case_id, dtype=dtype)
+        torch_dir = "{id}_torch_out_{dtype}".format(id=case_id, dtype=dtype)
 
         test_torch = TestTorch(group ,device, np_input_dir, dtype, torch_dir)
@@ -20,7 +20,7 @@ esac
 #please run "bash test_mp_allreduce.sh * develop" first
 
 if [ "$version" == 'develop' ]; then
-    rm -rf *.npz
+    rm -rf *.npz *.npy
     python prepare_data.py
     python -m torch.distributed.launch --nproc_per_node=$card_num --master_port=25641 get_torch_result.py
     python -m paddle.distributed.launch --log_dir $log_dir get_and_test_paddle_result.py
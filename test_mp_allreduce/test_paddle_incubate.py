@@ -4,7 +4,8 @@ import paddle.distributed as paddle_dist
 import init_config_class
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from tensor_arena import TensorArena
+from utils import TOLERANCE, convert_dtype_to_torch_type, load_results
 
 class TestPaddle(init_config_class.InitConfigClass):
     def __init__(self, group, np_input_dir="", dtype="", save_static_res_path="" , save_eager_res_path="", torch_dir=""):
@@ -79,22 +80,17 @@ class TestPaddle(init_config_class.InitConfigClass):
 
     def _test_eager_accuracy(self):
         # get develop eager res
-        develop_res_array = np.load(self._save_eager_res_path)
+        develop_res_array = load_results(self._save_eager_res_path)
         out_eager_develop = develop_res_array["out_eager"]
         out_eager_grads_develop = develop_res_array["out_grads_eager"]
 
         # calculate incubate eager res
-        x_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self._cal_eager_res(x_eager, dout_eager)
+        with TensorArena("paddle") as arena:
+            x_eager, dout_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self._cal_eager_res(x_eager, dout_eager))
 
-        del x_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = out_grads_eager.numpy()
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = out_grads_eager.numpy()
         # compare incubate eager res with develop eager res
         
         if paddle.distributed.get_rank() == 0:
@@ -126,7 +122,7 @@ class TestPaddle(init_config_class.InitConfigClass):
     
     def _test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self._save_static_res_path)
+        develop_res_array = load_results(self._save_static_res_path)
         out_static_develop = develop_res_array["out_static"]
         out_grads_static_develop = develop_res_array["out_grads_static"]
 
@@ -179,12 +175,10 @@ class TestPaddle(init_config_class.InitConfigClass):
 
     def _test_eager_stability(self):
         x_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self._cal_eager_res(x_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self._cal_eager_res(x_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
 
         for i in range(50):
             out_eager, out_grads_eager = self._cal_eager_res(x_eager, dout_eager)
@@ -6,11 +6,13 @@ import init_config_class
 import random
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
     np_assert_staility,
+    save_results,
 )
 
 dim = [1, 8192]
@@ -119,24 +121,17 @@ class TestPaddle(init_config_class.InitConfigClass):
         return out, out_grads
 
     def _test_eager_accuracy(self):
-        logits_eager, label_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self._cal_eager_res(logits_eager, label_eager, dout_eager)
-
-        del logits_eager
-        del label_eager 
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager1 = paddle.reshape(out_eager, shape = [dim[self.id]])
-        out_eager_np = out_eager1.numpy()
-        out_grads_eager_np = out_grads_eager.numpy()
+        with TensorArena("paddle") as arena:
+            logits_eager, label_eager, dout_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self._cal_eager_res(logits_eager, label_eager, dout_eager))
 
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+            out_eager1 = paddle.reshape(out_eager, shape = [dim[self.id]])
+            out_eager_np = out_eager1.numpy()
+            out_grads_eager_np = out_grads_eager.numpy()
 
         if paddle.distributed.get_rank() == 0:
 
-            np.savez(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
+            save_results(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
 
             # compare eager res with torch
             try:
@@ -196,7 +191,7 @@ class TestPaddle(init_config_class.InitConfigClass):
         
         if paddle.distributed.get_rank() == 0:
 
-            np.savez(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
+            save_results(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
 
             # compare static res with torch
             try:
@@ -236,12 +231,10 @@ class TestPaddle(init_config_class.InitConfigClass):
 
     def _test_eager_stability(self):
         logits_eager, label_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self._cal_eager_res(logits_eager, label_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self._cal_eager_res(logits_eager, label_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
 
         for i in range(50):
             out_eager, out_grads_eager = self._cal_eager_res(logits_eager, label_eager, dout_eager)
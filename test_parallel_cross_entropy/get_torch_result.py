@@ -5,6 +5,7 @@ import init_config_class
 import prepare_data
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import TOLERANCE, convert_dtype_to_torch_type
 
 class TestTorch(init_config_class.InitConfigClass):
@@ -13,17 +14,13 @@ class TestTorch(init_config_class.InitConfigClass):
         self._init_threshold()
         self._init_np_inputs_and_dout()
         self._device = device
-        logits_torch, label_torch, dout_torch = self._gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self._cal_torch_res(logits_torch, label_torch, dout_torch)
-        del logits_torch 
-        del label_torch 
-        del dout_torch
+        with TensorArena("torch") as arena:
+            logits_torch, label_torch, dout_torch = arena.track(self._gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self._cal_torch_res(logits_torch, label_torch, dout_torch))
         
-        a = out_torch.cpu().detach().numpy()
-        b = out_grads_torch.cpu().detach().numpy()
-        np.savez(torch_dir, torch_out=a, torch_out_grad=b)
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+            a = out_torch.cpu().detach().numpy()
+            b = out_grads_torch.cpu().detach().numpy()
+            np.savez(torch_dir, torch_out=a, torch_out_grad=b)
     
     def _gen_torch_inputs_and_dout(self):
         logits_torch = torch.tensor(
@@ -5,7 +5,8 @@ import unittest
 from paddle.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE, convert_dtype_to_torch_type
+from tensor_arena import TensorArena
+from utils import TOLERANCE, convert_dtype_to_torch_type, save_results
 
 
 def generate_np_inputs_and_dout():
@@ -22,23 +23,17 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, dim_torch, num_torch, dout1_torch, dout2_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(x_torch, dim_torch, num_torch, dout1_torch, dout2_torch)
-        del x_torch 
-        del dim_torch
-        del num_torch
-        del dout1_torch
-        del dout2_torch
-        self.out_torch = map_structure(
-                                lambda x: x.cpu().detach().numpy(),
-                                out_torch,
-                            )
-        self.out_grads_torch = map_structure(
-                                lambda x: x.cpu().numpy(),
-                                out_grads_torch,
-                            )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, dim_torch, num_torch, dout1_torch, dout2_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(x_torch, dim_torch, num_torch, dout1_torch, dout2_torch))
+            self.out_torch = map_structure(
+                                    lambda x: x.cpu().detach().numpy(),
+                                    out_torch,
+                                )
+            self.out_grads_torch = map_structure(
+                                    lambda x: x.cpu().numpy(),
+                                    out_grads_torch,
+                                )
 
     def init_params(self):
         self.np_input_dir = "./inputs_case1.npz"
@@ -180,27 +175,19 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
-        del x_eager
-        del dim_eager
-        del num_eager
-        del dout1_eager
-        del dout2_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_eager,
-                            )
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager))
+            out_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_eager,
+                                )
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
         # save eager res for test_scale_incubate
-        np.savez(
+        save_results(
             self.save_eager_res_path,
             out_eager_0=out_eager_np[0],
             out_eager_1=out_eager_np[1],
@@ -265,7 +252,7 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
             out_static, out_grads_static = out[:2], out[2:]
 
         # save static res for test_scale_incubate
-        np.savez(
+        save_results(
             self.save_static_res_path,
             out_static_0=out_static[0],
             out_static_1=out_static[1],
@@ -308,18 +295,16 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
-        out_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_eager_baseline,
-                                )
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                                )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager))
+            out_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_eager_baseline,
+                                    )
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                    )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
@@ -22,6 +22,7 @@ import paddle
 from paddle.utils import map_structure
 
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -34,24 +35,19 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
         self.init_params()
         self.init_threshold()
         self.init_np_inputs_and_dout()
-        x_torch, dim_torch, num_torch, dout_torch = self.gen_torch_inputs_and_dout()
-        out_torch, out_grads_torch = self.cal_torch_res(
-            x_torch, dim_torch, num_torch, dout_torch
-        )
-        del x_torch
-        del dim_torch
-        del num_torch
-        del dout_torch
-        self.out_torch = map_structure(
-            lambda x: x.cpu().detach().numpy(),
-            out_torch,
-        )
-        self.out_grads_torch = map_structure(
-            lambda x: x.cpu().numpy(),
-            out_grads_torch,
-        )
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+        with TensorArena("torch") as arena:
+            x_torch, dim_torch, num_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            out_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                x_torch, dim_torch, num_torch, dout_torch
+            ))
+            self.out_torch = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                out_torch,
+            )
+            self.out_grads_torch = map_structure(
+                lambda x: x.cpu().numpy(),
+                out_grads_torch,
+            )
 
     def init_params(self):
         self.dtype = "float32"
@@ -185,26 +181,19 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
         return out, out_grads
 
     def test_eager_accuracy(self):
-        x_eager, dim_eager, num_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(
-            x_eager, dim_eager, num_eager, dout_eager
-        )
-        del x_eager
-        del dim_eager
-        del num_eager
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_eager,
-        )
-        out_grads_eager_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager,
-        )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dim_eager, num_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                x_eager, dim_eager, num_eager, dout_eager
+            ))
+            out_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_eager,
+            )
+            out_grads_eager_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
         # compare develop eager forward res with torch
         for idx in range(len(out_eager_np)):
             np_assert_accuracy(
@@ -298,20 +287,18 @@ class TestSplitDevelopCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, dim_eager, num_eager, dout_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(
-            x_eager, dim_eager, num_eager, dout_eager
-        )
-        out_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_eager_baseline,
-        )
-        out_grads_eager_baseline_np = map_structure(
-            lambda x: x.numpy(),
-            out_grads_eager_baseline,
-        )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                x_eager, dim_eager, num_eager, dout_eager
+            ))
+            out_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_eager_baseline,
+            )
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
 
         for i in range(5):
             out_eager, out_grads_eager = self.cal_eager_res(
@@ -4,7 +4,8 @@ import unittest
 from paddle.fluid.layers.utils import map_structure
 import sys
 sys.path.append("..")
-from utils import TOLERANCE
+from tensor_arena import TensorArena
+from utils import TOLERANCE, load_results
 
 
 class TestSplitIncubateCase1_FP32(unittest.TestCase):
@@ -113,30 +114,22 @@ class TestSplitIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_accuracy(self):
         # get develop eager res
-        develop_res_array = np.load(self.save_eager_res_path)
+        develop_res_array = load_results(self.save_eager_res_path)
         out_eager_develop = [develop_res_array["out_eager_0"], develop_res_array["out_eager_1"]]
         out_eager_grads_develop = [develop_res_array["out_grads_eager_0"]]
 
         # calculate incubate eager res
-        x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = self.gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
-        del x_eager
-        del dim_eager
-        del num_eager
-        del dout1_eager
-        del dout2_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_eager,
-                            )
-        out_grads_eager_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager,
-                            )
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = arena.track(self.gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager))
+            out_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_eager,
+                                )
+            out_grads_eager_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager,
+                                )
         # compare incubate eager res with develop eager res
         for idx in range(len(out_eager_np)):
             np.testing.assert_equal(
@@ -159,7 +152,7 @@ class TestSplitIncubateCase1_FP32(unittest.TestCase):
     
     def test_static_accuracy(self):
         # get develop static res
-        develop_res_array = np.load(self.save_static_res_path)
+        develop_res_array = load_results(self.save_static_res_path)
         out_static_develop = [develop_res_array["out_static_0"], develop_res_array["out_static_1"]]
         out_grads_static_develop = [develop_res_array["out_grads_static_0"]]
 
@@ -208,18 +201,16 @@ class TestSplitIncubateCase1_FP32(unittest.TestCase):
 
     def test_eager_stability(self):
         x_eager, dim_eager, num_eager, dout1_eager, dout2_eager = self.gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
-        out_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_eager_baseline,
-                                )
-        out_grads_eager_baseline_np = map_structure(
-                                lambda x: x.numpy(),
-                                out_grads_eager_baseline,
-                                )
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager))
+            out_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_eager_baseline,
+                                    )
+            out_grads_eager_baseline_np = map_structure(
+                                    lambda x: x.numpy(),
+                                    out_grads_eager_baseline,
+                                    )
 
         for i in range(50):
             out_eager, out_grads_eager = self.cal_eager_res(x_eager, dim_eager, num_eager, dout1_eager, dout2_eager)
@@ -0,0 +1,8 @@
+export NVIDIA_TF32_OVERRIDE=0
+for case in 1 2 3;
+do
+    for dtype in _FP32 _FP16 _BFP16;
+    do
+        CUDA_VISIBLE_DEVICES=0 python test_transformer_block_develop.py TestTransformerBlockDevelopCase$case$dtype >> transformer_block.log 2>&1
+    done
+done
@@ -0,0 +1,565 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""One transformer block, chained from the apis the op tests cover.
+
+    embedding -> layer_norm -> linear (qkv) -> attention -> linear (out)
+    -> residual -> layer_norm -> fused_linear -> gelu | silu gate
+    -> fused_linear -> residual -> layer_norm -> matmul (lm head)
+    -> cross_entropy
+
+Case1 uses the shapes of the hidden 12288 cases (seq 4096, 16 heads of 128,
+ffn 24576 with gelu), Case2 those of the hidden 14336 cases (seq 8192, 14
+heads of 128, ffn 9632 split into a silu gate and an up half of 4816) and
+Case3 those of the hidden 4096 cases (seq 4096, 32 heads of 128, ffn 10944
+split into a silu gate and an up half of 5472, the [.., 10944] x
+[4096, 10944] matmul and [.., 5472] silu cases). The op cases only give
+the hidden and ffn sizes of each model, the sequence length and head
+count are those of the attention cases with the same hidden size.
+float32 attends with matmul + softmax, float16/bfloat16 with
+flash_attention (torch: scaled_dot_product_attention).
+
+The forward pass is compared after the attention residual, after the
+block and for the per token loss; the backward pass for every parameter
+grad. A drift table of all of them is printed before the first assert,
+so accumulated error can be traced to the stage it comes from.
+
+A block chains a dozen ops and reduces over every token in the weight
+grads, so it is held to BLOCK_TOLERANCE, not to the per op TOLERANCE. The
+backward pass gets a wider bound than the forward pass. Run with
+NVIDIA_TF32_OVERRIDE=0 (test_transformer_block.sh exports it), otherwise
+the float32 matmuls of either framework may run in TF32. With
+API_TEST_COMPARATOR=ulp the float16/bfloat16 results are compared by ULP
+distance instead.
+
+The block is timed as a whole, layout changes included, with
+    cd test_transformer_block
+    python ../benchmark.py test_transformer_block_develop.py
+"""
+
+import sys
+import unittest
+
+import numpy as np
+import torch
+
+import paddle
+from paddle.utils import map_structure
+from paddle.nn.functional.flash_attention import flash_attention
+
+sys.path.append("..")
+from tensor_arena import TensorArena
+from token_ids import ID_WORKLOAD, generate_ids
+from utils import (
+    SparseRows,
+    allclose_stats,
+    convert_dtype_to_torch_type,
+    np_assert_accuracy,
+    np_assert_sparse_rows,
+    np_assert_staility,
+)
+
+EPSILON = 1e-05
+
+CASE1_CONFIG = {
+    "seqlen": 4096,
+    "hidden": 12288,
+    "num_heads": 16,
+    "head_dim": 128,
+    "ffn": 24576,
+    "activation": "gelu",
+    "vocab": 46256,
+}
+
+CASE2_CONFIG = {
+    "seqlen": 8192,
+    "hidden": 14336,
+    "num_heads": 14,
+    "head_dim": 128,
+    "ffn": 9632,
+    "activation": "swiglu",
+    "vocab": 46256,
+}
+
+CASE3_CONFIG = {
+    "seqlen": 4096,
+    "hidden": 4096,
+    "num_heads": 32,
+    "head_dim": 128,
+    "ffn": 10944,
+    "activation": "swiglu",
+    "vocab": 46256,
+}
+
+# the error of a whole block, per dtype and pass
+BLOCK_TOLERANCE = {
+    "float32": {
+        "forward": {"atol": 1e-5, "rtol": 1e-5},
+        "backward": {"atol": 1e-4, "rtol": 1e-4},
+    },
+    "float16": {
+        "forward": {"atol": 1e-2, "rtol": 1e-2},
+        "backward": {"atol": 5e-2, "rtol": 5e-2},
+    },
+    "bfloat16": {
+        "forward": {"atol": 5e-2, "rtol": 5e-2},
+        "backward": {"atol": 1e-1, "rtol": 1e-1},
+    },
+}
+
+OUT_NAMES = ["attention", "block", "loss"]
+
+
+def block_param_shapes(config):
+    """[(name, shape)] of the block parameters, linear weights [in, out]."""
+    hidden = config["hidden"]
+    attn = config["num_heads"] * config["head_dim"]
+    ffn = config["ffn"]
+    ffn_out = ffn // 2 if config["activation"] == "swiglu" else ffn
+    return [
+        ("embedding.weight", [config["vocab"], hidden]),
+        ("norm1.weight", [hidden]),
+        ("norm1.bias", [hidden]),
+        ("qkv.weight", [hidden, 3 * attn]),
+        ("qkv.bias", [3 * attn]),
+        ("out.weight", [attn, hidden]),
+        ("out.bias", [hidden]),
+        ("norm2.weight", [hidden]),
+        ("norm2.bias", [hidden]),
+        ("ffn1.weight", [hidden, ffn]),
+        ("ffn1.bias", [ffn]),
+        ("ffn2.weight", [ffn_out, hidden]),
+        ("ffn2.bias", [hidden]),
+        ("final_norm.weight", [hidden]),
+        ("final_norm.bias", [hidden]),
+        ("lm_head.weight", [hidden, config["vocab"]]),
+    ]
+
+
+class TestTransformerBlockDevelopCase1_FP32(unittest.TestCase):
+    def setUp(self):
+        self.init_params()
+        self.init_threshold()
+        self.init_np_inputs_and_dout()
+        with TensorArena("torch") as arena:
+            ids_torch, label_torch, params_torch, dout_torch = arena.track(self.gen_torch_inputs_and_dout())
+            outs_torch, out_grads_torch = arena.track(self.cal_torch_res(
+                ids_torch, label_torch, params_torch, dout_torch
+            ))
+            self.outs_torch = map_structure(
+                lambda x: x.cpu().detach().numpy(),
+                outs_torch,
+            )
+            self.out_grads_torch = list(map_structure(
+                lambda x: x.cpu().numpy(),
+                out_grads_torch,
+            ))
+            # only the looked up rows of the embedding grad are compared
+            self.out_grads_torch[0] = SparseRows.from_dense(
+                self.out_grads_torch[0], self.np_ids
+            )
+
+    def init_params(self):
+        self.config = CASE1_CONFIG
+        self.dtype = "float32"
+
+    def init_threshold(self):
+        tolerance = BLOCK_TOLERANCE[self.dtype]
+        self.fwd_atol = tolerance["forward"]["atol"]
+        self.fwd_rtol = tolerance["forward"]["rtol"]
+        self.bwd_atol = tolerance["backward"]["atol"]
+        self.bwd_rtol = tolerance["backward"]["rtol"]
+
+    def init_np_inputs_and_dout(self):
+        np.random.seed(2023)
+        seqlen, vocab = self.config["seqlen"], self.config["vocab"]
+        self.np_ids = generate_ids(ID_WORKLOAD, 0, vocab, [1, seqlen]).astype("int64")
+        self.np_label = np.random.randint(vocab, size=[seqlen]).astype("int64")
+        self.param_names = []
+        self.np_params = []
+        for name, shape in block_param_shapes(self.config):
+            if name == "embedding.weight":
+                value = np.random.random(size=shape).astype("float32") - 0.5
+            elif "norm" in name and name.endswith(".weight"):
+                value = np.random.random(size=shape).astype("float32") + 0.5
+            elif len(shape) == 2:
+                # like the default init of torch.nn.Linear
+                bound = 1.0 / np.sqrt(shape[0])
+                value = (np.random.random(size=shape).astype("float32") * 2 - 1) * bound
+            else:
+                value = (np.random.random(size=shape).astype("float32") - 0.5) * 0.1
+            self.param_names.append(name)
+            self.np_params.append(value)
+        self.np_dout = np.random.random(size=[seqlen]).astype("float32") - 0.5
+        # convert np array dtype
+        if self.dtype == "float16":
+            self.np_params = [p.astype("float16") for p in self.np_params]
+            self.np_dout = self.np_dout.astype("float16")
+
+    def gen_torch_inputs_and_dout(self):
+        ids_torch = torch.tensor(self.np_ids, device='cuda')
+        label_torch = torch.tensor(self.np_label, device='cuda')
+        params_torch = [
+            torch.tensor(
+                p,
+                device='cuda',
+                dtype=convert_dtype_to_torch_type(self.dtype)
+                if self.dtype != 'bfloat16'
+                else torch.float32,
+                requires_grad=True,
+            )
+            for p in self.np_params
+        ]
+        dout_torch = torch.tensor(
+            self.np_dout,
+            device='cuda',
+            dtype=convert_dtype_to_torch_type(self.dtype)
+            if self.dtype != 'bfloat16'
+            else torch.float32,
+            requires_grad=True,
+        )
+        return ids_torch, label_torch, params_torch, dout_torch
+
+    def gen_eager_inputs_and_dout(self):
+        ids_eager = paddle.to_tensor(self.np_ids, place="gpu")
+        label_eager = paddle.to_tensor(self.np_label, place="gpu")
+        params_eager = []
+        for p in self.np_params:
+            p_eager = paddle.to_tensor(
+                p,
+                dtype=self.dtype if self.dtype != 'bfloat16' else "float32",
+                place="gpu",
+            )
+            p_eager.stop_gradient = False
+            params_eager.append(p_eager)
+        dout_eager = paddle.to_tensor(
+            self.np_dout,
+            dtype=self.dtype if self.dtype != 'bfloat16' else "float32",
+            place="gpu",
+        )
+        dout_eager.stop_gradient = False
+        return ids_eager, label_eager, params_eager, dout_eager
+
+    def cal_torch_res(self, ids, label, params, dout):
+        params_t = params
+        dout_t = dout
+        if self.dtype == "bfloat16":
+            params_t = [p.to(dtype=torch.bfloat16) for p in params]
+            dout_t = dout.to(dtype=torch.bfloat16)
+        (emb_w, norm1_w, norm1_b, qkv_w, qkv_b, out_w, out_b, norm2_w, norm2_b,
+         ffn1_w, ffn1_b, ffn2_w, ffn2_b, final_norm_w, final_norm_b, lm_head_w) = params_t
+        batch_size, seqlen = ids.shape
+        hidden = self.config["hidden"]
+        num_heads, head_dim = self.config["num_heads"], self.config["head_dim"]
+
+        x = torch.nn.functional.embedding(ids, emb_w)
+        y = torch.nn.functional.layer_norm(x, [hidden], norm1_w, norm1_b, EPSILON)
+        qkv = torch.nn.functional.linear(y, torch.transpose(qkv_w, 0, 1), qkv_b)
+        qkv = qkv.reshape((batch_size, seqlen, 3, num_heads, head_dim))
+        # [b, s, nh, hd] -> [b, nh, s, hd]
+        q, k, v = [torch.transpose(t, 1, 2) for t in qkv.unbind(dim=2)]
+        if self.dtype == "float32":
+            scores = torch.matmul(q, torch.transpose(k, 2, 3)) * head_dim ** -0.5
+            mask = torch.triu(
+                torch.full((seqlen, seqlen), float("-inf"), device=scores.device, dtype=scores.dtype),
+                diagonal=1,
+            )
+            probs = torch.nn.functional.softmax(scores + mask, dim=-1)
+            attn = torch.matmul(probs, v)
+        else:
+            attn = torch.nn.functional.scaled_dot_product_attention(q, k, v, is_causal=True)
+        attn = torch.transpose(attn, 1, 2).reshape((batch_size, seqlen, num_heads * head_dim))
+        x = x + torch.nn.functional.linear(attn, torch.transpose(out_w, 0, 1), out_b)
+        attention_out = x
+
+        y = torch.nn.functional.layer_norm(x, [hidden], norm2_w, norm2_b, EPSILON)
+        y = torch.nn.functional.linear(y, torch.transpose(ffn1_w, 0, 1), ffn1_b)
+        if self.config["activation"] == "swiglu":
+            gate, up = y.chunk(2, dim=-1)
+            y = torch.nn.functional.silu(gate) * up
+        else:
+            y = torch.nn.functional.gelu(y)
+        x = x + torch.nn.functional.linear(y, torch.transpose(ffn2_w, 0, 1), ffn2_b)
+        block_out = x
+
+        y = torch.nn.functional.layer_norm(x, [hidden], final_norm_w, final_norm_b, EPSILON)
+        logits = torch.matmul(y, lm_head_w).reshape((batch_size * seqlen, -1))
+        loss = torch.nn.functional.cross_entropy(logits, label, reduction='none')
+
+        out_grads = torch.autograd.grad([loss], params, grad_outputs=[dout_t])
+        outs = [attention_out, block_out, loss]
+        if self.dtype == "bfloat16":
+            outs = map_structure(lambda x: x.to(dtype=torch.float32), outs)
+        return outs, out_grads
+
+    def cal_eager_res(self, ids, label, params, dout):
+        params_t = params
+        dout_t = dout
+        if self.dtype == "bfloat16":
+            params_t = [paddle.cast(p, dtype="uint16") for p in params]
+            dout_t = paddle.cast(dout, dtype="uint16")
+        (emb_w, norm1_w, norm1_b, qkv_w, qkv_b, out_w, out_b, norm2_w, norm2_b,
+         ffn1_w, ffn1_b, ffn2_w, ffn2_b, final_norm_w, final_norm_b, lm_head_w) = params_t
+        batch_size, seqlen = ids.shape
+        hidden = self.config["hidden"]
+        num_heads, head_dim = self.config["num_heads"], self.config["head_dim"]
+
+        x = paddle.nn.functional.embedding(ids, emb_w)
+        y = paddle.nn.functional.layer_norm(x, [hidden], norm1_w, norm1_b, EPSILON)
+        qkv = paddle.nn.functional.linear(y, qkv_w, qkv_b)
+        qkv = qkv.reshape([batch_size, seqlen, 3, num_heads, head_dim])
+        q, k, v = paddle.unbind(qkv, axis=2)
+        if self.dtype == "float32":
+            # [b, s, nh, hd] -> [b, nh, s, hd]
+            q, k, v = [paddle.transpose(t, [0, 2, 1, 3]) for t in (q, k, v)]
+            scores = paddle.matmul(q, k, transpose_y=True) * head_dim ** -0.5
+            mask = paddle.triu(
+                paddle.full([seqlen, seqlen], float("-inf"), dtype=scores.dtype),
+                diagonal=1,
+            )
+            probs = paddle.nn.functional.softmax(scores + mask, axis=-1)
+            attn = paddle.transpose(paddle.matmul(probs, v), [0, 2, 1, 3])
+        else:
+            attn, _ = flash_attention(q, k, v, 0.0, True, False)
+        attn = attn.reshape([batch_size, seqlen, num_heads * head_dim])
+        x = x + paddle.nn.functional.linear(attn, out_w, out_b)
+        attention_out = x
+
+        y = paddle.nn.functional.layer_norm(x, [hidden], norm2_w, norm2_b, EPSILON)
+        y = paddle.incubate.nn.functional.fused_linear(y, ffn1_w, ffn1_b)
+        if self.config["activation"] == "swiglu":
+            gate, up = paddle.chunk(y, 2, axis=-1)
+            y = paddle.nn.functional.silu(gate) * up
+        else:
+            y = paddle.nn.functional.gelu(y)
+        x = x + paddle.incubate.nn.functional.fused_linear(y, ffn2_w, ffn2_b)
+        block_out = x
+
+        y = paddle.nn.functional.layer_norm(x, [hidden], final_norm_w, final_norm_b, EPSILON)
+        logits = paddle.matmul(y, lm_head_w).reshape([batch_size * seqlen, -1])
+        loss = paddle.nn.functional.cross_entropy(
+            logits, label, reduction='none'
+        ).reshape([-1])
+
+        out_grads = paddle.grad([loss], params, grad_outputs=[dout_t])
+        outs = [attention_out, block_out, loss]
+        if self.dtype == "bfloat16":
+            outs = map_structure(lambda x: paddle.cast(x, dtype="float32"), outs)
+        return outs, out_grads
+
+    def get_flops(self):
+        # every matmul of the block forward plus the two of its backward,
+        # attention counted dense
+        seqlen, hidden = self.config["seqlen"], self.config["hidden"]
+        attn = self.config["num_heads"] * self.config["head_dim"]
+        weights = sum(
+            int(np.prod(shape))
+            for name, shape in block_param_shapes(self.config)
+            if len(shape) == 2 and name != "embedding.weight"
+        )
+        forward = 2 * seqlen * weights + 4 * seqlen * seqlen * attn
+        return 3 * forward
+
+    def print_drift(self, outs_eager_np, out_grads_eager_np):
+        names = ["forward " + name for name in OUT_NAMES]
+        names += ["backward " + name for name in self.param_names]
+        pairs = list(zip(outs_eager_np, self.outs_torch))
+        pairs.append(
+            (
+                out_grads_eager_np[0].values,
+                self.out_grads_torch[0].values,
+            )
+        )
+        pairs += list(zip(out_grads_eager_np[1:], self.out_grads_torch[1:]))
+        header = "{:<28} {:>12} {:>12} {:>14}".format(
+            "stage", "max abs", "max rel", "violations"
+        )
+        print(header)
+        print("-" * len(header))
+        for name, (a, b) in zip(names, pairs):
+            if name.startswith("forward"):
+                atol, rtol = self.fwd_atol, self.fwd_rtol
+            else:
+                atol, rtol = self.bwd_atol, self.bwd_rtol
+            maxes, sums = allclose_stats(a, b, atol, rtol)
+            print(
+                "{:<28} {:>12.3e} {:>12.3e} {:>14}".format(
+                    name,
+                    maxes[0],
+                    maxes[1],
+                    "{}/{}".format(int(sums[0]), int(sums[2])),
+                )
+            )
+
+    def test_eager_accuracy(self):
+        with TensorArena("paddle") as arena:
+            ids_eager, label_eager, params_eager, dout_eager = arena.track(self.gen_eager_inputs_and_dout())
+            outs_eager, out_grads_eager = arena.track(self.cal_eager_res(
+                ids_eager, label_eager, params_eager, dout_eager
+            ))
+            outs_eager_np = map_structure(
+                lambda x: x.numpy(),
+                outs_eager,
+            )
+            out_grads_eager_np = list(map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            ))
+        # built once, print_drift and np_assert_sparse_rows share it
+        out_grads_eager_np[0] = SparseRows.from_dense(
+            out_grads_eager_np[0], self.np_ids
+        )
+        self.print_drift(outs_eager_np, out_grads_eager_np)
+        # compare develop eager forward res with torch
+        for idx in range(len(outs_eager_np)):
+            np_assert_accuracy(
+                outs_eager_np[idx],
+                self.outs_torch[idx],
+                self.fwd_atol,
+                self.fwd_rtol,
+                self.dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="eager",
+                fwd_or_bkd="forward " + OUT_NAMES[idx],
+                api="transformer_block",
+            )
+        # compare develop eager backward res with torch
+        np_assert_sparse_rows(
+            out_grads_eager_np[0],
+            self.out_grads_torch[0],
+            self.np_ids,
+            self.bwd_atol,
+            self.bwd_rtol,
+            self.dtype,
+            version_a="paddle_develop",
+            version_b="torch",
+            eager_or_static_mode="eager",
+            fwd_or_bkd="backward " + self.param_names[0],
+            api="transformer_block",
+        )
+        for idx in range(1, len(out_grads_eager_np)):
+            np_assert_accuracy(
+                out_grads_eager_np[idx],
+                self.out_grads_torch[idx],
+                self.bwd_atol,
+                self.bwd_rtol,
+                self.dtype,
+                version_a="paddle_develop",
+                version_b="torch",
+                eager_or_static_mode="eager",
+                fwd_or_bkd="backward " + self.param_names[idx],
+                api="transformer_block",
+            )
+
+    def test_eager_stability(self):
+        ids_eager, label_eager, params_eager, dout_eager = self.gen_eager_inputs_and_dout()
+        with TensorArena("paddle") as arena:
+            outs_eager_baseline, out_grads_eager_baseline = arena.track(self.cal_eager_res(
+                ids_eager, label_eager, params_eager, dout_eager
+            ))
+            outs_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                outs_eager_baseline,
+            )
+            out_grads_eager_baseline_np = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager_baseline,
+            )
+
+        for i in range(5):
+            outs_eager, out_grads_eager = self.cal_eager_res(
+                ids_eager, label_eager, params_eager, dout_eager
+            )
+            outs_eager = map_structure(
+                lambda x: x.numpy(),
+                outs_eager,
+            )
+            out_grads_eager = map_structure(
+                lambda x: x.numpy(),
+                out_grads_eager,
+            )
+            # test develop eager forward stability
+            for idx in range(len(outs_eager)):
+                np_assert_staility(
+                    outs_eager[idx],
+                    outs_eager_baseline_np[idx],
+                    self.dtype,
+                    version="paddle_develop",
+                    eager_or_static_mode="eager",
+                    fwd_or_bkd="forward " + OUT_NAMES[idx],
+                    api="transformer_block",
+                )
+            # test develop eager backward stability
+            for idx in range(len(out_grads_eager)):
+                np_assert_staility(
+                    out_grads_eager[idx],
+                    out_grads_eager_baseline_np[idx],
+                    self.dtype,
+                    version="paddle_develop",
+                    eager_or_static_mode="eager",
+                    fwd_or_bkd="backward " + self.param_names[idx],
+                    api="transformer_block",
+                )
+
+
+class TestTransformerBlockDevelopCase1_FP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE1_CONFIG
+        self.dtype = "float16"
+
+
+class TestTransformerBlockDevelopCase1_BFP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE1_CONFIG
+        self.dtype = "bfloat16"
+
+
+class TestTransformerBlockDevelopCase2_FP32(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE2_CONFIG
+        self.dtype = "float32"
+
+
+class TestTransformerBlockDevelopCase2_FP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE2_CONFIG
+        self.dtype = "float16"
+
+
+class TestTransformerBlockDevelopCase2_BFP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE2_CONFIG
+        self.dtype = "bfloat16"
+
+
+class TestTransformerBlockDevelopCase3_FP32(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE3_CONFIG
+        self.dtype = "float32"
+
+
+class TestTransformerBlockDevelopCase3_FP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE3_CONFIG
+        self.dtype = "float16"
+
+
+class TestTransformerBlockDevelopCase3_BFP16(TestTransformerBlockDevelopCase1_FP32):
+    def init_params(self):
+        self.config = CASE3_CONFIG
+        self.dtype = "bfloat16"
+
+
+if __name__ == '__main__':
+    unittest.main()
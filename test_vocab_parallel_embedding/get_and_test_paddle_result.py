@@ -6,11 +6,15 @@ import init_config_class
 import random
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
+    SparseRows,
     convert_dtype_to_torch_type,
     np_assert_accuracy,
+    np_assert_sparse_rows,
     np_assert_staility,
+    save_results,
 )
 
 def set_random_seed(seed):
@@ -33,7 +37,14 @@ class TestPaddle(init_config_class.InitConfigClass):
         if rank == 0:
             np_inputs_array = np.load(torch_dir)
             self._out_torch = np_inputs_array["torch_out"]
-            self._out_grads_torch = np.array_split(np_inputs_array["torch_out_grad"], world_size)[rank]
+            # ids of the vocab rows of this rank, relative to its shard of the table
+            self._shard_ids = self._np_x - sum(
+                len(t) for t in np.array_split(self._np_table, world_size)[:rank]
+            )
+            self._out_grads_torch = SparseRows.from_dense(
+                np.array_split(np_inputs_array["torch_out_grad"], world_size)[rank],
+                self._shard_ids,
+            )
         
     
     def _gen_eager_inputs_and_dout(self):
@@ -128,23 +139,16 @@ class TestPaddle(init_config_class.InitConfigClass):
         return out, out_grads
 
     def _test_eager_accuracy(self):
-        x_eager, table_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager, out_grads_eager = self._cal_eager_res(x_eager, table_eager, dout_eager)
+        with TensorArena("paddle") as arena:
+            x_eager, table_eager, dout_eager = arena.track(self._gen_eager_inputs_and_dout())
+            out_eager, out_grads_eager = arena.track(self._cal_eager_res(x_eager, table_eager, dout_eager))
 
-        del x_eager
-        del table_eager 
-        del dout_eager
-        paddle.device.cuda.empty_cache()
-        out_eager_np = out_eager.numpy()
-        out_grads_eager_np = out_grads_eager.numpy()
-
-        del out_eager
-        del out_grads_eager
-        paddle.device.cuda.empty_cache()
+            out_eager_np = out_eager.numpy()
+            out_grads_eager_np = out_grads_eager.numpy()
 
         if paddle.distributed.get_rank() == 0:
 
-            np.savez(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
+            save_results(self._save_eager_res_path, out_eager=out_eager_np, out_grads_eager=out_grads_eager_np)
 
             # compare eager res with torch
             try:
@@ -164,9 +168,10 @@ class TestPaddle(init_config_class.InitConfigClass):
                 print(e)
                 print("eager_accuracy forward {dtype} failed".format(dtype=self._dtype))
             try:
-                np_assert_accuracy(
+                np_assert_sparse_rows(
                     out_grads_eager_np,
                     self._out_grads_torch,
+                    self._shard_ids,
                     self._atol,
                     self._rtol,
                     self._dtype,
@@ -202,7 +207,7 @@ class TestPaddle(init_config_class.InitConfigClass):
         
         if paddle.distributed.get_rank() == 0:
 
-            np.savez(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
+            save_results(self._save_static_res_path, out_static=out_static, out_grads_static=out_grads_static)
 
             # compare static res with torch
             try:
@@ -223,9 +228,10 @@ class TestPaddle(init_config_class.InitConfigClass):
                 print("static_accuracy forward {dtype} failed".format(dtype=self._dtype))
 
             try:
-                np_assert_accuracy(
+                np_assert_sparse_rows(
                     out_grads_static,
                     self._out_grads_torch,
+                    self._shard_ids,
                     self._atol,
                     self._rtol,
                     self._dtype,
@@ -242,12 +248,10 @@ class TestPaddle(init_config_class.InitConfigClass):
 
     def _test_eager_stability(self):
         x_eager, table_eager, dout_eager = self._gen_eager_inputs_and_dout()
-        out_eager_baseline, out_grads_eager_baseline = self._cal_eager_res(x_eager, table_eager, dout_eager)
-        out_eager_baseline_np = out_eager_baseline.numpy()
-        out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
-        del out_eager_baseline
-        del out_grads_eager_baseline
-        paddle.device.cuda.empty_cache()
+        with TensorArena("paddle") as arena:
+            out_eager_baseline, out_grads_eager_baseline = arena.track(self._cal_eager_res(x_eager, table_eager, dout_eager))
+            out_eager_baseline_np = out_eager_baseline.numpy()
+            out_grads_eager_baseline_np = out_grads_eager_baseline.numpy()
 
         for i in range(5):
             out_eager, out_grads_eager = self._cal_eager_res(x_eager, table_eager, dout_eager)
@@ -5,6 +5,7 @@ import init_config_class
 import prepare_data
 import sys
 sys.path.append("..")
+from tensor_arena import TensorArena
 from utils import (
     TOLERANCE,
     convert_dtype_to_torch_type,
@@ -19,11 +20,10 @@ class TestTorch(init_config_class.InitConfigClass):
         self._init_np_inputs_and_dout()
         self._device = device
         self.id = id
-        out_torch, out_grads_torch = self._get_and_compare_torch_result()
+        with TensorArena("torch") as arena:
+            out_torch, out_grads_torch = arena.track(self._get_and_compare_torch_result())
         
-        np.savez(torch_dir, torch_out=out_torch, torch_out_grad=out_grads_torch)
-        del out_torch, out_grads_torch
-        torch.cuda.empty_cache()
+            np.savez(torch_dir, torch_out=out_torch, torch_out_grad=out_grads_torch)
     
     def _gen_torch_inputs_and_dout(self):
         x_torch = torch.tensor(
@@ -0,0 +1,108 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Token id workloads for the embedding and gather cases.
+
+A workload is a distribution, optionally followed by "_sorted":
+
+    uniform   every id equally likely (the default, as np.random.randint)
+    zipf      id of rank k drawn with probability ~ 1 / k ** zipf_a, the
+              ranks are scattered over the vocab like real token streams
+    hot_key   hot_ratio of the ids hit hot_keys ids, the rest is uniform
+    all_same  one id repeated, the worst case of the backward scatter add
+
+"_sorted" sorts the ids (like a bucketed batch), otherwise they stay in
+drawing order. Duplicate heavy workloads make the backward pass
+accumulate into the same rows again and again, which is where atomics
+contention and nondeterminism show up.
+
+The develop tests that generate their ids read the workload from
+$API_TEST_ID_WORKLOAD. The inputs they save carry the ids to the
+incubate runs.
+"""
+import os
+
+import numpy as np
+
+ID_DISTRIBUTIONS = ("uniform", "zipf", "hot_key", "all_same")
+ID_WORKLOAD = os.getenv("API_TEST_ID_WORKLOAD", "uniform")
+
+
+def parse_workload(workload):
+    """Split a workload like "zipf_sorted" into ("zipf", True)."""
+    distribution, sort = workload, False
+    if workload.endswith("_sorted"):
+        distribution, sort = workload[: -len("_sorted")], True
+    if distribution not in ID_DISTRIBUTIONS:
+        raise ValueError(
+            "Unknown id distribution {}, expected one of {}.".format(
+                distribution, ID_DISTRIBUTIONS
+            )
+        )
+    return distribution, sort
+
+
+def all_workloads():
+    return [d + suffix for d in ID_DISTRIBUTIONS for suffix in ("", "_sorted")]
+
+
+def generate_ids(
+    workload,
+    low,
+    high,
+    size,
+    rng=None,
+    zipf_a=1.1,
+    hot_keys=8,
+    hot_ratio=0.9,
+):
+    """Ids in [low, high) of the given shape drawn from workload.
+
+    rng is a np.random.RandomState, np.random (its global state) by
+    default; the uniform workload then draws exactly what
+    np.random.randint(low, high, size) did.
+    """
+    rng = np.random if rng is None else rng
+    distribution, sort = parse_workload(workload)
+    n = high - low
+    numel = int(np.prod(size))
+    if distribution == "uniform":
+        ids = rng.randint(low, high, size=size)
+    elif distribution == "zipf":
+        p = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** zipf_a
+        ranks = rng.choice(n, size=numel, p=p / p.sum())
+        ids = low + rng.permutation(n)[ranks]
+    elif distribution == "hot_key":
+        hot = rng.choice(n, size=min(hot_keys, n), replace=False)
+        ids = np.where(
+            rng.random_sample(numel) < hot_ratio,
+            hot[rng.randint(0, hot.size, size=numel)],
+            rng.randint(0, n, size=numel),
+        )
+        ids = low + ids
+    else:
+        ids = np.full(numel, low + rng.randint(0, n))
+    ids = np.asarray(ids).reshape(size)
+    if sort:
+        ids = np.sort(ids, axis=None).reshape(size)
+    return ids
+
+
+def id_stats(ids):
+    """Duplicate statistics of a workload."""
+    _, counts = np.unique(np.asarray(ids).reshape(-1), return_counts=True)
+    return {
+        "unique": int(counts.size),
+        "unique_ratio": float(counts.size / max(np.size(ids), 1)),
+        "max_count": int(counts.max()) if counts.size else 0,
+    }
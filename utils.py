@@ -11,16 +11,41 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+
 import paddle
-import torch
 import numpy as np
 from paddle.fluid.framework import in_dygraph_mode
+from numerics import (  # noqa: F401
+    SparseRows,
+    allclose_stats,
+    convert_bfloat16_bits_to_float,
+    convert_float_to_bfloat16_bits,
+    load_results,
+    np_round_to_dtype,
+    save_results,
+    screen_blocks,
+    shard_range,
+    ulp_stats,
+)
 TOLERANCE = {
     "float32": {"atol": 1e-6, "rtol": 1e-6},
     "float16": {"atol": 1e-3, "rtol": 1e-3},
     "bfloat16": {"atol": 1e-2, "rtol": 1e-2},
 }
 
+# "allclose" compares with TOLERANCE, "ulp" compares float16/bfloat16
+# results by their distance in units in the last place, see np_assert_ulp,
+# "sampled" screens large results first, see np_assert_sampled
+COMPARATOR = os.getenv("API_TEST_COMPARATOR", "allclose")
+# strict mode always compares every element
+STRICT = os.getenv("API_TEST_STRICT", "0") == "1"
+SAMPLED_MIN_NUMEL = int(os.getenv("API_TEST_SAMPLED_MIN_NUMEL", 1 << 26))
+ULP_TOLERANCE = {
+    "float16": int(os.getenv("API_TEST_MAX_ULP_FP16", 2)),
+    "bfloat16": int(os.getenv("API_TEST_MAX_ULP_BF16", 2)),
+}
+
 
 def convert_dtype_to_torch_type(dtype):
     import torch
@@ -51,6 +76,62 @@ def np_assert_accuracy(
     fwd_or_bkd,
     api,
 ):  
+    if COMPARATOR == "ulp" and dtype in ULP_TOLERANCE:
+        return np_assert_ulp(
+            np_a,
+            np_b,
+            ULP_TOLERANCE[dtype],
+            dtype,
+            version_a,
+            version_b,
+            eager_or_static_mode,
+            fwd_or_bkd,
+            api,
+        )
+    if (
+        COMPARATOR == "sampled"
+        and not STRICT
+        and np.size(np_a) >= SAMPLED_MIN_NUMEL
+        and np.shape(np_a) == np.shape(np_b)
+    ):
+        return np_assert_sampled(
+            np_a,
+            np_b,
+            atol,
+            rtol,
+            dtype,
+            version_a,
+            version_b,
+            eager_or_static_mode,
+            fwd_or_bkd,
+            api,
+        )
+    _np_assert_allclose(
+        np_a,
+        np_b,
+        atol,
+        rtol,
+        dtype,
+        version_a,
+        version_b,
+        eager_or_static_mode,
+        fwd_or_bkd,
+        api,
+    )
+
+
+def _np_assert_allclose(
+    np_a,
+    np_b,
+    atol,
+    rtol,
+    dtype,
+    version_a,
+    version_b,
+    eager_or_static_mode,
+    fwd_or_bkd,
+    api,
+):
     max_atol_idx = np.argmax(np.abs(np_a - np_b))
     np_a_flatten = np_a.flatten()
     np_b_flatten = np_b.flatten()
@@ -93,6 +174,215 @@ def np_assert_accuracy(
     )
 
 
+def np_assert_sampled(
+    np_a,
+    np_b,
+    atol,
+    rtol,
+    dtype,
+    version_a,
+    version_b,
+    eager_or_static_mode,
+    fwd_or_bkd,
+    api,
+    block_size=1 << 18,
+):
+    """Two tier np_assert_accuracy for very large results.
+
+    screen_blocks checks a random sample and the moments of every block;
+    only the blocks it flags get the exact elementwise comparison. A block
+    that passes the screen can still hide errors that cancel in its
+    moments and miss the sample, set API_TEST_STRICT=1 to compare all.
+    """
+    np_a = np.asarray(np_a).reshape(-1)
+    np_b = np.asarray(np_b).reshape(-1)
+    for start, stop in screen_blocks(np_a, np_b, atol, rtol, block_size):
+        _np_assert_allclose(
+            np_a[start:stop],
+            np_b[start:stop],
+            atol,
+            rtol,
+            dtype,
+            version_a,
+            version_b,
+            eager_or_static_mode,
+            fwd_or_bkd,
+            "{} [elements {}:{}]".format(api, start, stop),
+        )
+
+
+def np_assert_sparse_rows(
+    np_a,
+    np_b,
+    ids,
+    atol,
+    rtol,
+    dtype,
+    version_a,
+    version_b,
+    eager_or_static_mode,
+    fwd_or_bkd,
+    api,
+):
+    """np_assert_accuracy of row sparse gradients, e.g. embedding weight grads.
+
+    np_a and np_b are dense [height, ...] gradients or SparseRows of them.
+    Only the rows looked up by ids are compared with np_assert_accuracy,
+    the other rows just have to be all zero. Only that allclose part
+    shrinks to O(len(ids)) rows: the zero check of a dense gradient still
+    scans the whole table.
+    """
+    sparse = []
+    for x in (np_a, np_b):
+        if not isinstance(x, SparseRows):
+            x = SparseRows.from_dense(x, ids)
+        sparse.append(x)
+    sparse_a, sparse_b = sparse
+    np.testing.assert_equal(sparse_a.height, sparse_b.height)
+    np.testing.assert_equal(sparse_a.rows, sparse_b.rows)
+    for version, x in ((version_a, sparse_a), (version_b, sparse_b)):
+        if x.nonzero_untouched:
+            raise AssertionError(
+                '{api} {eager_or_static_mode} {fwd_or_bkd}: {version} res has {n} nonzero rows that are not looked up by ids in {dtype} dtype\n'.format(
+                    api=api,
+                    eager_or_static_mode=eager_or_static_mode,
+                    fwd_or_bkd=fwd_or_bkd,
+                    version=version,
+                    n=x.nonzero_untouched,
+                    dtype=dtype,
+                )
+            )
+    np_assert_accuracy(
+        sparse_a.values,
+        sparse_b.values,
+        atol,
+        rtol,
+        dtype,
+        version_a,
+        version_b,
+        eager_or_static_mode,
+        fwd_or_bkd,
+        "{} [{} of {} rows]".format(api, sparse_a.rows.size, sparse_a.height),
+    )
+
+
+def np_assert_sharded(
+    np_actual,
+    reference_path,
+    atol,
+    rtol,
+    dtype,
+    version_a,
+    version_b,
+    eager_or_static_mode,
+    fwd_or_bkd,
+    api,
+    group=None,
+):
+    """Distributed np_assert_accuracy, to be called on every rank.
+
+    Rank r compares the r-th shard of its flattened result with the same
+    shard of the .npy reference, memory mapped, so no rank loads the whole
+    reference. The scalar statistics of allclose_stats are all-reduced and
+    rank 0 raises when any shard failed; they are returned on every rank.
+    """
+    rank = paddle.distributed.get_rank()
+    world_size = paddle.distributed.get_world_size()
+    reference = np.load(reference_path, mmap_mode="r")
+    np_actual = np.asarray(np_actual)
+    np.testing.assert_equal(np_actual.shape, reference.shape)
+    start, stop = shard_range(np_actual.size, rank, world_size)
+    maxes, sums = allclose_stats(
+        np_actual.reshape(-1)[start:stop],
+        reference.reshape(-1)[start:stop],
+        atol,
+        rtol,
+    )
+    maxes, sums = paddle.to_tensor(maxes), paddle.to_tensor(sums)
+    paddle.distributed.all_reduce(
+        maxes, op=paddle.distributed.ReduceOp.MAX, group=group
+    )
+    paddle.distributed.all_reduce(
+        sums, op=paddle.distributed.ReduceOp.SUM, group=group
+    )
+    max_abs, max_rel = maxes.numpy().tolist()
+    violations, nan_mismatch, count = sums.numpy().astype(np.int64).tolist()
+    stats = {
+        "max_abs": max_abs,
+        "max_rel": max_rel,
+        "violations": violations,
+        "nan_mismatch": nan_mismatch,
+        "count": count,
+    }
+    if rank == 0 and violations > 0:
+        raise AssertionError(
+            '{api} {eager_or_static_mode} {fwd_or_bkd}: compare {version_a} res with {version_b} failed in {dtype} dtype,\n'.format(
+                api=api,
+                eager_or_static_mode=eager_or_static_mode,
+                fwd_or_bkd=fwd_or_bkd,
+                version_a=version_a,
+                version_b=version_b,
+                dtype=dtype,
+            )
+            + 'Not equal to tolerance rtol={rtol}, atol={atol} on {world_size} shards,\n'.format(
+                rtol=rtol, atol=atol, world_size=world_size
+            )
+            + 'mismatched elements: {violations} / {count}, nan mismatch: {nan_mismatch},\n'.format(
+                **stats
+            )
+            + 'max absolute difference: {max_abs}, max relative difference: {max_rel}\n'.format(
+                **stats
+            )
+        )
+    return stats
+
+
+def np_assert_ulp(
+    np_a,
+    np_b,
+    max_ulp,
+    dtype,
+    version_a,
+    version_b,
+    eager_or_static_mode,
+    fwd_or_bkd,
+    api,
+):
+    """Fail when np_a and np_b are more than max_ulp ULP of dtype apart.
+
+    The distances are computed in one streaming pass over the bit patterns
+    of dtype; the error message carries the max, percentiles and histogram.
+    """
+    np_a, np_b = np.asarray(np_a), np.asarray(np_b)
+    np.testing.assert_equal(np_a.shape, np_b.shape)
+    stats = ulp_stats(np_a, np_b, dtype)
+    if stats.max_ulp <= max_ulp and stats.nan_mismatch == 0:
+        return stats
+    summary = stats.summary()
+    raise AssertionError(
+        '{api} {eager_or_static_mode} {fwd_or_bkd}: compare {version_a} res with {version_b} failed in {dtype} dtype,\n'.format(
+            api=api,
+            eager_or_static_mode=eager_or_static_mode,
+            fwd_or_bkd=fwd_or_bkd,
+            version_a=version_a,
+            version_b=version_b,
+            dtype=dtype,
+        )
+        + 'max ulp {max_ulp} > {tolerance}, {version_a}_value: {value_a}, {version_b}_value: {value_b},\n'.format(
+            max_ulp=stats.max_ulp,
+            tolerance=max_ulp,
+            version_a=version_a,
+            value_a=str(np_a.reshape(-1)[max(stats.max_index, 0)].item()),
+            version_b=version_b,
+            value_b=str(np_b.reshape(-1)[max(stats.max_index, 0)].item()),
+        )
+        + 'p50/p90/p99 ulp <= {p50_ulp}/{p90_ulp}/{p99_ulp}, nan mismatch: {nan_mismatch}, of {count} values,\n'.format(
+            **summary
+        )
+        + 'ulp histogram: {}\n'.format(summary["histogram"])
+    )
+
+
 def np_assert_staility(
     np_actual,
     np_baseline,